@@ -0,0 +1,145 @@
+# On-disk cache of the rules built by the DSL of a grammar
+import hashlib
+import os
+import pickle
+import re
+import sys
+
+import pyrser
+from pyrser import meta
+
+#: extension of the cache files, written in __pycache__ as .pyc
+SUFFIX = '.pyrser'
+PROTOCOL = pickle.HIGHEST_PROTOCOL
+
+_digests = {}
+_sources = []
+
+
+def file_digest(fn: str) -> str:
+    """Digest of the content of a source file, computed once."""
+    if fn not in _digests:
+        with open(fn, 'rb') as f:
+            _digests[fn] = hashlib.sha256(f.read()).hexdigest()
+    return _digests[fn]
+
+
+def sources() -> list:
+    """The python files of the pyrser package, listed once."""
+    if not _sources:
+        root = os.path.dirname(os.path.abspath(pyrser.__file__))
+        for path, dirs, files in os.walk(root):
+            dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+            _sources.extend(os.path.join(path, fn) for fn in sorted(files)
+                            if fn.endswith('.py'))
+    return _sources
+
+
+def location(cls: type, sname: str=None, named: bool=True) -> str:
+    """Return the cache file of a grammar.
+
+    Grammars read from a file are cached next to it, the others next to
+    their module. None if the grammar has no stable name, i.e: the
+    gen_class_N built by from_string change with the creation order.
+    """
+    if sname is not None:
+        source = os.path.abspath(sname)
+        name = os.path.basename(source)
+    else:
+        if not named:
+            return None
+        source = getattr(sys.modules.get(cls.__module__), '__file__', None)
+        if source is None:
+            return None
+        name = cls.__module__ + '.' + cls.__qualname__
+    name = re.sub(r'[^\w.-]', '_', name)
+    return os.path.join(os.path.dirname(source), '__pycache__', name + SUFFIX)
+
+
+def key(dsl_parser: type, text: str, sname: str=None) -> str:
+    """Return the key of the rules built by dsl_parser from text.
+
+    It changes with the grammar, pyrser and python versions, the code of
+    pyrser, of the DSL and of the known directives.
+    """
+    registered = (list(meta._directives.values())
+                  + list(meta._decorators.values()))
+    registry = sorted(
+        (name, c.__module__, c.__qualname__)
+        for name, c in list(meta._directives.items())
+        + list(meta._decorators.items())
+    )
+    # the modules outside pyrser that build the rules
+    modules = {dsl_parser.__module__} | {c.__module__ for c in registered}
+    files = set(sources())
+    for name in sorted(modules):
+        fn = getattr(sys.modules.get(name), '__file__', None)
+        if fn is not None and os.path.isfile(fn):
+            files.add(os.path.abspath(fn))
+    parts = (
+        pyrser.__version__,
+        sys.version,
+        PROTOCOL,
+        [file_digest(fn) for fn in sorted(files)],
+        dsl_parser.__module__ + '.' + dsl_parser.__qualname__,
+        sname,
+        registry,
+        text,
+    )
+    return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()
+
+
+def load(fn: str, expected: str) -> dict:
+    """Return the rules stored in fn, None if missing or stale."""
+    try:
+        with open(fn, 'rb') as f:
+            if pickle.load(f) != expected:
+                return None
+            return pickle.load(f)
+    except Exception:
+        # missing, truncated, or refer to a class that no longer exists
+        return None
+
+
+def store(fn: str, stored: str, rules: dict):
+    """Write rules in fn, replacing the stale entry if any.
+
+    Rules that can't be pickled (i.e: directives defined in a function)
+    and unwritable directories are silently not cached.
+    """
+    tmp = '%s.%d' % (fn, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(fn), exist_ok=True)
+        with open(tmp, 'wb') as f:
+            pickle.dump(stored, f, PROTOCOL)
+            pickle.dump(rules, f, PROTOCOL)
+        os.replace(tmp, fn)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def get_rules(cls: type, text: str, sname: str=None,
+              named: bool=True) -> dict:
+    """Return the rules of the grammar text of cls.
+
+    Load them from the cache if they were built from the same text by
+    the same versions, otherwise build them with the dsl_parser of cls
+    and update the cache.
+    """
+    fn = None
+    if (cls.cache_rules and isinstance(text, str)
+            and isinstance(cls.dsl_parser, type)):
+        fn = location(cls, sname, named)
+    if fn is None:
+        return cls.dsl_parser(text, sname).get_rules()
+    expected = key(cls.dsl_parser, text, sname)
+    rules = load(fn, expected)
+    if rules is not None:
+        return rules
+    rules = cls.dsl_parser(text, sname).get_rules()
+    if rules and not sys.dont_write_bytecode:
+        store(fn, expected, rules)
+    return rules
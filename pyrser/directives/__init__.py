@@ -1,7 +1,9 @@
 from pyrser.directives.ignore import Ignore
+from pyrser.directives.stream import Stream
 from pyrser.directives.trace import Trace
 
 __all__ = [
     'Ignore',
+    'Stream',
     'Trace',
 ]
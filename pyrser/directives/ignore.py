@@ -1,4 +1,5 @@
 from pyrser import meta, parsing
+from pyrser.parsing import charclass
 
 
 @meta.rule(parsing.Parser, "Base.ignore_cxx")
@@ -7,20 +8,20 @@ def ignore_cxx(self) -> bool:
     self._stream.save_context()
     while not self.read_eof():
         idxref = self._stream.index
-        if self._stream.peek_char in " \t\v\f\r\n":
-            while (not self.read_eof()
-                    and self._stream.peek_char in " \t\v\f\r\n"):
-                self._stream.incpos()
+        self.read_class(charclass.BLANKS, True)
         if self.peek_text("//"):
-            while not self.read_eof() and not self.peek_char("\n"):
-                self._stream.incpos()
-            if not self.read_char("\n") and self.read_eof():
+            index = self._stream.index
+            end = self._stream._content.find("\n", index)
+            if end == -1:
+                self._stream.incpos(self._stream.eos_index - index)
                 return self._stream.validate_context()
+            self._stream.incpos(end + 1 - index)
         if self.peek_text("/*"):
-            while not self.read_eof() and not self.peek_text("*/"):
-                self._stream.incpos()
-            if not self.read_text("*/") and self.read_eof():
+            index = self._stream.index
+            end = self._stream._content.find("*/", index + 2)
+            if end == -1:
                 return self._stream.restore_context()
+            self._stream.incpos(end + 2 - index)
         if idxref == self._stream.index:
             break
     return self._stream.validate_context()
@@ -0,0 +1,29 @@
+from pyrser import meta, parsing
+
+
+@meta.directive("stream")
+class Stream(parsing.DirectiveWrapper):
+    """@stream("name") R* yield the nodes captured by name in each R.
+
+    See Grammar.iter_parse.  Built as a Streamed functor, instead of a
+    Directive wrapping the rest of the sequence.
+    """
+
+    @staticmethod
+    def functor(param: [(object, type)], pt: parsing.Functor):
+        if len(param) != 1 or param[0][1] is not str:
+            raise TypeError("@stream expects the name of a capture")
+        tagname = param[0][0]
+        if isinstance(pt, parsing.Seq):
+            for i, it in enumerate(pt.ptlist):
+                if not isinstance(it, parsing.SkipIgnore):
+                    pt.ptlist[i] = parsing.Streamed(tagname, it)
+                    pt.cut = True
+                    return pt
+        return parsing.Streamed(tagname, pt)
+
+    def begin(self, parser, tagname: str):
+        return True
+
+    def end(self, parser, tagname: str):
+        return True
@@ -47,8 +47,21 @@ class EBNF(parsing.Parser):
         """
         Define the DSL parser.
         """
+        self.define_rules()
         super().__init__(content, sname)
-        self.set_rules({
+
+    @classmethod
+    def define_rules(cls):
+        """
+        Build the rules of the BNF DSL.
+
+        Rules are built once by class and shared by all the parsers,
+        so compiling a grammar doesn't deepen the ChainMap of rules.
+        """
+        if '_bnf_defined' in cls.__dict__:
+            return
+        cls._bnf_defined = True
+        cls.set_rules({
             #
             # bnf_dsl = [ @ignore("C/C++") bnf_stmts ]
             # //todo: bnf_dsl = [ @ignore("C/C++") [bnf_stmts] eof ]
@@ -58,8 +71,8 @@ class EBNF(parsing.Parser):
                 # forward it thru a lambda
                 parsing.Directive(ignore.Ignore(),
                                   [("C/C++", str)],
-                                  lambda parser:
-                                  self.__class__._rules['bnf_stmts'](parser)),
+                                  lambda parser: parser.__class__._rules[
+                                      'bnf_stmts'](parser)),
             ),
 
             #
@@ -141,10 +154,12 @@ class EBNF(parsing.Parser):
             #       | Base.char : begin ".." Base.char : end
             #         #add_range(_, begin, end)
             #       | Base.char : c #add_read_sqstring(_, c)
+            #       | char_class : cc #add_class(_, cc)
             #       | '[' alternatives : subsequence ']'
             #         #add_subsequence(_, subsequence)
             #     ] #add_mod(_, mod)
             #     [ repeat : rpt #add_rpt(_, mod, rpt) ]?
+            #   | '^' #add_cut(_)
             #   | hook : h #add_hook(_, h)
             #   | directive2 : d sequences : s #add_directive2(_, d, s)
             #   | directive : d sequences : s #add_directive(_, d, s)
@@ -209,6 +224,13 @@ class EBNF(parsing.Parser):
                                              [("_", parsing.Node),
                                               ("c", parsing.Node)])
                             ),
+                            parsing.Seq(
+                                parsing.Capture('cc',
+                                                parsing.Rule('char_class')),
+                                parsing.Hook('add_class',
+                                             [("_", parsing.Node),
+                                              ("cc", parsing.Node)])
+                            ),
                             parsing.Seq(
                                 parsing.Char('['),
                                 parsing.Capture(
@@ -239,6 +261,10 @@ class EBNF(parsing.Parser):
                             )
                         ),
                     ),
+                    parsing.Seq(
+                        parsing.Char('^'),
+                        parsing.Hook('add_cut', [('_', parsing.Node)])
+                    ),
                     parsing.Seq(
                         parsing.Capture('h', parsing.Rule('hook')),
                         parsing.Hook('add_hook', [('_', parsing.Node),
@@ -283,6 +309,50 @@ class EBNF(parsing.Parser):
                 )
             ),
 
+            #
+            # char_class = [ '{'
+            #   [ Base.char : begin ".." Base.char : end
+            #     #add_class_range(_, begin, end)
+            #   | Base.char : c #add_class_chars(_, c)
+            #   | Base.string : s #add_class_chars(_, s)
+            #   ]+
+            # '}' ]
+            #
+            'char_class': parsing.Seq(
+                parsing.Char('{'),
+                parsing.Rep1N(
+                    parsing.Alt(
+                        parsing.Seq(
+                            parsing.Capture('begin',
+                                            parsing.Rule('Base.char')),
+                            parsing.Text(".."),
+                            parsing.Capture('end',
+                                            parsing.Rule('Base.char')),
+                            parsing.Hook('add_class_range',
+                                         [("_", parsing.Node),
+                                          ("begin", parsing.Node),
+                                          ("end", parsing.Node)])
+                        ),
+                        parsing.Seq(
+                            parsing.Capture('c', parsing.Rule('Base.char')),
+                            parsing.Hook('add_class_chars',
+                                         [("_", parsing.Node),
+                                          ("c", parsing.Node)])
+                        ),
+                        parsing.Seq(
+                            parsing.Capture('s',
+                                            parsing.Rule('Base.string')),
+                            parsing.Hook('add_class_chars',
+                                         [("_", parsing.Node),
+                                          ("s", parsing.Node)])
+                        )
+                    )
+                ),
+                parsing.Alt(
+                    parsing.Char('}'),
+                    parsing.Error("Expected '}'"))
+            ),
+
             # ns_name = [ [@ignore("null") [ Base.id ['.' Base.id]* ]]: rid ]
             #
             'ns_name': parsing.Capture(
@@ -595,6 +665,40 @@ def add_range(self, sequence, begin, end):
     return True
 
 
+@meta.hook(EBNF, "EBNF.add_class_range")
+def add_class_range(self, char_class, begin, end):
+    """Add a range to a class of characters"""
+    if not hasattr(char_class, 'ranges'):
+        char_class.ranges = []
+    char_class.ranges.append((self.value(begin).strip("'"),
+                              self.value(end).strip("'")))
+    return True
+
+
+@meta.hook(EBNF, "EBNF.add_class_chars")
+def add_class_chars(self, char_class, s):
+    """Add the characters of a quoted string to a class of characters"""
+    if not hasattr(char_class, 'ranges'):
+        char_class.ranges = []
+    char_class.ranges.extend((c, c) for c in self.value(s)[1:-1])
+    return True
+
+
+@meta.hook(EBNF, "EBNF.add_class")
+def add_class(self, sequence, cc):
+    """Create a tree.Class"""
+    try:
+        chars = parsing.CharClass(getattr(cc, 'ranges', []))
+    except ValueError as e:
+        self.diagnostic.notify(
+            error.Severity.ERROR, str(e),
+            error.LocationInfo.from_stream(self._stream, is_error=True)
+        )
+        raise self.diagnostic
+    sequence.parser_tree = parsing.Class(chars)
+    return True
+
+
 @meta.hook(EBNF, "EBNF.add_rpt")
 def add_rpt(self, sequence, mod, pt):
     """Add a repeater to the previous sequence"""
@@ -619,6 +723,14 @@ def add_rpt(self, sequence, mod, pt):
             error.LocationInfo.from_stream(self._stream, is_error=True)
         )
         raise self.diagnostic
+    tree = sequence.parser_tree
+    if (type(tree) is parsing.Class
+            and not (tree.many or tree.optional)):
+        # the run of the class is read by a single scan
+        sequence.parser_tree = parsing.Class(
+            tree.chars, pt.functor is not parsing.RepOptional,
+            pt.functor is not parsing.Rep1N)
+        return True
     oldnode = sequence
     sequence.parser_tree = pt.functor(oldnode.parser_tree)
     return True
@@ -675,6 +787,13 @@ def add_hook(self, sequence, h):
     return True
 
 
+@meta.hook(EBNF, "EBNF.add_cut")
+def add_cut(self, sequence):
+    """Create a tree.Cut"""
+    sequence.parser_tree = parsing.Cut()
+    return True
+
+
 @meta.hook(EBNF, "EBNF.param_num")
 def param_num(self, param, n):
     """Parse a int in parameter list"""
@@ -734,6 +853,11 @@ def add_directive(self, sequence, d, s):
     """Add a directive in the sequence"""
     if d.name in meta._directives:
         the_class = meta._directives[d.name]
+        if hasattr(the_class, 'functor'):
+            # directive translated into its own functor (i.e: stream)
+            sequence.parser_tree = the_class.functor(d.listparam,
+                                                     s.parser_tree)
+            return True
         sequence.parser_tree = parsing.Directive(the_class(), d.listparam,
                                                  s.parser_tree)
     elif d.name in meta._decorators:
@@ -24,7 +24,7 @@ class LocationInfo:
         if stream._name is None and is_error is True:
             (fh, stream._name) = tempfile.mkstemp()
             tmpf = os.fdopen(fh, 'w')
-            tmpf.write(stream._content)
+            tmpf.write(stream[0:len(stream)])
             tmpf.close()
             atexit.register(os.remove, stream._name)
         loc = LocationInfo(
@@ -39,13 +39,14 @@ class LocationInfo:
         if stream._name is None:
             (fh, stream._name) = tempfile.mkstemp()
             tmpf = os.fdopen(fh, 'w')
-            tmpf.write(stream._content)
+            tmpf.write(stream[0:len(stream)])
             tmpf.close()
             atexit.register(os.remove, stream._name)
+        maxpos = stream._cursor.max_readed_position
         loc = LocationInfo(
             stream._name,
-            stream._cursor._maxline,
-            stream._cursor._maxcol
+            maxpos.lineno,
+            maxpos.col_offset
         )
         return loc
 
@@ -62,6 +63,10 @@ class LocationInfo:
         return li
 
     def get_content(self) -> str:
+        if not os.path.isfile(self.filepath):
+            # i.e: a ChunkedStream, the text is not available
+            return "from {f} at line:{l} col:{c}\n".format(
+                f=self.filepath, l=self.line, c=self.col)
         f = open(self.filepath, 'r')
         lines = list(f)
         f.close()
@@ -0,0 +1,137 @@
+# Asynchronous front end of the parse of a stream pulled by chunks
+import asyncio
+import queue
+import threading
+
+from pyrser import parsing
+
+
+class Closed(Exception):
+    """Stop the parse of an AsyncFeed given up by its reader."""
+
+
+class AsyncFeed:
+    """Parse chunks given by an asyncio task, see Grammar.async_feed.
+
+    The parse runs in a thread, pulling the chunks given to feed thru a
+    ChunkedStream: it waits when the grammar needs more input than given.
+    The items of the streamed repetitions (see Streamed) are read with
+    items, the node of the entry rule is then in result.
+
+        feeder = CSV().async_feed()
+        async def read(reader):
+            while not reader.at_eof():
+                await feeder.feed(await reader.read(1 << 16))
+            await feeder.close()
+        asyncio.ensure_future(read(reader))
+        async for line in feeder.items():
+            ...
+
+    Every step items, the parse waits for a turn of the event loop, so
+    a long parse doesn't starve the other tasks.
+    """
+
+    def __init__(self, parser: parsing.BasicParser, entry: str=None,
+                 encoding: str='utf-8', buffered: int=64, step: int=100):
+        self.parser = parser
+        self.entry = entry
+        self.encoding = encoding
+        self.buffered = buffered
+        self.step = step
+        self.result = None
+        self._chunks = queue.Queue()
+        # the parse took a chunk, set thru the event loop
+        self._taken = asyncio.Event()
+        self._items = asyncio.Queue()
+        # items parsed ahead of the reader
+        self._ahead = threading.Semaphore(buffered)
+        self._closed = False
+        self._loop = None
+        self._worker = None
+
+    def _start(self):
+        if self._worker is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._worker = threading.Thread(target=self._work, daemon=True)
+        self._worker.start()
+
+    def _pull(self):
+        """Chunks of the ChunkedStream, None ends the input."""
+        while True:
+            chunk = self._chunks.get()
+            self._loop.call_soon_threadsafe(self._taken.set)
+            if chunk is None:
+                return
+            yield chunk
+
+    def _sink(self, node: parsing.Node):
+        if self._closed:
+            raise Closed()
+        self._ahead.acquire()
+        self._loop.call_soon_threadsafe(self._items.put_nowait, (True, node))
+        self._count += 1
+        if self._count % self.step == 0:
+            # wait for a turn of the event loop
+            asyncio.run_coroutine_threadsafe(
+                asyncio.sleep(0), self._loop).result()
+
+    def _work(self):
+        parser = self.parser
+        parser._item_sink = self._sink
+        self._count = 0
+        try:
+            res = parser.parse_stream(self._pull(), self.entry,
+                                      self.encoding)
+            done = (False, res)
+        except Closed:
+            return
+        except BaseException as e:
+            done = (None, e)
+        finally:
+            parser._item_sink = parser.streamed_items.append
+        self._loop.call_soon_threadsafe(self._items.put_nowait, done)
+
+    async def feed(self, chunk):
+        """Give a chunk (str or bytes) to the parse.
+
+        Wait while buffered chunks are not yet taken by the parse, raise
+        Closed if the items are no longer read.
+        """
+        self._start()
+        while True:
+            if self._closed:
+                raise Closed()
+            self._taken.clear()
+            if self._chunks.qsize() < self.buffered:
+                break
+            await self._taken.wait()
+        self._chunks.put_nowait(chunk)
+
+    async def close(self):
+        """End the input."""
+        await self.feed(None)
+
+    async def items(self):
+        """Yield the items of the streamed repetitions, as parsed.
+
+        A failure of the parse is raised at the end of the items.
+        """
+        self._start()
+        try:
+            while True:
+                done, value = await self._items.get()
+                if done is None:
+                    raise value
+                if not done:
+                    self.result = value
+                    return
+                self._ahead.release()
+                yield value
+        finally:
+            if self._worker.is_alive():
+                # stop the parse at its next item or chunk
+                self._closed = True
+                self._ahead.release()
+                self._chunks.put_nowait(None)
+                self._taken.set()
@@ -1,8 +1,25 @@
+import collections
+import concurrent.futures
+import copyreg
+import mmap
+import os
+import queue
+import re
+import sys
+import threading
+import weakref
+
+from pyrser import cache
 from pyrser import dsl
 from pyrser import parsing
 from pyrser import meta
 from pyrser import error
-from collections import ChainMap
+from pyrser import feed
+from pyrser.passes import events
+from pyrser.passes import first_set
+from pyrser.passes import recognize
+from pyrser.passes import regex_fusion
+from pyrser.parsing.base import DispatchMap
 
 
 class MetaGrammar(parsing.MetaBasicParser):
@@ -23,21 +40,19 @@ class MetaGrammar(parsing.MetaBasicParser):
             # link rules&hooks
             cls._rules = clsbase._rules.new_child()
             cls._hooks = clsbase._hooks.new_child()
+            cls._lazy = []
             # add rules from DSL
             if 'grammar' in namespace and namespace['grammar'] is not None:
                 sname = None
                 if 'source' in namespace and namespace['source'] is not None:
                     sname = namespace['source']
-                rules = cls.dsl_parser(namespace['grammar'], sname).get_rules()
-                if not rules:
-                    return rules
-                # namespace rules with module/classe name
-                for rule_name, rule_pt in rules.items():
-                    if '.' not in rule_name:
-                        rule_name = cls.__module__ \
-                            + '.' + cls.__name__ \
-                            + '.' + rule_name
-                    meta.set_one(cls._rules, rule_name, rule_pt)
+                # classes built by type() have no __module__ of their own
+                pending = LazyRules(cls, namespace['grammar'], sname,
+                                    '__module__' in namespace)
+                if cls.lazy:
+                    cls._lazy.append(pending)
+                elif not pending.build():
+                    return False
             # add localy define rules (and thus overloads)
             if '_rules' in namespace and namespace['_rules'] is not None:
                 cls._rules.update(namespace['_rules'])
@@ -46,18 +61,19 @@ class MetaGrammar(parsing.MetaBasicParser):
                 cls._hooks.update(namespace['_hooks'])
         # Manage Aggregation
         if len(bases) > 1:
-            aggreg_rules = ChainMap()
-            aggreg_hooks = ChainMap()
+            aggreg_rules = DispatchMap()
+            aggreg_hooks = DispatchMap()
             for subgrammar in bases:
+                cls._lazy.extend(getattr(subgrammar, '_lazy', ()))
                 if hasattr(subgrammar, '_rules'):
-                    aggreg_rules = ChainMap(*(aggreg_rules.maps
-                                            + subgrammar._rules.maps))
+                    aggreg_rules = DispatchMap(*(aggreg_rules.maps
+                                               + subgrammar._rules.maps))
                 if hasattr(subgrammar, '_hooks'):
-                    aggreg_hooks = ChainMap(*(aggreg_hooks.maps
-                                            + subgrammar._hooks.maps))
+                    aggreg_hooks = DispatchMap(*(aggreg_hooks.maps
+                                               + subgrammar._hooks.maps))
             # aggregate at toplevel the branch grammar
-            cls._rules = ChainMap(*(cls._rules.maps + aggreg_rules.maps))
-            cls._hooks = ChainMap(*(cls._hooks.maps + aggreg_hooks.maps))
+            cls._rules = DispatchMap(*(cls._rules.maps + aggreg_rules.maps))
+            cls._hooks = DispatchMap(*(cls._hooks.maps + aggreg_hooks.maps))
             # clean redondant in chain for rules
             orderedunique_rules = []
             tocpy_rules = set([id(_) for _ in cls._rules.maps])
@@ -66,7 +82,7 @@ class MetaGrammar(parsing.MetaBasicParser):
                 if idch in tocpy_rules:
                     orderedunique_rules.append(ch)
                     tocpy_rules.remove(idch)
-            cls._rules = ChainMap(*orderedunique_rules)
+            cls._rules = DispatchMap(*orderedunique_rules)
             # clean redondant in chain for hooks
             orderedunique_hooks = []
             tocpy_hooks = set([id(_) for _ in cls._hooks.maps])
@@ -75,10 +91,89 @@ class MetaGrammar(parsing.MetaBasicParser):
                 if idch in tocpy_hooks:
                     orderedunique_hooks.append(ch)
                     tocpy_hooks.remove(idch)
-            cls._hooks = ChainMap(*orderedunique_hooks)
+            cls._hooks = DispatchMap(*orderedunique_hooks)
         return cls
 
 
+class LazyRules:
+    """Rules of the DSL of a grammar, built on demand.
+
+    The rules fill the own map of the class, without replacing the rules
+    already defined there (i.e: by _rules or meta.rule) as they would
+    have replaced the rules of the DSL.
+    """
+    lock = threading.RLock()
+
+    def __init__(self, cls: type, text: str, sname: str, named: bool):
+        self.cls = cls
+        self.target = cls._rules.maps[0]
+        self.text = text
+        self.sname = sname
+        self.named = named
+        self.done = False
+
+    def build(self) -> bool:
+        """Build and add the rules, only once even between threads."""
+        if self.done:
+            return True
+        with self.lock:
+            if self.done:
+                return True
+            cls = self.cls
+            rules = cache.get_rules(cls, self.text, self.sname, self.named)
+            if not rules:
+                return False
+            # namespace rules with module/classe name
+            table = {}
+            for rule_name, rule_pt in rules.items():
+                if '.' not in rule_name:
+                    rule_name = cls.__module__ \
+                        + '.' + cls.__name__ \
+                        + '.' + rule_name
+                meta.set_one(table, rule_name, rule_pt)
+            for rule_name, rule_pt in table.items():
+                if rule_name not in self.target:
+                    self.target[rule_name] = rule_pt
+            self.done = True
+        return True
+
+
+class Recognition(collections.namedtuple('Recognition', 'ok location')):
+    """Result of Grammar.recognize, true on a match.
+
+    On a mismatch, location is the LocationInfo of the farthest failure.
+    """
+    __slots__ = ()
+
+    def __bool__(self):
+        return self.ok
+
+
+class _Closed(Exception):
+    """Stop the parse of a closed iter_parse."""
+
+
+class EventHandler:
+    """Receive the events of Grammar.parse_events, overload the methods.
+
+    Positions are indexes in the parsed text.
+    """
+
+    def enter_rule(self, name: str, pos: int):
+        pass
+
+    def exit_rule(self, name: str, pos: int, ok: bool):
+        pass
+
+    def capture(self, name: str, start: int, end: int):
+        pass
+
+    def hook(self, name: str, args: list):
+        """Called for a hook, the nodes are given as their captured text,
+        None for the node of the rule."""
+        pass
+
+
 class Grammar(parsing.Parser, metaclass=MetaGrammar):
     """
     Base class for all grammars.
@@ -93,6 +188,64 @@ class Grammar(parsing.Parser, metaclass=MetaGrammar):
     entry = None
     # DSL parsing class
     dsl_parser = dsl.EBNF
+    # Alt only try alternatives whose FIRST set match the next character
+    predictive = False
+    # terminal subtrees are matched by regular expressions
+    regex_fusion = False
+    # rules built from the DSL are cached in __pycache__
+    cache_rules = True
+    # the DSL is compiled on first use instead of at class creation
+    lazy = False
+    # streams could forget the text before the saved contexts
+    discard_stream = True
+    # regex of the boundaries where parse_split could cut the text, the
+    # entry rule must parse the pieces between them (i.e: '\n')
+    split_after = None
+
+    @classmethod
+    def finalize(cls) -> tuple:
+        for pending in cls._lazy:
+            pending.build()
+        flat = super().finalize()
+        if cls.regex_fusion and cls.__dict__.get('_fused') is not flat:
+            regex_fusion.fuse_rules(flat[0])
+            cls._fused = flat
+        if cls.predictive and cls.__dict__.get('_predicted') is not flat:
+            first_set.build_jump_tables(cls, flat[0])
+            cls._predicted = flat
+        return flat
+
+    @classmethod
+    def recognizer(cls) -> dict:
+        """Return the rules of the grammar without nodes (see recognize)."""
+        return cls._match_rules('_recognizer', recognize.strip_rules)
+
+    @classmethod
+    def event_rules(cls) -> dict:
+        """Return the rules of the grammar with events (see parse_events).
+        """
+        return cls._match_rules('_event_rules', events.event_rules)
+
+    @classmethod
+    def _match_rules(cls, attr: str, strip_rules) -> dict:
+        """Return the rules built by strip_rules from the dispatch table.
+
+        Built once, and again only if a rule, a hook or the
+        predictive/regex_fusion options were modified since.
+        """
+        flat = cls.finalize()
+        key = (flat, cls.predictive, cls.regex_fusion)
+        tables = cls.__dict__.get(attr)
+        if tables is None or tables[0] != key:
+            table = strip_rules(flat[0])
+            if cls.regex_fusion:
+                # terminals were maybe captured, fuse them now
+                regex_fusion.fuse_rules(table)
+            if cls.predictive:
+                first_set.build_jump_tables(cls, table)
+            tables = (key, table)
+            setattr(cls, attr, tables)
+        return tables[1]
 
     def after_parse(self, node: parsing.Node) -> parsing.Node:
         """
@@ -100,6 +253,22 @@ class Grammar(parsing.Parser, metaclass=MetaGrammar):
         """
         return node
 
+    def merge_split(self, nodes: list) -> parsing.Node:
+        """Merge the results of the pieces parsed by parse_split
+
+        The lists of the nodes are concatenated into the first one,
+        overload it for other results.
+        """
+        res = nodes[0]
+        for node in nodes[1:]:
+            for k, v in vars(node).items():
+                mine = getattr(res, k, None)
+                if isinstance(mine, list) and isinstance(v, list):
+                    mine.extend(v)
+                elif not hasattr(res, k):
+                    setattr(res, k, v)
+        return res
+
     def _do_parse(self, entry: str) -> parsing.Node:
         if self.nstream == 0:
             raise ValueError("No opened stream for reading."
@@ -155,12 +324,181 @@ class Grammar(parsing.Parser, metaclass=MetaGrammar):
                 self.__class__.__name__))
         return self._do_parse(entry)
 
-    def parse_file(self, filename: str, entry: str=None) -> parsing.Node:
-        """Parse filename using the grammar"""
+    def recognize(self, source: str, entry: str=None) -> Recognition:
+        """Check that source match the grammar, without building the tree
+
+        The rules are evaluated with captures, binds, node declarations
+        and hooks turned into no-ops, and without the packrat cache.
+        Return a Recognition, with the location of the farthest failure
+        on a mismatch.
+        """
+        return self._do_match(source, entry, self.recognizer())
+
+    def parse_events(self, source: str, handler: 'EventHandler',
+                     entry: str=None) -> Recognition:
+        """Parse source, calling handler instead of building the tree
+
+        As recognize, but the rules, captures and hooks are reported to
+        the methods of handler (see EventHandler), in the order of the
+        text.  The events of an alternative, a repetition or a predicate
+        are buffered until it succeeds, and retracted if it fails.
+        """
+        self._event_handler = handler
+        try:
+            return self._do_match(source, entry, self.event_rules())
+        finally:
+            self._events.clear()
+            self._event_handler = None
+
+    def _do_match(self, source: str, entry: str,
+                  table: dict) -> Recognition:
+        self.from_string = True
+        self.parsed_stream(source)
+        if entry is None:
+            entry = self.entry
+        if entry is None:
+            raise ValueError("No entry rule name defined for {}".format(
+                self.__class__.__name__))
+        if self._dispatch_generation != DispatchMap.generation:
+            self.update_dispatch()
+        self._match_table = table
+        self.diagnostic = error.Diagnostic()
+        try:
+            if self.match_rule(entry):
+                return Recognition(True, None)
+        except error.Diagnostic as d:
+            # User put an error rule, or failed after a cut
+            return Recognition(False, d.logs[-1].location)
+        return Recognition(False, error.LocationInfo.from_maxstream(
+            self._stream))
+
+    def reparse(self, edit_start: int, edit_end: int, new_text: str,
+                entry: str=None) -> parsing.Node:
+        """Parse the last parsed text again, after an edit
+
+        The text between edit_start and edit_end is replaced by new_text.
+        With packrat, the cached results of the rules that didn't read the
+        edited text are kept, shifted if after it, so only the rules
+        around the edit are evaluated again.
+        """
+        stream = self._stream
+        content = stream._content
+        if type(content) is not str:
+            raise TypeError("Can't reparse a {}".format(
+                stream.__class__.__name__))
+        if not 0 <= edit_start <= edit_end <= len(content):
+            raise ValueError("Edit {}:{} out of the text".format(
+                edit_start, edit_end))
+        source = content[:edit_start] + new_text + content[edit_end:]
+        name = None if self.from_string else stream._name
+        self.edit_memo(edit_start, edit_end, len(new_text))
+        # as parsed_stream, without clearing the packrat cache
+        self._streams[-1] = parsing.Stream(source, name)
+        if entry is None:
+            entry = self.entry
+        if entry is None:
+            raise ValueError("No entry rule name defined for {}".format(
+                self.__class__.__name__))
+        return self._do_parse(entry)
+
+    def parse_stream(self, source, entry: str=None,
+                     encoding: str='utf-8') -> parsing.Node:
+        """Parse the text pulled by chunks from source
+
+        source is an iterable of chunks, a file object or a socket-like
+        reader (see ChunkedStream).  The parsed text is dropped up to the
+        oldest position the parser may backtrack to: the start of the
+        pending sequences, but not of the items of a repetition.
+        """
+        self.from_string = False
+        name = getattr(source, 'name', None)
+        if not isinstance(name, str):
+            name = '<stream>'
+        self.push_stream(parsing.ChunkedStream(
+            source, name, encoding, self.discard_stream))
+        if entry is None:
+            entry = self.entry
+        if entry is None:
+            raise ValueError("No entry rule name defined for {}".format(
+                self.__class__.__name__))
+        return self._do_parse(entry)
+
+    def iter_parse(self, source, entry: str=None, encoding: str='utf-8',
+                   buffered: int=64):
+        """Parse source, yielding the items of the streamed repetitions
+
+        A repetition marked by @stream("name") gives away the node
+        captured by name in each of its items, as soon as the item matched
+        (see Streamed), so the memory stays bounded by the size of an item.
+        source is a str, or the chunks given to parse_stream.  The parse
+        runs in a thread, at most buffered items ahead, and the node of the
+        entry rule is the value of the StopIteration.
+        """
+        items = queue.Queue(buffered)
+        closed = False
+
+        def sink(node: parsing.Node):
+            if closed:
+                raise _Closed()
+            items.put((True, node))
+
+        def work():
+            try:
+                if isinstance(source, str):
+                    res = self.parse(source, entry)
+                else:
+                    res = self.parse_stream(source, entry, encoding)
+                items.put((False, res))
+            except _Closed:
+                pass
+            except BaseException as e:
+                items.put((None, e))
+
+        self._item_sink = sink
+        worker = threading.Thread(target=work, daemon=True)
+        worker.start()
+        try:
+            while True:
+                done, value = items.get()
+                if done is None:
+                    raise value
+                if not done:
+                    return value
+                yield value
+        finally:
+            # stop the parse at its next item
+            closed = True
+            while worker.is_alive():
+                try:
+                    items.get(timeout=0.01)
+                except queue.Empty:
+                    pass
+            self._item_sink = self.streamed_items.append
+
+    def async_feed(self, entry: str=None, encoding: str='utf-8',
+                   buffered: int=64, step: int=100) -> feed.AsyncFeed:
+        """Return an AsyncFeed, to parse the chunks given by asyncio tasks
+
+        buffered bounds the chunks given and the items parsed ahead, the
+        parse waits for a turn of the event loop every step items.
+        """
+        return feed.AsyncFeed(self, entry, encoding, buffered, step)
+
+    def parse_file(self, filename: str, entry: str=None,
+                   mapped: bool=False, encoding: str=None) -> parsing.Node:
+        """Parse filename using the grammar
+
+        With mapped, the file is read thru a mmap (see FileStream)
+        instead of being loaded in memory.
+        """
         self.from_string = False
         import os.path
-        with open(filename, 'r') as f:
-            self.parsed_stream(f.read(), os.path.abspath(filename))
+        if mapped:
+            self.push_stream(parsing.FileStream(
+                filename, encoding or 'utf-8', os.path.abspath(filename)))
+        else:
+            with open(filename, 'r', encoding=encoding) as f:
+                self.parsed_stream(f.read(), os.path.abspath(filename))
         if entry is None:
             entry = self.entry
         if entry is None:
@@ -169,14 +507,215 @@ class Grammar(parsing.Parser, metaclass=MetaGrammar):
         return self._do_parse(entry)
 
 
+    def parse_split(self, filename: str, entry: str=None, jobs: int=None,
+                    chunk_size: int=1 << 20,
+                    encoding: str='utf-8') -> parsing.Node:
+        """Parse a file by pieces in jobs worker processes
+
+        The file is cut after the matches of split_after following each
+        chunk_size bytes, the pieces are parsed by the entry rule and their
+        results merged by merge_split.  The locations of the errors are
+        lines and columns of the file.
+        """
+        filename = os.path.abspath(filename)
+        if entry is None:
+            entry = self.entry
+        if entry is None:
+            raise ValueError("No entry rule name defined for {}".format(
+                self.__class__.__name__))
+        pieces = split_file(filename, self.split_after, chunk_size,
+                            encoding)
+        args = [(filename, start, end, entry, encoding)
+                for start, end in pieces]
+        pool = None
+        if jobs == 1 or len(args) == 1:
+            results = (_parse_piece(*a, self.__class__) for a in args)
+        else:
+            pool = concurrent.futures.ProcessPoolExecutor(
+                jobs, initializer=_init_worker,
+                initargs=(self.__class__,))
+            results = pool.map(_parse_piece, *zip(*args))
+        nodes = []
+        # position of the current piece in the file
+        line, col = 0, 0
+        try:
+            for res, nlines, tail in results:
+                if isinstance(res, error.Diagnostic):
+                    for notification in res.logs:
+                        loc = notification.location
+                        if loc is not None and loc.filepath == filename:
+                            if loc.line == 1:
+                                loc.col += col
+                            loc.line += line
+                    self.diagnostic = res
+                    raise res
+                if isinstance(res, Exception):
+                    raise res
+                nodes.append(res)
+                col = col + tail if nlines == 0 else tail
+                line += nlines
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        return self.merge_split(nodes)
+
+    @classmethod
+    def parse_many(cls, paths, entry: str=None, jobs: int=None,
+                   ordered: bool=True, **kwargs):
+        """Parse files in jobs worker processes (os.cpu_count by default)
+
+        Yield pairs (path, result) in the order of paths, or as the files
+        are parsed if not ordered.  The exception raised by the parse of
+        a file is returned as its result.  kwargs are given to parse_file.
+        Workers get the grammar class once, see reduce_grammar.
+        """
+        paths = list(paths)
+        if jobs == 1:
+            for path in paths:
+                yield path, _parse_file(path, entry, kwargs, cls)
+            return
+        pool = concurrent.futures.ProcessPoolExecutor(
+            jobs, initializer=_init_worker, initargs=(cls,))
+        try:
+            futures = {pool.submit(_parse_file, path, entry, kwargs): path
+                       for path in paths}
+            if not ordered:
+                futures = {f: futures[f]
+                           for f in concurrent.futures.as_completed(futures)}
+            for future, path in futures.items():
+                yield path, future.result()
+        finally:
+            # the caller could stop before the end
+            pool.shutdown(cancel_futures=True)
+
+
+#: grammar class of the parse_many worker processes
+_worker_grammar = None
+
+
+def _init_worker(cls: type):
+    global _worker_grammar
+    _worker_grammar = cls
+
+
+def _parse_file(path: str, entry: str, kwargs: dict, cls: type=None):
+    if cls is None:
+        cls = _worker_grammar
+    try:
+        return cls().parse_file(path, entry, **kwargs)
+    except Exception as e:
+        return e
+
+
+def split_file(filename: str, boundary: str, chunk_size: int,
+               encoding: str) -> [(int, int)]:
+    """Return the (start, end) offsets of the pieces of a file.
+
+    The pieces are cut after the first match of the boundary regex that
+    follows chunk_size bytes, the file is a single piece without boundary.
+    """
+    size = os.path.getsize(filename)
+    if boundary is None or size <= chunk_size:
+        return [(0, size)]
+    regex = re.compile(boundary.encode(encoding))
+    pieces = []
+    start = 0
+    with open(filename, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+        while start + chunk_size < size:
+            m = regex.search(content, start + chunk_size)
+            if m is None or m.end() >= size:
+                break
+            pieces.append((start, m.end()))
+            start = m.end()
+    pieces.append((start, size))
+    return pieces
+
+
+def _parse_piece(filename: str, start: int, end: int, entry: str,
+                 encoding: str, cls: type=None) -> tuple:
+    """Parse a piece of a file, see Grammar.parse_split.
+
+    Return the result, the number of newlines of the piece and the number
+    of characters after the last one.
+    """
+    if cls is None:
+        cls = _worker_grammar
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode(encoding)
+    nlines = text.count('\n')
+    tail = len(text) - text.rfind('\n') - 1
+    parser = cls()
+    parser.from_string = False
+    parser.parsed_stream(text, filename)
+    try:
+        res = parser._do_parse(entry)
+    except Exception as e:
+        res = e
+    return res, nlines, tail
+
+
 generated_class = 0
+#: classes built by build_grammar, by name
+_generated = weakref.WeakValueDictionary()
 
 
 def build_grammar(inherit: tuple, scope: dict) -> Grammar:
     global generated_class
     class_name = "gen_class_" + str(generated_class)
     generated_class += 1
-    return type(class_name, inherit, scope)
+    return _build(class_name, inherit, scope)
+
+
+def _build(class_name: str, inherit: tuple, scope: dict) -> Grammar:
+    cls = type(class_name, inherit, dict(scope))
+    cls._build_args = (inherit, scope)
+    _generated[class_name] = cls
+    return cls
+
+
+def _importable(obj) -> bool:
+    """Check that pickle could find obj by its name."""
+    found = sys.modules.get(obj.__module__)
+    for name in obj.__qualname__.split('.'):
+        found = getattr(found, name, None)
+    return found is obj
+
+
+def reduce_grammar(cls: type):
+    """Pickle grammar classes, i.e: to send them to worker processes.
+
+    The classes of a module are pickled by name.  The gen_class_N built by
+    from_string or from_file are built again from their grammar, with
+    their hooks defined at module level.
+    """
+    args = cls.__dict__.get('_build_args')
+    if args is None or _importable(cls):
+        return cls.__qualname__
+    hooks = {}
+    for hooks_map in cls._hooks.maps:
+        if any(hooks_map is m for m in parsing.Parser._hooks.maps):
+            break
+        for name, f in hooks_map.items():
+            if name not in hooks and _importable(f):
+                hooks[name] = f
+    return _rebuild_grammar, (cls.__name__,) + args + (hooks,)
+
+
+def _rebuild_grammar(class_name: str, inherit: tuple, scope: dict,
+                     hooks: dict) -> Grammar:
+    # the same class in the processes forked after its creation
+    cls = _generated.get(class_name)
+    if cls is None or cls._build_args != (inherit, scope):
+        cls = _build(class_name, inherit, scope)
+        for name, f in hooks.items():
+            cls._hooks[name] = f
+            setattr(cls, f.__name__, f)
+    return cls
+
+
+copyreg.pickle(MetaGrammar, reduce_grammar)
 
 
 def from_string(bnf: str, entry=None, *optional_inherit) -> Grammar:
@@ -1,19 +1,21 @@
 from pyrser.parsing.node import Node
 from pyrser.parsing.functors import Functor
 from pyrser.parsing.functors import PeekChar, Char, PeekText, Text, Range
-from pyrser.parsing.functors import UntilChar
+from pyrser.parsing.functors import Class
+from pyrser.parsing.functors import UntilChar, Regex
 from pyrser.parsing.functors import Call, CallTrue
 from pyrser.parsing.functors import Complement, LookAhead, Neg, Until
 from pyrser.parsing.functors import Hook, Rule
 from pyrser.parsing.functors import Directive, DirectiveWrapper, SkipIgnore
 from pyrser.parsing.functors import Directive2
 from pyrser.parsing.functors import Decorator, DecoratorWrapper
-from pyrser.parsing.functors import Alt, Seq
-from pyrser.parsing.functors import Rep0N, Rep1N, RepOptional
+from pyrser.parsing.functors import Alt, Cut, Seq
+from pyrser.parsing.functors import Rep0N, Rep1N, RepOptional, Streamed
 from pyrser.parsing.functors import Capture, Scope, Bind, DeclNode
 from pyrser.parsing.functors import Error
 from pyrser.parsing.base import BasicParser, Parser, MetaBasicParser
-from pyrser.parsing.stream import Stream
+from pyrser.parsing.stream import Stream, FileStream, ChunkedStream
+from pyrser.parsing.charclass import CharClass
 from pyrser.parsing import ir
 
 
@@ -25,7 +27,11 @@ __all__ = [
     'CallTrue',
     'Capture',
     'Char',
+    'CharClass',
+    'ChunkedStream',
+    'Class',
     'Complement',
+    'Cut',
     'DeclNode',
     'Directive',
     'Directive2',
@@ -33,6 +39,7 @@ __all__ = [
     'Decorator',
     'DecoratorWrapper',
     'Error',
+    'FileStream',
     'Functor',
     'Hook',
     'LookAhead',
@@ -43,6 +50,7 @@ __all__ = [
     'PeekChar',
     'PeekText',
     'Range',
+    'Regex',
     'Rule',
     'Rep0N',
     'Rep1N',
@@ -51,6 +59,7 @@ __all__ = [
     'Seq',
     'SkipIgnore',
     'Stream',
+    'Streamed',
     'Text',
     'Until',
     'UntilChar'
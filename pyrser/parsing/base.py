@@ -3,6 +3,7 @@ import os
 
 from pyrser import meta
 from pyrser import error
+from pyrser.parsing import charclass
 from pyrser.parsing.stream import Stream
 from pyrser.parsing.stream import Tag
 from pyrser.parsing.node import Node
@@ -12,6 +13,100 @@ from pyrser.parsing.node import Node
 _MetaBasicParser = {}
 
 
+class DispatchMap(collections.ChainMap):
+    """ChainMap used to store rules and hooks of parsers.
+
+    Any modification increments a global generation counter, so the
+    flattened dispatch tables (see BasicParser.finalize) know when they
+    are outdated.
+    """
+    generation = 0
+
+    def __setitem__(self, key, value):
+        DispatchMap.generation += 1
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        DispatchMap.generation += 1
+        super().__delitem__(key)
+
+    def popitem(self):
+        DispatchMap.generation += 1
+        return super().popitem()
+
+    def pop(self, key, *args):
+        DispatchMap.generation += 1
+        return super().pop(key, *args)
+
+    def clear(self):
+        DispatchMap.generation += 1
+        super().clear()
+
+
+#: Marker of a key that was not set before a scoped write
+_unset = object()
+
+
+class ScopedDict(dict):
+    """dict whose modifications are undone when leaving a scope.
+
+    All the ScopedDict of a parser share the same undo log and the same
+    stack of scope marks: entering a scope only records the length of
+    the log, leaving it replays the log backward up to that mark.
+    Writes done outside of any scope are not logged.
+    """
+    __slots__ = ('_log', '_marks')
+
+    def __init__(self, log: list, marks: list):
+        self._log = log
+        self._marks = marks
+
+    def __setitem__(self, key, value):
+        if self._marks:
+            self._log.append((self, key, dict.get(self, key, _unset)))
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        value = dict.pop(self, key)
+        if self._marks:
+            self._log.append((self, key, value))
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        if self._marks:
+            self._log.append((self, key, value))
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        if self._marks:
+            for key in list(self):
+                del self[key]
+        else:
+            dict.clear(self)
+
+    def rebind(self, key, value):
+        """Replace the visible value of key, in the scope that set it."""
+        if key not in self:
+            raise KeyError(key)
+        dict.__setitem__(self, key, value)
+
+
 class MetaBasicParser(type):
     """Metaclass for all parser."""
     def __new__(metacls, name, bases, namespace):
@@ -54,8 +149,17 @@ class BasicParser(metaclass=MetaBasicParser):
 
     """
 
-    _rules = collections.ChainMap()
-    _hooks = collections.ChainMap()
+    _rules = DispatchMap()
+    _hooks = DispatchMap()
+    # packrat memoization of rule results (see eval_rule)
+    packrat = False
+    # number of memoized results kept before evicting the least recently used
+    packrat_size = 65536
+    # rules that must always be evaluated (i.e: with side effect hooks)
+    packrat_exclude = frozenset()
+    # characters a failed match may read after the deepest index reached,
+    # a cached result closer to an edit is evaluated again (see edit_memo)
+    packrat_lookahead = 64
 
     def __init__(
             self,
@@ -65,13 +169,28 @@ class BasicParser(metaclass=MetaBasicParser):
     ):
         self._ignores = [BasicParser.ignore_blanks]
         self._streams = [Stream(content, stream_name)]
-        self.rule_nodes = None
-        self.push_rule_nodes()
+        # undo log and scope marks shared by rule_nodes/tag_cache/id_cache
+        self._scope_log = []
+        self._scope_marks = []
+        self.rule_nodes = ScopedDict(self._scope_log, self._scope_marks)
+        self.tag_cache = ScopedDict(self._scope_log, self._scope_marks)
+        self.id_cache = ScopedDict(self._scope_log, self._scope_marks)
         self._lastIgnoreIndex = 0
         self._lastIgnore = False
         self._lastRule = ""
+        self._memo = collections.OrderedDict()
+        # rules without nodes, used by match_rule (see Grammar.recognize)
+        self._match_table = {}
+        # events pending in attempts and their EventHandler
+        self._events = []
+        self._attempts = 0
+        self._event_handler = None
+        # items of the streamed repetitions, taken by Grammar.iter_parse
+        self.streamed_items = []
+        self._item_sink = self.streamed_items.append
         self.raise_diagnostic = raise_diagnostic
         self.diagnostic = error.Diagnostic()
+        self.update_dispatch()
 
 ### READ ONLY @property
     def __bool__(self):
@@ -98,21 +217,19 @@ class BasicParser(metaclass=MetaBasicParser):
 
     def push_rule_nodes(self) -> bool:
         """Push context variable to store rule nodes."""
-        if self.rule_nodes is None:
-            self.rule_nodes = collections.ChainMap()
-            self.tag_cache = collections.ChainMap()
-            self.id_cache = collections.ChainMap()
-        else:
-            self.rule_nodes = self.rule_nodes.new_child()
-            self.tag_cache = self.tag_cache.new_child()
-            self.id_cache = self.id_cache.new_child()
+        self._scope_marks.append(len(self._scope_log))
         return True
 
     def pop_rule_nodes(self) -> bool:
         """Pop context variable that store rule nodes"""
-        self.rule_nodes = self.rule_nodes.parents
-        self.tag_cache = self.tag_cache.parents
-        self.id_cache = self.id_cache.parents
+        mark = self._scope_marks.pop()
+        log = self._scope_log
+        while len(log) > mark:
+            scope, key, value = log.pop()
+            if value is _unset:
+                dict.pop(scope, key, None)
+            else:
+                dict.__setitem__(scope, key, value)
         return True
 
     def value(self, n: Node) -> str:
@@ -138,12 +255,19 @@ class BasicParser(metaclass=MetaBasicParser):
         """Push a new Stream into the parser.
         All subsequent called functions will parse this new stream,
         until the 'popStream' function is called.
+        The content can be bytes-like, encoded in utf-8 (see Stream).
         """
-        self._streams.append(Stream(content, name))
+        self.push_stream(Stream(content, name))
+
+    def push_stream(self, stream: Stream):
+        """Push a Stream (i.e: a FileStream) into the parser."""
+        self._streams.append(stream)
+        self._memo.clear()
 
     def pop_stream(self):
         """Pop the last Stream pushed on to the parser stack."""
         s = self._streams.pop()
+        self._memo.clear()
         self.clean_tmp(s)
 
 ### VARIABLE PRIMITIVES
@@ -168,6 +292,36 @@ class BasicParser(metaclass=MetaBasicParser):
 
 ####
 
+    @classmethod
+    def finalize(cls) -> tuple:
+        """Flatten the rules and hooks of the class into dispatch tables.
+
+        Return a tuple (rules, hooks) of plain dicts, resolved once from
+        the ChainMaps.  Tables are cached on the class and rebuilt only
+        if a rule or a hook was modified since.
+        """
+        tables = cls.__dict__.get('_dispatch')
+        if (tables is not None
+                and tables[0] == DispatchMap.generation
+                and tables[1] is cls._rules
+                and tables[2] is cls._hooks):
+            return tables[3]
+        flat = []
+        for chain in (cls._rules, cls._hooks):
+            table = {}
+            for m in reversed(chain.maps):
+                table.update(m)
+            flat.append(table)
+        flat = tuple(flat)
+        cls._dispatch = (DispatchMap.generation, cls._rules, cls._hooks, flat)
+        return flat
+
+    def update_dispatch(self) -> bool:
+        """Refresh the dispatch tables used by eval_rule/eval_hook."""
+        self._rule_table, self._hook_table = self.finalize()
+        self._dispatch_generation = DispatchMap.generation
+        return True
+
     @classmethod
     def set_rules(cls, rules: dict) -> bool:
         """
@@ -216,7 +370,10 @@ class BasicParser(metaclass=MetaBasicParser):
         self.rule_nodes['_'] = n
         self.id_cache[id_n] = '_'
         # TODO: other behavior for  empty rules?
-        if name not in self.__class__._rules:
+        if self._dispatch_generation != DispatchMap.generation:
+            self.update_dispatch()
+        rule_to_eval = self._rule_table.get(name)
+        if rule_to_eval is None:
             self.diagnostic.notify(
                 error.Severity.ERROR,
                 "Unknown rule : %s" % name,
@@ -224,16 +381,147 @@ class BasicParser(metaclass=MetaBasicParser):
             )
             raise self.diagnostic
         self._lastRule = name
-        rule_to_eval = self.__class__._rules[name]
-        # TODO: add packrat cache here, same rule - same pos == same res
+        if self.packrat and self.is_memoizable(name):
+            return self.eval_memo(name, rule_to_eval)
         res = rule_to_eval(self)
         if res:
             res = self.rule_nodes['_']
         return res
 
+    def match_rule(self, name: str) -> bool:
+        """Evaluate a rule by name, without building its node.
+
+        Rules come from the table set by Grammar.recognize, they bypass
+        the packrat cache.
+        """
+        rule_to_eval = self._match_table.get(name)
+        if rule_to_eval is None:
+            self.diagnostic.notify(
+                error.Severity.ERROR,
+                "Unknown rule : %s" % name,
+                error.LocationInfo.from_stream(self._stream, is_error=True)
+            )
+            raise self.diagnostic
+        self._lastRule = name
+        return rule_to_eval(self)
+
+    def emit_event(self, event: str, *args) -> bool:
+        """Buffer an event, delivered once no attempt could retract it."""
+        self._events.append((event,) + args)
+        if self._attempts == 0:
+            self.flush_events()
+        return True
+
+    def flush_events(self) -> bool:
+        """Deliver the buffered events to the EventHandler."""
+        handler = self._event_handler
+        for event in self._events:
+            getattr(handler, event[0])(*event[1:])
+        self._events.clear()
+        return True
+
+    def stream_item(self, node: Node) -> bool:
+        """Give away an item of a streamed repetition.
+
+        The items are kept in streamed_items, but for Grammar.iter_parse.
+        """
+        self._item_sink(node)
+        return True
+
+    def is_memoizable(self, name: str) -> bool:
+        """Check that a rule is not excluded from the packrat cache.
+
+        Rules are excluded by their full or their short name.
+        """
+        exclude = self.packrat_exclude
+        return (name not in exclude
+                and name.rpartition('.')[2] not in exclude)
+
+    def eval_memo(self, name: str, rule_to_eval) -> Node:
+        """Evaluate a rule thru the packrat cache.
+
+        Same rule - same position - same ignore convention == same result.
+        The cache is bounded by packrat_size, least recently used entries
+        are evicted first.
+        """
+        cursor = self._stream._cursor
+        ignore = self._ignores[-1] if len(self._ignores) > 0 else None
+        key = (name, cursor._index, ignore)
+        memo = self._memo
+        if key in memo:
+            memo.move_to_end(key)
+            res, end, reach = memo[key]
+            if reach > cursor._maxindex:
+                cursor._maxindex = reach
+            if res:
+                cursor._index = end
+                self.rule_nodes['_'] = res
+                self.id_cache[id(res)] = '_'
+            return res
+        # track the deepest index read by the rule
+        maxindex = cursor._maxindex
+        cursor._maxindex = cursor._index
+        try:
+            res = rule_to_eval(self)
+        finally:
+            reach = max(cursor._maxindex, cursor._index)
+            cursor._maxindex = max(maxindex, reach)
+        if res:
+            res = self.rule_nodes['_']
+        memo[key] = (res, cursor._index, reach)
+        if len(memo) > self.packrat_size:
+            memo.popitem(last=False)
+        return res
+
+    def edit_memo(self, start: int, end: int, length: int) -> int:
+        """Update the packrat cache after an edit of the text.
+
+        The text between start and end was replaced by length characters.
+        Results that read the replaced text are dropped, the results after
+        it are shifted.  Return the number of results kept.
+        """
+        delta = length - (end - start)
+        limit = start - self.packrat_lookahead
+        memo = collections.OrderedDict()
+        for key, (res, stop, reach) in self._memo.items():
+            name, index, ignore = key
+            if index >= end:
+                memo[(name, index + delta, ignore)] = (
+                    res, stop + delta, reach + delta)
+            elif reach < limit:
+                memo[key] = (res, stop, reach)
+        self._memo = memo
+        return len(memo)
+
+    def cut(self) -> bool:
+        """Called by a cut, the enclosing sequence no longer backtracks.
+
+        The packrat results starting before the cut are dropped, so the
+        cache don't grow with the text already committed, and the values
+        cached by value() as well.
+        """
+        self._stream.value_cache.clear()
+        if self._memo:
+            index = self._stream._cursor._index
+            self._memo = collections.OrderedDict(
+                (k, v) for k, v in self._memo.items() if k[1] >= index)
+        return True
+
+    def cut_error(self):
+        """Raise the error of a sequence failing after a cut."""
+        self.diagnostic.notify(
+            error.Severity.ERROR,
+            "Parse error in '%s' after a cut" % self._lastRule,
+            error.LocationInfo.from_stream(self._stream, is_error=True)
+        )
+        raise self.diagnostic
+
     def eval_hook(self, name: str, ctx: list) -> Node:
         """Evaluate the hook by its name"""
-        if name not in self.__class__._hooks:
+        if self._dispatch_generation != DispatchMap.generation:
+            self.update_dispatch()
+        hook = self._hook_table.get(name)
+        if hook is None:
             # TODO: don't always throw error, could have return True by default
             self.diagnostic.notify(
                 error.Severity.ERROR,
@@ -242,7 +530,7 @@ class BasicParser(metaclass=MetaBasicParser):
             )
             raise self.diagnostic
         self._lastRule = '#' + name
-        res = self.__class__._hooks[name](self, *ctx)
+        res = hook(self, *ctx)
         if type(res) is not bool:
             raise TypeError("Your hook %r didn't return a bool value" % name)
         return res
@@ -256,11 +544,8 @@ class BasicParser(metaclass=MetaBasicParser):
 
     def peek_text(self, text: str) -> bool:
         """Same as readText but doesn't consume the stream."""
-        start = self._stream.index
-        stop = start + len(text)
-        if stop > self._stream.eos_index:
-            return False
-        return self._stream[self._stream.index:stop] == text
+        stream = self._stream
+        return stream._content.startswith(text, stream.index)
 
     def one_char(self) -> bool:
         """Read one byte in stream"""
@@ -286,20 +571,31 @@ class BasicParser(metaclass=MetaBasicParser):
         """
         Consume the stream while the c byte is not read, else return false
         ex : if stream is " abcdef ", read_until("d"); consume "abcd".
+        A character following the inhibitor is never read as c.
+        The stream is searched with the find of its content, not
+        character by character.
         """
         if self.read_eof():
             return False
-        self._stream.save_context()
-        while not self.read_eof():
-            if self.peek_char(inhibitor):
-                # Delete inhibitor and inhibited character
-                self.one_char()
-                self.one_char()
-            if self.peek_char(c):
-                self._stream.incpos()
-                return self._stream.validate_context()
-            self._stream.incpos()
-        return self._stream.restore_context()
+        stream = self._stream
+        content = stream._content
+        index = stream.index
+        while True:
+            end = content.find(c, index)
+            if end == -1:
+                return False
+            if inhibitor:
+                escape = content.find(inhibitor, index, end)
+                if escape != -1:
+                    # skip the inhibitor and the inhibited character
+                    index = escape + stream.text_length(inhibitor)
+                    if stream._width is None or index >= len(content):
+                        index += 1
+                    else:
+                        index += stream._width(index)
+                    continue
+            stream.incpos(end + stream.text_length(c) - stream.index)
+            return True
 
     def read_until_eof(self) -> bool:
         """Consume all the stream. Same as EOF in BNF."""
@@ -322,7 +618,7 @@ class BasicParser(metaclass=MetaBasicParser):
             return False
         self._stream.save_context()
         if self.peek_text(text):
-            self._stream.incpos(len(text))
+            self._stream.incpos(self._stream.text_length(text))
             return self._stream.validate_context()
         return self._stream.restore_context()
 
@@ -339,6 +635,25 @@ class BasicParser(metaclass=MetaBasicParser):
             return True
         return False
 
+    def read_class(self, chars: charclass.CharClass,
+                   many: bool=False) -> bool:
+        """
+        Consume head character if it is in the class chars,
+        or all the following characters of the class if many,
+        else return False.
+        Same as { 'a'..'z' '_' } and { 'a'..'z' '_' }+ in BNF
+        """
+        stream = self._stream
+        index = stream.index
+        if many:
+            end = chars.scan(stream, index)
+        else:
+            end = chars.match(stream, index)
+        if end == index:
+            return False
+        stream.incpos(end - index)
+        return True
+
 ### IGNORE CONVENTION
 
     def ignore_null(self) -> bool:
@@ -349,13 +664,8 @@ class BasicParser(metaclass=MetaBasicParser):
 
     def ignore_blanks(self) -> bool:
         """Consume whitespace characters."""
-        self._stream.save_context()
-        if not self.read_eof() and self._stream.peek_char in " \t\v\f\r\n":
-            while (not self.read_eof()
-                   and self._stream.peek_char in " \t\v\f\r\n"):
-                self._stream.incpos()
-            return self._stream.validate_context()
-        return self._stream.validate_context()
+        self.read_class(charclass.BLANKS, True)
+        return True
 
     def push_ignore(self, ignoreConvention) -> bool:
         """Set the ignore convention"""
@@ -404,12 +714,10 @@ def bind(self, dst: str, src: Node) -> bool:
 
     """
 
-    for m in self.rule_nodes.maps:
-        for k, v in m.items():
-            if k == dst:
-                m[k] = src
-                return True
-    raise Exception('%s not found' % dst)
+    if dst not in self.rule_nodes:
+        raise Exception('%s not found' % dst)
+    self.rule_nodes.rebind(dst, src)
+    return True
 
 
 @meta.rule(BasicParser, "Base.read_char")
@@ -446,19 +754,7 @@ def read_hex_integer(self) -> bool:
             [ '0'..'9' | 'a'..'f' | 'A'..'F' ]+
         ]
     """
-    if self.read_eof():
-        return False
-    self._stream.save_context()
-    c = self._stream.peek_char
-    if c.isdigit() or ('a' <= c.lower() and c.lower() <= 'f'):
-        self._stream.incpos()
-        while not self.read_eof():
-            c = self._stream.peek_char
-            if not (c.isdigit() or ('a' <= c.lower() and c.lower() <= 'f')):
-                break
-            self._stream.incpos()
-        return self._stream.validate_context()
-    return self._stream.restore_context()
+    return self.read_class(charclass.HEX_DIGITS, True)
 
 
 @meta.rule(Parser, "Base.oct_num")
@@ -471,19 +767,7 @@ def read_oct_integer(self) -> bool:
             [ '0'..'7' ]+
         ]
     """
-    if self.read_eof():
-        return False
-    self._stream.save_context()
-    c = self._stream.peek_char
-    if c.isdigit() and 0 <= int(c) and int(c) <= 7:
-        self._stream.incpos()
-        while not self.read_eof():
-            c = self._stream.peek_char
-            if not (c.isdigit() and 0 <= int(c) and int(c) <= 7):
-                break
-            self._stream.incpos()
-        return self._stream.validate_context()
-    return self._stream.restore_context()
+    return self.read_class(charclass.OCT_DIGITS, True)
 
 
 @meta.rule(Parser, "Base.num")
@@ -497,19 +781,7 @@ def read_integer(self) -> bool:
         ]
 
     """
-    if self.read_eof():
-        return False
-    self._stream.save_context()
-    c = self._stream.peek_char
-    if c.isdigit():
-            self._stream.incpos()
-            while not self.read_eof():
-                c = self._stream.peek_char
-                if not c.isdigit():
-                    break
-                self._stream.incpos()
-            return self._stream.validate_context()
-    return self._stream.restore_context()
+    return self.read_class(charclass.DIGITS, True)
 
 
 # `Base.id`
@@ -524,19 +796,13 @@ def read_identifier(self) -> bool:
         ]
 
     """
-    if self.read_eof():
+    stream = self._stream
+    index = stream.index
+    end = charclass.ID_START.match(stream, index)
+    if end == index:
         return False
-    self._stream.save_context()
-    c = self._stream.peek_char
-    if c.isalpha() or c == '_':
-            self._stream.incpos()
-            while not self.read_eof():
-                c = self._stream.peek_char
-                if not (c.isalpha() or c.isdigit() or c == '_'):
-                    break
-                self._stream.incpos()
-            return self._stream.validate_context()
-    return self._stream.restore_context()
+    stream.incpos(charclass.ID_CONTINUE.scan(stream, end) - index)
+    return True
 
 
 @meta.rule(Parser, "Base.string")
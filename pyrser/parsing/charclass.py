@@ -0,0 +1,123 @@
+# Classes of characters, scanned without a call by character
+import bisect
+import re
+
+from pyrser.parsing.stream import ByteText, Stream
+
+
+class CharClass:
+    """A set of characters, given by ranges (first, last).
+
+    An ascii character is looked up in a table, a non ascii one is
+    checked by wide (by default, its presence in the ranges).  The runs
+    of ascii characters of the class are scanned by a regular expression.
+    """
+
+    def __init__(self, ranges: [(str, str)], wide=None):
+        self.ranges = tuple(ranges)
+        table = bytearray(128)
+        wide_ranges = []
+        for first, last in self.ranges:
+            if len(first) != 1 or len(last) != 1:
+                raise ValueError("Bounds of a class must be characters, "
+                                 "got %r..%r" % (first, last))
+            for o in range(ord(first), min(ord(last) + 1, 128)):
+                table[o] = 1
+            if ord(last) >= 128:
+                wide_ranges.append((max(first, '\x80'), last))
+        self.table = bytes(table)
+        self.ascii = ''.join(chr(o) for o in range(128) if table[o])
+        wide_ranges.sort()
+        self._firsts = [first for first, _ in wide_ranges]
+        self._wide_ranges = wide_ranges
+        # the class is made only of its ranges
+        self.exact = wide is None
+        # could hold non ascii characters
+        self.has_wide = wide is not None or len(wide_ranges) > 0
+        if wide is None:
+            wide = self._in_wide_ranges
+        self.wide = wide
+        members = ''.join(re.escape(c) for c in self.ascii)
+        self._run = re.compile('[%s]*' % members if members else '')
+        self._byte_run = re.compile(
+            ('[%s]*' % members if members else '').encode('ascii'))
+
+    def _in_wide_ranges(self, c: str) -> bool:
+        n = bisect.bisect_right(self._firsts, c)
+        return n > 0 and c <= self._wide_ranges[n - 1][1]
+
+    def __contains__(self, c: str) -> bool:
+        o = ord(c)
+        if o < 128:
+            return self.table[o] == 1
+        return self.wide(c)
+
+    def match(self, stream: Stream, index: int) -> int:
+        """Index after the character at index if in the class, else index.
+        """
+        content = stream._content
+        try:
+            c = content[index]
+        except IndexError:
+            return index
+        if c not in self:
+            return index
+        if stream._width is None:
+            return index + 1
+        return index + stream._width(index)
+
+    def scan(self, stream: Stream, index: int) -> int:
+        """Index of the first character after index not in the class."""
+        content = stream._content
+        if type(content) is str:
+            size = len(content)
+            while True:
+                index = self._run.match(content, index).end()
+                if (index == size or ord(content[index]) < 128
+                        or not self.wide(content[index])):
+                    return index
+                index += 1
+        if isinstance(content, ByteText):
+            buf = content.view(0, len(content))
+            while True:
+                index = self._byte_run.match(buf, index).end()
+                if index == len(buf) or buf[index] < 128:
+                    return index
+                c = content[index]
+                if not self.wide(c):
+                    return index
+                index += content.width(index)
+        # decoded by block or pulled by chunk (see stream)
+        while True:
+            try:
+                c = content[index]
+            except IndexError:
+                return index
+            if c not in self:
+                return index
+            index += 1
+
+    def to_regex(self) -> str:
+        """The pattern of a character of the class, None if not exact."""
+        if not self.exact:
+            return None
+        ranges = [(first, last) for first, last in self.ranges
+                  if first <= last]
+        if len(ranges) == 0:
+            return '(?!)'
+        return '[%s]' % ''.join(
+            re.escape(first) if first == last
+            else '%s-%s' % (re.escape(first), re.escape(last))
+            for first, last in ranges)
+
+
+#: classes of the rules of Base, non ascii characters are accepted as
+#: by str.isdigit and str.isalpha
+DIGITS = CharClass([('0', '9')], str.isdigit)
+HEX_DIGITS = CharClass([('0', '9'), ('a', 'f'), ('A', 'F')], str.isdigit)
+OCT_DIGITS = CharClass([('0', '7')],
+                       lambda c: c.isdecimal() and int(c) < 8)
+ID_START = CharClass([('a', 'z'), ('A', 'Z'), ('_', '_')], str.isalpha)
+ID_CONTINUE = CharClass([('a', 'z'), ('A', 'Z'), ('0', '9'), ('_', '_')],
+                        lambda c: c.isalpha() or c.isdigit())
+BLANKS = CharClass([(c, c) for c in " \t\v\f\r\n"])
@@ -1,7 +1,9 @@
 import inspect
+import re
 import types
 from pyrser import meta, error
 from pyrser.parsing.base import BasicParser
+from pyrser.parsing.charclass import CharClass
 from pyrser.parsing.node import Node
 from pyrser.parsing.stream import Tag
 
@@ -20,7 +22,13 @@ class Functor:
     def do_call(self, parser: BasicParser) -> Node:
         pass
 
-    def __call__(self, parser: BasicParser) -> Node:
+    def direct_call(self, parser: BasicParser) -> Node:
+        """Forward the call to the functor, used when no decorator is active.
+        """
+        return self.do_call(parser)
+
+    def decorated_call(self, parser: BasicParser) -> Node:
+        """Call the functor thru all active decorators."""
         global _decorators
         # call the begin methods in order
         for i in range(0, len(_decorators)):
@@ -32,6 +40,30 @@ class Functor:
             _decorators[i].end(res, parser, self)
         return res
 
+    __call__ = direct_call
+
+
+def push_decorator(decorator: 'DecoratorWrapper'):
+    """Activate a decorator.
+
+    All functors are called thru decorated_call while a decorator is active.
+    """
+    global _decorators
+    _decorators.append(decorator)
+    Functor.__call__ = Functor.decorated_call
+
+
+def pop_decorator() -> 'DecoratorWrapper':
+    """Deactivate the last activated decorator.
+
+    All functors are called thru direct_call when no decorator is active.
+    """
+    global _decorators
+    decorator = _decorators.pop()
+    if len(_decorators) == 0:
+        Functor.__call__ = Functor.direct_call
+    return decorator
+
 
 class Directive2(Functor):
     def __init__(self, name, param: [(object, type)], pt: Functor):
@@ -128,6 +160,23 @@ class Range(Functor, Leaf):
         return parser.read_range(self.begin, self.end)
 
 
+class Class(Functor, Leaf):
+    """ { 'a'..'z' '_' } bnf primitive functor.
+
+    With many, the run of characters of the class ({ 'a'..'z' }+) is read
+    by a single scan, or nothing when optional ({ 'a'..'z' }*).
+    """
+
+    def __init__(self, chars: CharClass, many: bool=False,
+                 optional: bool=False):
+        self.chars = chars
+        self.many = many
+        self.optional = optional
+
+    def do_call(self, parser: BasicParser) -> bool:
+        return parser.read_class(self.chars, self.many) or self.optional
+
+
 class UntilChar(Functor, Leaf):
     """ ->'A' bnf primitive functor. """
 
@@ -138,8 +187,80 @@ class UntilChar(Functor, Leaf):
         return parser.read_until(self.char)
 
 
+class Regex(Functor, Leaf):
+    """ Terminal subtree matched by a compiled regular expression.
+
+    patterns map an ignore convention to the pattern matching pt with this
+    convention, pt is called for the others (see passes/regex_fusion.py).
+    Capturing groups of the patterns are the skipped ignored characters.
+
+    A match doesn't tell how far pt would have read, so pt is called
+    again when it could have read past the start of a failed match or
+    past the end of a successful one.  probes map a convention to the
+    classes of characters (or None) that pt could read at the start and
+    anywhere, checked at these positions.
+    """
+
+    def __init__(self, pt: Functor, patterns: dict, probes: dict=None):
+        self.pt = pt
+        self.patterns = patterns
+        self.probes = probes or {}
+        self.regexes = {}
+        for convention, pattern in patterns.items():
+            self.regexes[convention] = re.compile(pattern)
+
+    def do_call(self, parser: BasicParser) -> bool:
+        convention = BasicParser.ignore_null
+        if len(parser._ignores) > 0:
+            convention = parser._ignores[-1]
+        regex = self.regexes.get(convention)
+        stream = parser._stream
+        content = stream._content
+        # a FileStream content can't be matched by re
+        if regex is None or _decorators or type(content) is not str:
+            return self.pt(parser)
+        starts, reads = self.probes.get(convention, (None, None))
+        index = stream.index
+        m = regex.match(content, index)
+        if m is None:
+            if (starts is not None and index < len(content)
+                    and content[index] in starts):
+                # track how far pt read before failing
+                return self.pt(parser)
+            return False
+        end = m.end()
+        if (reads is not None and end < len(content)
+                and content[end] in reads):
+            return self.pt(parser)
+        stream.incpos(end - index)
+        # keep track of the last ignore, as skip_ignore
+        last = max((end for begin, end in m.regs[1:]), default=-1)
+        if last >= 0:
+            parser._lastIgnoreIndex = last
+        return True
+
+
+class Cut(Functor, Leaf):
+    """ ^ bnf primitive functor.
+
+    Commit the enclosing sequence, see Seq.
+    """
+
+    def do_call(self, parser: BasicParser) -> bool:
+        return parser.cut()
+
+
 class Seq(Functor):
-    """ A B C bnf primitive as a functor. """
+    """ A B C bnf primitive as a functor.
+
+    After a Cut, the sequence can't backtrack: its saved context is
+    dropped and a failure of the following clauses is a parse error,
+    so the enclosing Alt never tries the next alternatives.  A Streamed
+    repetition commits the sequence as a Cut before it.
+    """
+
+    # contain a Cut or a Streamed
+    cut = False
 
     def __init__(self, *ptlist: Functor):
         Functor.__init__(self)
@@ -152,6 +273,8 @@ class Seq(Functor):
                 self.ptlist.append(SkipIgnore())
         if not isinstance(self.ptlist[0], SkipIgnore):
             self.ptlist.insert(0, SkipIgnore())
+        self.cut = any(isinstance(pt, (Cut, Streamed))
+                       for pt in self.ptlist)
 
     def __getitem__(self, idx) -> Functor:
         """ Hide SkipIgnore object from outside """
@@ -162,12 +285,28 @@ class Seq(Functor):
         return self.ptlist[idx]
 
     def do_call(self, parser: BasicParser) -> bool:
+        if self.cut:
+            return self.committed_call(parser)
         parser._stream.save_context()
         for pt in self.ptlist:
             if not pt(parser):
                 return parser._stream.restore_context()
         return parser._stream.validate_context()
 
+    def committed_call(self, parser: BasicParser) -> bool:
+        parser._stream.save_context()
+        committed = False
+        for pt in self.ptlist:
+            if not committed and type(pt) in (Cut, Streamed):
+                # nothing could go back before the cut
+                parser._stream.validate_context()
+                committed = True
+            if not pt(parser):
+                if committed:
+                    parser.cut_error()
+                return parser._stream.restore_context()
+        return True
+
 
 class Scope(Functor):
     """ functor to wrap SCOPE/rule directive or just []. """
@@ -236,10 +375,17 @@ class Complement(Functor):
                 self.pt.ptlist.pop(0)
             if isinstance(self.pt.ptlist[-1], SkipIgnore):
                 self.pt.ptlist.pop()
+        self.literal = literal(self.pt)
 
     def do_call(self, parser: BasicParser) -> bool:
         if parser.read_eof():
             return False
+        if self.literal is not None and not _decorators:
+            stream = parser._stream
+            if stream._content.startswith(self.literal, stream.index):
+                return False
+            stream.incpos()
+            return True
         parser._stream.save_context()
         res = self.pt(parser)
         if not res:
@@ -249,6 +395,21 @@ class Complement(Functor):
         return False
 
 
+def literal(pt: Functor) -> str:
+    """The text read by pt if it is a Char or a Text, else None."""
+    if isinstance(pt, Seq) and len(pt.ptlist) == 1:
+        pt = pt.ptlist[0]
+    if type(pt) is Char:
+        text = pt.char
+    elif type(pt) is Text:
+        text = pt.text
+    else:
+        return None
+    if len(text) == 0:
+        return None
+    return text
+
+
 class Until(Functor):
     """ ->A bnf primitive as a functor. """
 
@@ -261,7 +422,19 @@ class Until(Functor):
             if isinstance(self.pt.ptlist[-1], SkipIgnore):
                 self.pt.ptlist.pop()
 
+        self.literal = literal(self.pt)
+
     def do_call(self, parser: BasicParser) -> bool:
+        if self.literal is not None and not _decorators:
+            # searched with the find of the content
+            stream = parser._stream
+            end = stream._content.find(self.literal, stream.index)
+            if end == -1:
+                parser.undo_last_ignore()
+                return False
+            stream.incpos(end + stream.text_length(self.literal)
+                          - stream.index)
+            return True
         parser._stream.save_context()
         while not parser.read_eof():
             res = self.pt(parser)
@@ -365,14 +538,23 @@ class Alt(Functor):
     def __init__(self, *ptlist: Seq):
         Functor.__init__(self)
         self.ptlist = ptlist
+        # JumpTable by parser class (see passes/first_set.py)
+        self.jump_tables = {}
 
     def __getitem__(self, idx) -> Functor:
         return self.ptlist[idx]
 
     def do_call(self, parser: BasicParser) -> Node:
+        ptlist = self.ptlist
+        if self.jump_tables and not _decorators:
+            # only try alternatives that could start at current character,
+            # decorators (i.e: trace) still see every attempt
+            table = self.jump_tables.get(parser.__class__)
+            if table is not None:
+                ptlist = table.candidates(parser)
         # save result of current rule
         parser.push_rule_nodes()
-        for pt in self.ptlist:
+        for pt in ptlist:
             parser._stream.save_context()
             parser.push_rule_nodes()
             res = pt(parser)
@@ -387,6 +569,20 @@ class Alt(Functor):
         return False
 
 
+def repeat(pt: Functor, parser: BasicParser) -> bool:
+    """Call pt until it fails, each repetition in its own scope.
+
+    Nodes captured by a repetition are undone before the next one, so
+    long repetitions don't accumulate them.
+    """
+    while True:
+        parser.push_rule_nodes()
+        res = pt(parser)
+        parser.pop_rule_nodes()
+        if not res:
+            return True
+
+
 class RepOptional(Functor):
     """ []? bnf primitive as a functor. """
     def __init__(self, pt: Seq):
@@ -416,12 +612,8 @@ class Rep0N(Functor):
             self.pt = Seq(self.pt)
 
     def do_call(self, parser: BasicParser) -> bool:
-        parser._stream.save_context()
-        parser.push_rule_nodes()
-        while self.pt(parser):
-            pass
-        parser.pop_rule_nodes()
-        return parser._stream.validate_context()
+        # always succeed, no context to restore
+        return repeat(self.pt, parser)
 
 
 class Rep1N(Functor):
@@ -438,15 +630,49 @@ class Rep1N(Functor):
     def do_call(self, parser: BasicParser) -> bool:
         parser._stream.save_context()
         parser.push_rule_nodes()
-        if self.pt(parser):
-            while self.pt(parser):
-                pass
-            parser.pop_rule_nodes()
-            return parser._stream.validate_context()
+        res = self.pt(parser)
         parser.pop_rule_nodes()
+        if res:
+            # only the first repetition could be restored
+            parser._stream.validate_context()
+            return repeat(self.pt, parser)
         return parser._stream.restore_context()
 
 
+class Streamed(Functor):
+    """ @stream("name") []* or []+ bnf primitive as a functor.
+
+    The node captured by name in each repetition is given to
+    parser.stream_item as soon as the repetition matched, then forgotten
+    with the scope of the repetition.  The enclosing sequence is
+    committed before it, see Seq.
+    """
+
+    def __init__(self, tagname: str, pt: Functor):
+        Functor.__init__(self)
+        if not isinstance(pt, (Rep0N, Rep1N)):
+            raise TypeError("@stream must be followed by a repetition")
+        self.tagname = tagname
+        self.pt = pt
+
+    def do_call(self, parser: BasicParser) -> bool:
+        item = self.pt.pt
+        parser.cut()
+        n = 0
+        while True:
+            parser.push_rule_nodes()
+            res = item(parser)
+            if res:
+                node = parser.rule_nodes.get(self.tagname)
+            parser.pop_rule_nodes()
+            if not res:
+                return n > 0 or type(self.pt) is Rep0N
+            parser.stream_item(node)
+            # nothing could go back before the item
+            parser.cut()
+            n += 1
+
+
 class Error(Functor):
     """ Raise an error. """
 
@@ -712,9 +938,10 @@ class Decorator(Functor):
 
         decorator = self.decorator_class(*valueparam)
 
-        global _decorators
-        _decorators.append(decorator)
-        res = self.pt(parser)
-        _decorators.pop()
+        push_decorator(decorator)
+        try:
+            res = self.pt(parser)
+        finally:
+            pop_decorator()
 
         return res
@@ -1,4 +1,14 @@
+import array
+import bisect
+import codecs
 import collections
+import mmap
+import re
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 """An immutable position in a Stream.
@@ -10,16 +20,45 @@ col_offset is the column offset of the position on the line.
 Position = collections.namedtuple('Position', 'index lineno col_offset')
 
 
+def eol_offsets(content: str) -> array.array:
+    """Build the sorted array of the indexes of all newlines in content."""
+    if isinstance(content, (MappedText, ByteText)):
+        return content.eol_offsets()
+    res = array.array('q')
+    if numpy is not None and len(content) > 0 and content.isascii():
+        # one byte per character, so numpy indexes are stream indexes
+        chars = numpy.frombuffer(content.encode('ascii'), numpy.uint8)
+        res.frombytes(numpy.flatnonzero(chars == 10).astype('q').tobytes())
+        return res
+    idx = content.find('\n')
+    while idx != -1:
+        res.append(idx)
+        idx = content.find('\n', idx + 1)
+    return res
+
+
 class Cursor:
     """A mutable position in a Stream.
 
     It can be initialized or set from an immutable Position.
+    Only the index is tracked, the line number and the column offset
+    are computed on demand from the offsets of the newlines (eol).
+    The position given at initialization is the origin of the cursor.
     """
-    def __init__(self, position: Position=Position(0, 1, 1)):
+    def __init__(self, position: Position=Position(0, 1, 1), eol=()):
         self._maxindex = self._index = position.index
-        self._maxcol = self._col_offset = position.col_offset
-        self._maxline = self._lineno = position.lineno
-        self._eol = []
+        self._origin = position
+        self._eol = eol
+
+    def line_info(self, index: int) -> (int, int):
+        """Compute the line number and column offset of an index."""
+        eol = self._eol
+        origin = self._origin
+        nline = bisect.bisect_left(eol, index)
+        nline_origin = bisect.bisect_left(eol, origin.index)
+        if nline == nline_origin:
+            return (origin.lineno, origin.col_offset + index - origin.index)
+        return (origin.lineno + nline - nline_origin, index - eol[nline - 1])
 
     @property
     def index(self) -> int:
@@ -29,56 +68,37 @@ class Cursor:
     @property
     def lineno(self) -> int:
         """The current line number of the cursor."""
-        return self._lineno
+        return self.line_info(self._index)[0]
 
     @property
     def col_offset(self) -> int:
         """The current column offset of the cursor."""
-        return self._col_offset
+        return self.line_info(self._index)[1]
 
     @property
     def position(self) -> Position:
         """The current position of the cursor."""
-        return Position(self._index, self._lineno, self._col_offset)
+        return Position(self._index, *self.line_info(self._index))
 
     @position.setter
     def position(self, position: Position):
         self._index = position.index
-        self._lineno = position.lineno
-        self._col_offset = position.col_offset
 
     @property
     def max_readed_position(self) -> Position:
         """The index of the deepest character readed."""
-        return Position(self._maxindex, self._maxline, self._maxcol)
+        return Position(self._maxindex, *self.line_info(self._maxindex))
 
     def step_next_char(self):
         """Puts the cursor on the next character."""
         self._index += 1
-        self._col_offset += 1
         if self._index > self._maxindex:
             self._maxindex = self._index
-            self._maxcol = self._col_offset
-            self._maxline = self._lineno
 
     def step_prev_char(self):
         """Puts the cursor on the previous character."""
-        self._col_offset -= 1
         self._index -= 1
 
-    def step_next_line(self):
-        """Sets cursor as beginning of next line."""
-        self._eol.append(self.position)
-        self._lineno += 1
-        self._col_offset = 0
-
-    def step_prev_line(self):
-        """Sets cursor as end of previous line."""
-        #TODO(bps): raise explicit error for unregistered eol
-        #assert self._eol[-1].index == self._index
-        if len(self._eol) > 0:
-            self.position = self._eol.pop()
-
 
 class Tag:
     """Provide capture facilities"""
@@ -104,15 +124,36 @@ class Tag:
     def __repr__(self) -> str:
         return "strid:%d %s:%s" % (id(self._stream), self._begin, self._end)
 
+    def view(self):
+        """The captured bytes of a byte stream, as a memoryview.
+
+        Nothing is copied or decoded.  The captured text for other streams.
+        """
+        return self._stream.view(self._begin, self._end)
+
 
 class Stream:
-    """Helps keep track of stream processing progress."""
-    def __init__(self, content: str=None, name: str=None):
+    """Helps keep track of stream processing progress.
+
+    The content is a str, or bytes-like (bytes, bytearray, memoryview or
+    mmap) encoded in encoding.  Bytes are parsed in place thru a ByteText,
+    the indexes of the stream are then in bytes.
+    """
+    # byte length of the character at an index, None if always 1
+    _width = None
+
+    def __init__(self, content: str='', name: str=None,
+                 encoding: str='utf-8'):
+        if isinstance(content, BYTES):
+            content = ByteText(content, encoding)
+            self._width = content.width
+            self._cursor = ByteCursor(content)
+        else:
+            self._cursor = Cursor(eol=eol_offsets(content))
         self._content = content
         self._len = len(content)
         self._name = name
         self._contexts = []
-        self._cursor = Cursor()
         # use to store begin:end => value
         self.value_cache = dict()
 
@@ -135,7 +176,7 @@ class Stream:
     @property
     def index(self) -> int:
         """The current position index."""
-        return self._cursor.position.index
+        return self._cursor._index
 
     @property
     def lineno(self) -> int:
@@ -150,7 +191,7 @@ class Stream:
     @property
     def peek_char(self) -> str:
         """The current position character value."""
-        return self._content[self._cursor.index]
+        return self._content[self._cursor._index]
 
     @property
     def last_readed_line(self) -> str:
@@ -168,45 +209,532 @@ class Stream:
         last_line = self._content[prevline + 1:nextline]
         return last_line
 
-    def incpos(self, length: int=1) -> int:
-        """Increment the cursor to the next character."""
-        if length < 0:
+    def view(self, begin: int, end: int) -> str or memoryview:
+        """The content between begin and end, without decoding bytes."""
+        if self._width is None:
+            return self._content[begin:end]
+        return self._content.view(begin, end)
+
+    def text_length(self, text: str) -> int:
+        """The number of indexes taken by text in the stream."""
+        if self._width is None:
+            return len(text)
+        return len(self._content.encode(text))
+
+    def incpos(self, length: int=None) -> int:
+        """Increment the cursor of length indexes, one character by default.
+        """
+        cursor = self._cursor
+        if length is None:
+            length = 1 if self._width is None else self._width(cursor._index)
+        elif length < 0:
             raise ValueError("length must be positive")
-        i = 0
-        while (i < length):
-            if self._cursor.index < self._len:
-                if self.peek_char == '\n':
-                    self._cursor.step_next_line()
-                self._cursor.step_next_char()
-            i += 1
-        return self._cursor.index
+        index = cursor._index + length
+        if index > self._len:
+            index = self._len
+        cursor._index = index
+        if index > cursor._maxindex:
+            cursor._maxindex = index
+        return index
 
     def decpos(self, length: int=1) -> int:
+        """Decrement the cursor of length characters."""
         if length < 0:
             raise ValueError("length must be positive")
-        if (self._cursor.index - length) < 0:
+        cursor = self._cursor
+        index = cursor._index - length
+        if index < 0:
             raise ValueError("can't go before first byte")
-        i = 0
-        while (i < length):
-            if self.peek_char == '\n':
-                self._cursor.step_prev_line()
-                i += 1
-            else:
-                self._cursor.step_prev_char()
-            i += 1
-        return self._cursor.index
+        cursor._index = index
+        return index
 
     def save_context(self) -> bool:
-        """Save current position."""
-        self._contexts.append(self._cursor.position)
+        """Save current position.
+
+        Only the index is saved, so the stack of contexts is a flat list
+        of int and saving or restoring a context allocates nothing.
+        """
+        self._contexts.append(self._cursor._index)
         return True
 
     def restore_context(self) -> bool:
         """Rollback to previous saved position."""
-        self._cursor.position = self._contexts.pop()
+        self._cursor._index = self._contexts.pop()
         return False
 
     def validate_context(self) -> bool:
         """Discard previous saved position."""
         del self._contexts[-1]
         return True
+
+
+#: encodings with one byte by character, indexed without decoding
+SINGLE_BYTE = frozenset(['ascii', 'iso8859-1'])
+#: bytes that are not ascii characters
+NOT_ASCII = re.compile(b'[\\x80-\\xff]')
+
+
+class MappedText:
+    """Read only str like view of an encoded buffer (i.e: a mmap).
+
+    The text is decoded on demand by blocks of BLOCK bytes, only the
+    last KEEP blocks are kept.  Single byte encodings, and utf-8 buffers
+    that are pure ascii, are indexed directly.  Others are scanned once
+    to record where each block starts, in characters and in bytes.
+    """
+    BLOCK = 1 << 16
+    KEEP = 4
+
+    def __init__(self, buf, encoding: str='utf-8'):
+        self._buf = buf
+        self._encoding = codecs.lookup(encoding).name
+        self._blocks = collections.OrderedDict()
+        # the last accessed block, for sequential reads
+        self._lo = self._hi = 0
+        self._text = ''
+        self._eol = None
+        if (self._encoding in SINGLE_BYTE
+                or (self._encoding == 'utf-8'
+                    and NOT_ASCII.search(buf) is None)):
+            self._chars = None
+            self._len = len(buf)
+        else:
+            self._scan()
+
+    def _scan(self):
+        """Record the starts of the blocks and the newlines."""
+        decoder = codecs.getincrementaldecoder(self._encoding)()
+        self._chars = array.array('q', [0])
+        self._bytes = array.array('q', [0])
+        self._eol = array.array('q')
+        buf = self._buf
+        nchars = 0
+        nbytes = 0
+        while nbytes < len(buf):
+            chunk = buf[nbytes:nbytes + self.BLOCK]
+            final = nbytes + len(chunk) >= len(buf)
+            text = decoder.decode(chunk, final)
+            # bytes of an incomplete character start the next block
+            nbytes += len(chunk) - len(decoder.getstate()[0])
+            decoder.reset()
+            idx = text.find('\n')
+            while idx != -1:
+                self._eol.append(nchars + idx)
+                idx = text.find('\n', idx + 1)
+            nchars += len(text)
+            self._chars.append(nchars)
+            self._bytes.append(nbytes)
+        self._len = nchars
+
+    def eol_offsets(self) -> array.array:
+        """Return the sorted array of the indexes of all newlines."""
+        if self._eol is None:
+            self._eol = array.array('q')
+            buf = self._buf
+            idx = buf.find(b'\n')
+            while idx != -1:
+                self._eol.append(idx)
+                idx = buf.find(b'\n', idx + 1)
+        return self._eol
+
+    def _block(self, index: int) -> str:
+        """Make the block holding index the last accessed block."""
+        if self._chars is None:
+            n = index // self.BLOCK
+            lo = n * self.BLOCK
+            hi = min(lo + self.BLOCK, self._len)
+            begin, end = lo, hi
+        else:
+            n = bisect.bisect_right(self._chars, index) - 1
+            lo, hi = self._chars[n], self._chars[n + 1]
+            begin, end = self._bytes[n], self._bytes[n + 1]
+        text = self._blocks.get(n)
+        if text is None:
+            text = self._buf[begin:end].decode(self._encoding)
+            self._blocks[n] = text
+            if len(self._blocks) > self.KEEP:
+                self._blocks.popitem(last=False)
+        else:
+            self._blocks.move_to_end(n)
+        self._lo, self._hi, self._text = lo, hi, text
+        return text
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, key: int or slice) -> str:
+        if type(key) is int and self._lo <= key < self._hi:
+            return self._text[key - self._lo]
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._len)
+            if step != 1:
+                return ''.join(self[i] for i in range(start, stop, step))
+            parts = []
+            while start < stop:
+                if not self._lo <= start < self._hi:
+                    self._block(start)
+                end = min(stop, self._hi)
+                parts.append(self._text[start - self._lo:end - self._lo])
+                start = end
+            return ''.join(parts)
+        if key < 0:
+            key += self._len
+        if not 0 <= key < self._len:
+            raise IndexError("MappedText index out of range")
+        self._block(key)
+        return self._text[key - self._lo]
+
+    def startswith(self, prefix: str, start: int=0) -> bool:
+        if start > self._len:
+            return False
+        return self[start:start + len(prefix)] == prefix
+
+    def find(self, sub: str, start: int=0, end: int=None) -> int:
+        """Same as str.find, searched block by block."""
+        size = len(sub)
+        if size == 0:
+            start = max(start + self._len, 0) if start < 0 else start
+            if end is None:
+                end = self._len
+            elif end < 0:
+                end = max(end + self._len, 0)
+            return start if start <= min(end, self._len) else -1
+        start, end, _ = slice(start, end).indices(self._len)
+        while start + size <= end:
+            if not self._lo <= start < self._hi:
+                self._block(start)
+            hi = self._hi
+            # overlap the next block by the length of sub
+            stop = min(end, hi + size - 1)
+            idx = self[start:stop].find(sub)
+            if idx != -1:
+                return start + idx
+            start = hi
+        return -1
+
+
+#: the bytes-like contents of a Stream
+BYTES = (bytes, bytearray, memoryview, mmap.mmap)
+#: byte length of an utf-8 character, by its first byte
+UTF8_WIDTH = bytes([1] * 0xc0 + [2] * 0x20 + [3] * 0x10 + [4] * 0x10)
+#: bytes continuing an utf-8 character
+UTF8_CONTINUATION = re.compile(b'[\\x80-\\xbf]')
+EOL = re.compile(b'\\n')
+
+
+class ByteText:
+    """Read only str like view of an encoded buffer, indexed by byte.
+
+    Nothing is decoded ahead: a character is decoded from the bytes
+    starting at its index, a slice when it is read.  Only utf-8 and the
+    single byte encodings are supported, so the ascii text of a grammar
+    has the same length in bytes.  Invalid bytes are read as U+FFFD.
+    """
+    def __init__(self, buf, encoding: str='utf-8'):
+        view = memoryview(buf)
+        if view.ndim != 1 or view.format != 'B':
+            view = view.cast('B')
+        self._buf = view
+        self._len = len(view)
+        self._encoding = codecs.lookup(encoding).name
+        # characters of the bytes read alone
+        if self._encoding in SINGLE_BYTE:
+            self._chars = bytes(range(256)).decode(self._encoding, 'replace')
+        elif self._encoding == 'utf-8':
+            self._chars = bytes(range(128)).decode('ascii')
+        else:
+            raise ValueError("Can't index %s bytes, decode them first"
+                             % encoding)
+        self._eol = None
+        self._encoded = {}
+        self._finders = {}
+
+    def eol_offsets(self) -> array.array:
+        """Return the sorted array of the indexes of all newlines."""
+        if self._eol is None:
+            self._eol = array.array('q')
+            if numpy is not None and self._len > 0:
+                chars = numpy.frombuffer(self._buf, numpy.uint8)
+                self._eol.frombytes(
+                    numpy.flatnonzero(chars == 10).astype('q').tobytes())
+            else:
+                self._eol.extend(m.start() for m in EOL.finditer(self._buf))
+        return self._eol
+
+    def width(self, index: int) -> int:
+        """The byte length of the character at index."""
+        if len(self._chars) == 256 or index >= self._len:
+            return 1
+        return UTF8_WIDTH[self._buf[index]]
+
+    def count_chars(self, begin: int, end: int) -> int:
+        """The number of characters between begin and end."""
+        if len(self._chars) == 256:
+            return end - begin
+        return end - begin - len(
+            UTF8_CONTINUATION.findall(self._buf, begin, end))
+
+    def encode(self, text: str) -> bytes:
+        """The bytes of text, encoded once."""
+        res = self._encoded.get(text)
+        if res is None:
+            res = self._encoded[text] = text.encode(self._encoding)
+        return res
+
+    def view(self, begin: int, end: int) -> memoryview:
+        return self._buf[begin:end]
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, key: int or slice) -> str:
+        if type(key) is int:
+            b = self._buf[key]
+            if b < len(self._chars):
+                return self._chars[b]
+            if key < 0:
+                key += self._len
+            return str(self._buf[key:key + UTF8_WIDTH[b]], 'utf-8',
+                       'replace')
+        return str(self._buf[key], self._encoding, 'replace')
+
+    def startswith(self, prefix: str, start: int=0) -> bool:
+        prefix = self.encode(prefix)
+        return self._buf[start:start + len(prefix)] == prefix
+
+    def find(self, sub: str, start: int=0, end: int=None) -> int:
+        """Same as str.find, searched in the bytes."""
+        finder = self._finders.get(sub)
+        if finder is None:
+            finder = re.compile(re.escape(self.encode(sub)))
+            self._finders[sub] = finder
+        m = finder.search(self._buf, start,
+                          self._len if end is None else end)
+        return -1 if m is None else m.start()
+
+
+class ByteCursor(Cursor):
+    """A Cursor of a ByteText, the column offsets are in characters."""
+    def __init__(self, text: ByteText):
+        super().__init__(eol=text.eol_offsets())
+        self._text = text
+
+    def line_info(self, index: int) -> (int, int):
+        lineno, col_offset = super().line_info(index)
+        begin = index - col_offset + 1
+        return (lineno, 1 + self._text.count_chars(begin, index))
+
+
+class FileStream(Stream):
+    """A Stream reading a file thru a mmap.
+
+    The file is never loaded in memory: characters are decoded on demand
+    (see MappedText), captures are slices of the mapped file.
+    """
+    def __init__(self, filename: str, encoding: str='utf-8',
+                 name: str=None):
+        with open(filename, 'rb') as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files can't be mapped
+                self._mmap = b''
+        if name is None:
+            name = filename
+        super().__init__(MappedText(self._mmap, encoding), name)
+
+    def close(self):
+        """Unmap the file, the stream and its captures are unusable."""
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+
+
+def text_chunks(source, encoding: str='utf-8', size: int=1 << 16):
+    """Yield the text of source by chunks.
+
+    source is a str, a file object (read), a socket-like reader (recv)
+    or an iterable of chunks.  Chunks of bytes are decoded.
+    """
+    if isinstance(source, str):
+        chunks = [source]
+    elif hasattr(source, 'read'):
+        chunks = iter(lambda: source.read(size), None)
+    elif hasattr(source, 'recv'):
+        chunks = iter(lambda: source.recv(size), None)
+    else:
+        chunks = source
+    decoder = None
+    for chunk in chunks:
+        if len(chunk) == 0:
+            if hasattr(source, 'read') or hasattr(source, 'recv'):
+                break
+            continue
+        if isinstance(chunk, str):
+            yield chunk
+            continue
+        if decoder is None:
+            decoder = codecs.getincrementaldecoder(encoding)()
+        text = decoder.decode(chunk)
+        if len(text) > 0:
+            yield text
+    if decoder is not None:
+        text = decoder.decode(b'', True)
+        if len(text) > 0:
+            yield text
+
+
+class WindowText:
+    """Str like view of a text pulled by chunks.
+
+    Indexes are absolute, only the text between start and end is kept.
+    The newlines of the window are recorded while pulling, with the
+    count and the last of the newlines before start.
+    """
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._text = ''
+        self.start = 0
+        self.end = 0
+        self.exhausted = False
+        self.eol = array.array('q')
+        self.eol_dropped = 0
+        self.last_eol = -1
+
+    def fill(self, index: int) -> bool:
+        """Pull chunks until index is read, False after the last chunk."""
+        if index < self.end or self.exhausted:
+            return index < self.end
+        parts = [self._text]
+        end = self.end
+        while end <= index:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self.exhausted = True
+                break
+            idx = chunk.find('\n')
+            while idx != -1:
+                self.eol.append(end + idx)
+                idx = chunk.find('\n', idx + 1)
+            parts.append(chunk)
+            end += len(chunk)
+        self._text = ''.join(parts)
+        self.end = end
+        return index < end
+
+    def discard(self, index: int):
+        """Forget the text before index."""
+        if index <= self.start:
+            return
+        index = min(index, self.end)
+        self._text = self._text[index - self.start:]
+        n = bisect.bisect_left(self.eol, index)
+        if n > 0:
+            self.last_eol = self.eol[n - 1]
+            del self.eol[:n]
+            self.eol_dropped += n
+        self.start = index
+
+    def __len__(self) -> int:
+        return self.end
+
+    def __getitem__(self, key: int or slice) -> str:
+        start = self.start
+        if type(key) is int and start <= key < self.end:
+            return self._text[key - start]
+        if isinstance(key, slice):
+            if key.step not in (None, 1):
+                raise ValueError("WindowText slices have no step")
+            begin = start if key.start is None else key.start
+            if key.stop is None:
+                while self.fill(self.end):
+                    pass
+                stop = self.end
+            else:
+                stop = key.stop
+                self.fill(stop - 1)
+            if begin < self.start:
+                raise IndexError("WindowText text before %d was discarded"
+                                 % self.start)
+            return self._text[begin - self.start:stop - self.start]
+        if key < start:
+            raise IndexError("WindowText text before %d was discarded"
+                             % start)
+        if not self.fill(key):
+            raise IndexError("WindowText index out of range")
+        return self._text[key - self.start]
+
+    def startswith(self, prefix: str, start: int=0) -> bool:
+        return self[start:start + len(prefix)] == prefix
+
+    def find(self, sub: str, start: int=0, end: int=None) -> int:
+        """Same as str.find, pulling chunks until sub is found."""
+        start = max(start, self.start)
+        while True:
+            stop = self.end if end is None else min(end, self.end)
+            idx = self._text.find(sub, start - self.start, stop - self.start)
+            if idx != -1:
+                return idx + self.start
+            if self.exhausted or (end is not None and end <= self.end):
+                return -1
+            self.fill(self.end)
+
+
+class WindowCursor(Cursor):
+    """A Cursor computing lines from the newlines of a WindowText."""
+    def __init__(self, window: WindowText):
+        super().__init__(eol=window.eol)
+        self._window = window
+
+    def line_info(self, index: int) -> (int, int):
+        window = self._window
+        nline = bisect.bisect_left(window.eol, index)
+        if nline > 0:
+            last = window.eol[nline - 1]
+        else:
+            last = window.last_eol
+        return (1 + window.eol_dropped + nline, index - last)
+
+
+class ChunkedStream(Stream):
+    """A Stream pulling its text by chunks (see text_chunks).
+
+    The text is read LOOKAHEAD characters ahead of the cursor.  With
+    discard, the text more than MARGIN characters before the oldest
+    saved context (or the cursor) is forgotten, so unbounded inputs are
+    parsed in a window as long as the backtracking of the grammar.
+    """
+    LOOKAHEAD = 4096
+    MARGIN = 4096
+
+    def __init__(self, source, name: str='<stream>',
+                 encoding: str='utf-8', discard: bool=True):
+        self._content = WindowText(text_chunks(source, encoding))
+        self._name = name
+        self._discard = discard
+        self._contexts = []
+        self._cursor = WindowCursor(self._content)
+        # use to store begin:end => value
+        self.value_cache = dict()
+
+    @property
+    def _len(self) -> int:
+        """Length read so far, the length of the text at the end."""
+        window = self._content
+        index = self._cursor._index
+        if window.end < index + self.LOOKAHEAD and not window.exhausted:
+            if self._discard:
+                oldest = min(self._contexts, default=index)
+                window.discard(min(oldest, index) - self.MARGIN)
+            window.fill(index + self.LOOKAHEAD)
+        return window.end
+
+    @property
+    def last_readed_line(self) -> str:
+        window = self._content
+        mindex = self._cursor._maxindex
+        last = mindex - 1 if mindex == self.eos_index else mindex
+        n = bisect.bisect_right(window.eol, last)
+        begin = window.eol[n - 1] + 1 if n > 0 else window.last_eol + 1
+        n = bisect.bisect_left(window.eol, mindex)
+        end = window.eol[n] if n < len(window.eol) else window.end
+        return window[max(begin, window.start):end]
@@ -0,0 +1,161 @@
+# Event rules: copies of the rules that call an EventHandler instead of
+# building nodes
+from pyrser import meta
+from pyrser import parsing
+from pyrser.parsing import functors
+from pyrser.passes import recognize
+from pyrser.passes.first_set import Analysis, FirstSet
+from pyrser.passes.first_set import ANY, EMPTY, KNOWN_RULES
+
+
+class Events(parsing.Functor):
+    """Body of a rule, between its enter_rule and exit_rule events."""
+
+    def __init__(self, name: str, pt):
+        parsing.Functor.__init__(self)
+        self.name = name
+        self.pt = pt
+
+    def do_call(self, parser: parsing.BasicParser) -> bool:
+        parser.emit_event('enter_rule', self.name, parser._stream.index)
+        # scope of the captures given to the hooks
+        parser.push_rule_nodes()
+        res = self.pt(parser)
+        parser.pop_rule_nodes()
+        parser.emit_event('exit_rule', self.name, parser._stream.index,
+                          bool(res))
+        return res
+
+
+class CaptureEvent(parsing.Functor):
+    """Emit a capture event with the span read by pt."""
+
+    def __init__(self, tagname: str, pt: parsing.Functor):
+        parsing.Functor.__init__(self)
+        self.tagname = tagname
+        self.pt = pt
+
+    def do_call(self, parser: parsing.BasicParser) -> bool:
+        start = parser._stream.index
+        parser.begin_tag(self.tagname)
+        if not self.pt(parser):
+            return False
+        parser.end_tag(self.tagname)
+        parser.emit_event('capture', self.tagname, start,
+                          parser._stream.index)
+        return True
+
+
+class HookEvent(parsing.Functor, functors.Leaf):
+    """Emit a hook event, the nodes are given as their captured text."""
+
+    def __init__(self, name: str, param: [(object, type)]):
+        parsing.Functor.__init__(self)
+        self.name = name
+        self.param = param
+
+    def do_call(self, parser: parsing.BasicParser) -> bool:
+        args = []
+        for v, t in self.param:
+            if t is parsing.Node:
+                tag = parser.tag_cache.get(v)
+                args.append(None if tag is None else str(tag))
+            else:
+                args.append(v)
+        parser.emit_event('hook', self.name, args)
+        return True
+
+
+class Attempt(parsing.Functor):
+    """Retract the events of pt if it fails.
+
+    The events are delivered once no attempt is pending anymore.
+    """
+
+    def __init__(self, pt: parsing.Functor, always: bool=False):
+        parsing.Functor.__init__(self)
+        self.pt = pt
+        # retract even on success (i.e: predicates)
+        self.always = always
+
+    def do_call(self, parser: parsing.BasicParser) -> bool:
+        mark = len(parser._events)
+        parser._attempts += 1
+        try:
+            res = self.pt(parser)
+        finally:
+            parser._attempts -= 1
+        if not res or self.always:
+            del parser._events[mark:]
+        elif parser._attempts == 0:
+            parser.flush_events()
+        return res
+
+
+class StripEvents(recognize.Strip):
+    """Copy the trees of rules, with events for rules, captures and hooks.
+    """
+
+    def capture(self, functor: parsing.Capture) -> parsing.Functor:
+        return CaptureEvent(functor.tagname, self(functor.pt))
+
+    def hook(self, functor: parsing.Hook) -> parsing.Functor:
+        return HookEvent(functor.name, functor.param)
+
+    def choice(self, functor: parsing.Functor) -> parsing.Functor:
+        if is_silent(functor):
+            return functor
+        return Attempt(functor)
+
+    def lookahead(self, functor: parsing.Functor) -> parsing.Functor:
+        if is_silent(functor):
+            return functor
+        return Attempt(functor, always=True)
+
+    def rule(self, name: str, rule) -> parsing.Functor:
+        res = super().rule(name, rule)
+        if not isinstance(res, parsing.Functor):
+            res = parsing.Call(res)
+        return Events(name, res)
+
+
+def is_silent(functor: parsing.Functor) -> bool:
+    """Check that functor never emit an event."""
+    if isinstance(functor, (recognize.Match, CaptureEvent, HookEvent)):
+        return False
+    if isinstance(functor, parsing.Scope):
+        if not (is_silent(functor.begin) and is_silent(functor.end)):
+            return False
+    if isinstance(getattr(functor, 'pt', None), parsing.Functor):
+        # the tree of a Regex is only used for its pattern
+        if not (isinstance(functor, parsing.Regex) or is_silent(functor.pt)):
+            return False
+    return all(is_silent(pt) for pt in getattr(functor, 'ptlist', ()))
+
+
+def event_rules(rules: dict) -> dict:
+    """Return the event rule of each rule of a dispatch table."""
+    return recognize.strip_rules(rules, StripEvents())
+
+
+@meta.add_method(Events)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    if isinstance(self.pt, parsing.Call):
+        # rules written in python
+        return KNOWN_RULES.get(self.pt.callObject, ANY)
+    return self.pt.first_set(analysis)
+
+
+@meta.add_method(CaptureEvent)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return self.pt.first_set(analysis)
+
+
+@meta.add_method(Attempt)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return self.pt.first_set(analysis)
+
+
+@meta.add_method(HookEvent)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return EMPTY
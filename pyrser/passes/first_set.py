@@ -0,0 +1,356 @@
+# FIRST set analysis, used for predictive dispatch of alternatives
+import collections
+
+from pyrser import meta
+from pyrser import parsing
+from pyrser.directives import ignore
+
+#: First characters (ascii only) that a functor could consume,
+#: wide if it could start with a non-ascii character,
+#: nullable if it could succeed without consuming anything.
+FirstSet = collections.namedtuple('FirstSet', 'chars wide nullable')
+
+ASCII = frozenset(chr(c) for c in range(128))
+#: never succeed on a character
+NOTHING = FirstSet(frozenset(), False, False)
+#: succeed without consuming
+EMPTY = FirstSet(frozenset(), False, True)
+#: consume any character
+ANYCHAR = FirstSet(ASCII, True, False)
+#: unpredictable, must always be tried
+ANY = FirstSet(ASCII, True, True)
+
+BLANKS = " \t\v\f\r\n"
+#: characters consumed by the known ignore conventions
+IGNORABLE = {
+    parsing.Parser.ignore_null: '',
+    parsing.Parser.ignore_blanks: BLANKS,
+    parsing.Parser.ignore_cxx: BLANKS + '/',
+}
+
+
+def first_char(c: str) -> FirstSet:
+    if ord(c) < 128:
+        return FirstSet(frozenset(c), False, False)
+    return FirstSet(frozenset(), True, False)
+
+
+def first_chars(chars: str, wide=False) -> FirstSet:
+    return FirstSet(frozenset(chars), wide, False)
+
+
+def union(firsts) -> FirstSet:
+    """FIRST set of an alternative between firsts."""
+    chars = frozenset()
+    wide = False
+    nullable = False
+    for f in firsts:
+        chars |= f.chars
+        wide = wide or f.wide
+        nullable = nullable or f.nullable
+    return FirstSet(chars, wide, nullable)
+
+
+def sequence(firsts) -> FirstSet:
+    """FIRST set of a sequence of firsts."""
+    chars = frozenset()
+    wide = False
+    for f in firsts:
+        chars |= f.chars
+        wide = wide or f.wide
+        if not f.nullable:
+            return FirstSet(chars, wide, False)
+    return FirstSet(chars, wide, True)
+
+
+DIGITS = "0123456789"
+LETTERS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+#: FIRST sets of the rules written in python, str.isdigit and str.isalpha
+#: accept non-ascii characters.
+KNOWN_RULES = {
+    parsing.Parser._rules['Base.read_char']: ANYCHAR,
+    parsing.Parser._rules['Base.eof']: NOTHING,
+    parsing.Parser._rules['Base.eol']: first_chars("\r\n"),
+    parsing.Parser._rules['Base.hex_num']: first_chars(
+        DIGITS + "abcdefABCDEF", True),
+    parsing.Parser._rules['Base.oct_num']: first_chars("01234567", True),
+    parsing.Parser._rules['Base.num']: first_chars(DIGITS, True),
+    parsing.Parser._rules['Base.id']: first_chars(LETTERS + "_", True),
+    parsing.Parser._rules['Base.string']: first_chars('"'),
+    parsing.Parser._rules['Base.char']: first_chars("'"),
+    parsing.Parser._rules['Base.qstring']: first_chars("'"),
+    parsing.Parser._rules['__scope__']: EMPTY,
+}
+
+
+class Analysis:
+    """FIRST sets of the rules of a parser, computed up to a fixpoint."""
+
+    def __init__(self, rules: dict):
+        self.rules = rules
+        self.approx = {}
+        self.final = set()
+        self.visited = set()
+        self.changed = False
+
+    def first(self, functor: parsing.Functor) -> FirstSet:
+        """Return the FIRST set of a functor."""
+        while True:
+            self.visited = set()
+            self.changed = False
+            res = functor.first_set(self)
+            if not self.changed:
+                self.final |= self.visited
+                return res
+
+    def rule(self, name: str) -> FirstSet:
+        if name in self.final or name in self.visited:
+            return self.approx.get(name, NOTHING)
+        self.visited.add(name)
+        target = self.rules.get(name)
+        if isinstance(target, parsing.Functor):
+            res = target.first_set(self)
+        else:
+            res = KNOWN_RULES.get(target, ANY)
+        if res != self.approx.get(name, NOTHING):
+            self.approx[name] = res
+            self.changed = True
+        return res
+
+
+class JumpTable:
+    """Alternatives of an Alt that could match, by current character."""
+
+    def __init__(self, ptlist: list, firsts: [FirstSet]):
+        self.all = tuple(ptlist)
+        self.ascii = []
+        for c in range(128):
+            self.ascii.append(tuple(
+                pt for pt, f in zip(ptlist, firsts)
+                if f.nullable or chr(c) in f.chars
+            ))
+        self.wide = tuple(
+            pt for pt, f in zip(ptlist, firsts) if f.nullable or f.wide
+        )
+
+    def is_useful(self) -> bool:
+        n = len(self.all)
+        return (len(self.wide) < n
+                or any(len(pts) < n for pts in self.ascii))
+
+    def candidates(self, parser: parsing.BasicParser) -> tuple:
+        """Return the alternatives to try at the current position.
+
+        All the alternatives are tried at the end of the stream, or if the
+        current character could be consumed by the ignore convention.
+        """
+        stream = parser._stream
+        if stream.index >= stream.eos_index:
+            return self.all
+        ignorable = ''
+        if len(parser._ignores) > 0:
+            ignorable = IGNORABLE.get(parser._ignores[-1])
+            if ignorable is None:
+                return self.all
+        c = stream.peek_char
+        if c in ignorable:
+            return self.all
+        o = ord(c)
+        if o < 128:
+            return self.ascii[o]
+        return self.wide
+
+
+def sub_functors(functor: parsing.Functor) -> list:
+    res = []
+    if isinstance(functor, parsing.Scope):
+        res.append(functor.begin)
+        res.append(functor.end)
+    if hasattr(functor, 'pt'):
+        res.append(functor.pt)
+    if hasattr(functor, 'ptlist'):
+        res.extend(functor.ptlist)
+    return [f for f in res if isinstance(f, parsing.Functor)]
+
+
+def build_jump_tables(cls: type, rules: dict) -> int:
+    """Attach a JumpTable for cls to all the Alt reachable from rules.
+
+    Return the number of Alt that could dispatch by character.
+    """
+    analysis = Analysis(rules)
+    todo = [r for r in rules.values() if isinstance(r, parsing.Functor)]
+    seen = set()
+    nb = 0
+    while len(todo) > 0:
+        functor = todo.pop()
+        if id(functor) in seen:
+            continue
+        seen.add(id(functor))
+        todo.extend(sub_functors(functor))
+        if isinstance(functor, parsing.Alt):
+            firsts = [analysis.first(pt) for pt in functor.ptlist]
+            table = JumpTable(functor.ptlist, firsts)
+            if table.is_useful():
+                functor.jump_tables[cls] = table
+                nb += 1
+            else:
+                functor.jump_tables.pop(cls, None)
+    return nb
+
+
+@meta.add_method(parsing.Functor)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return ANY
+
+
+@meta.add_method(parsing.SkipIgnore)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return EMPTY
+
+
+@meta.add_method(parsing.DeclNode)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return EMPTY
+
+
+@meta.add_method(parsing.Cut)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return EMPTY
+
+
+@meta.add_method(parsing.PeekChar)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return EMPTY
+
+
+@meta.add_method(parsing.PeekText)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return EMPTY
+
+
+@meta.add_method(parsing.LookAhead)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return EMPTY
+
+
+@meta.add_method(parsing.Neg)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return EMPTY
+
+
+@meta.add_method(parsing.Char)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    if len(self.char) == 0:
+        return EMPTY
+    return first_char(self.char[0])
+
+
+@meta.add_method(parsing.Text)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    if len(self.text) == 0:
+        return EMPTY
+    return first_char(self.text[0])
+
+
+@meta.add_method(parsing.Range)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    chars = frozenset(c for c in ASCII if self.begin <= c <= self.end)
+    return FirstSet(chars, ord(self.end) >= 128, False)
+
+
+@meta.add_method(parsing.Class)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return FirstSet(frozenset(self.chars.ascii), self.chars.has_wide,
+                    self.optional)
+
+
+@meta.add_method(parsing.UntilChar)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return ANYCHAR
+
+
+@meta.add_method(parsing.Until)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return ANYCHAR
+
+
+@meta.add_method(parsing.Complement)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return ANYCHAR
+
+
+@meta.add_method(parsing.Seq)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return sequence(pt.first_set(analysis) for pt in self.ptlist)
+
+
+@meta.add_method(parsing.Scope)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return sequence(pt.first_set(analysis)
+                    for pt in (self.begin, self.pt, self.end))
+
+
+@meta.add_method(parsing.Alt)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return union(pt.first_set(analysis) for pt in self.ptlist)
+
+
+@meta.add_method(parsing.RepOptional)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return self.pt.first_set(analysis)._replace(nullable=True)
+
+
+@meta.add_method(parsing.Rep0N)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return self.pt.first_set(analysis)._replace(nullable=True)
+
+
+@meta.add_method(parsing.Rep1N)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return self.pt.first_set(analysis)
+
+
+@meta.add_method(parsing.Streamed)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return self.pt.first_set(analysis)
+
+
+@meta.add_method(parsing.Capture)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return self.pt.first_set(analysis)
+
+
+@meta.add_method(parsing.Bind)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return self.pt.first_set(analysis)
+
+
+@meta.add_method(parsing.Regex)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return self.pt.first_set(analysis)
+
+
+@meta.add_method(parsing.Rule)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return analysis.rule(self.name)
+
+
+@meta.add_method(parsing.Call)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    # entering a not ignore scope or leaving a scope skip nothing
+    if (self.callObject is parsing.Parser.push_ignore
+            and self.params == (parsing.Parser.ignore_null,)):
+        return EMPTY
+    if self.callObject is parsing.Parser.pop_ignore:
+        return EMPTY
+    return ANY
+
+
+@meta.add_method(parsing.Directive)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    # @ignore("null") only change what is skipped inside
+    if (isinstance(self.directive, ignore.Ignore)
+            and [v for v, t in self.param] == ["null"]):
+        return self.pt.first_set(analysis)
+    return ANY
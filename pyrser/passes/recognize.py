@@ -0,0 +1,148 @@
+# Recognizers: copies of the rules that only match, without building nodes
+import copy
+
+from pyrser import meta
+from pyrser import parsing
+from pyrser.parsing import functors
+from pyrser.passes.first_set import Analysis, FirstSet, EMPTY
+
+#: rules written in python of the Parser, they don't touch the nodes
+NODELESS = frozenset(parsing.Parser._rules.values())
+
+
+class Accept(parsing.Functor, functors.Leaf):
+    """Succeed without reading, in place of hooks and node declarations."""
+
+    def do_call(self, parser: parsing.BasicParser) -> bool:
+        return True
+
+
+class Match(parsing.Functor, functors.Leaf):
+    """Call a rule by its name, without building its node."""
+
+    def __init__(self, name: str):
+        parsing.Functor.__init__(self)
+        self.name = name
+
+    def do_call(self, parser: parsing.BasicParser) -> bool:
+        return parser.match_rule(self.name)
+
+
+ACCEPT = Accept()
+
+
+def with_nodes(name: str):
+    """Rule of an unknown python function, evaluated as usual."""
+    def rule(parser: parsing.BasicParser) -> parsing.Node:
+        parser.push_rule_nodes()
+        res = parser.eval_rule(name)
+        parser.pop_rule_nodes()
+        return res
+    return rule
+
+
+def has_node_param(functor: parsing.Functor) -> bool:
+    return any(t is parsing.Node for v, t in functor.param)
+
+
+class Strip:
+    """Copy the trees of rules without captures, binds, nodes and hooks.
+
+    Copies are memoized by id (trees are shared between rules), the
+    original trees are left untouched.  Subclasses could replace the
+    captures and the hooks, and wrap the choice points.
+    """
+
+    def __init__(self):
+        self.done = {}
+
+    def __call__(self, functor: parsing.Functor) -> parsing.Functor:
+        if id(functor) in self.done:
+            return self.done[id(functor)]
+        res = self.copy(functor)
+        self.done[id(functor)] = res
+        return res
+
+    def copy(self, functor: parsing.Functor) -> parsing.Functor:
+        if isinstance(functor, parsing.Capture):
+            return self.capture(functor)
+        if isinstance(functor, parsing.Hook):
+            return self.hook(functor)
+        if isinstance(functor, parsing.Bind):
+            return self(functor.pt)
+        if isinstance(functor, parsing.DeclNode):
+            return ACCEPT
+        if isinstance(functor, parsing.Rule):
+            return Match(functor.name)
+        if isinstance(functor, parsing.Streamed):
+            # nothing to give away
+            return self(functor.pt)
+        if isinstance(functor, parsing.Decorator):
+            # decorators only annotate the nodes
+            return self(functor.pt)
+        if isinstance(functor, parsing.Directive) and has_node_param(functor):
+            # no node to give to the directive
+            return self(functor.pt)
+        if isinstance(functor, (functors.Leaf, parsing.Call)):
+            return functor
+        res = copy.copy(functor)
+        if isinstance(functor, parsing.Scope):
+            res.begin = self(functor.begin)
+            res.end = self(functor.end)
+        if isinstance(getattr(functor, 'pt', None), parsing.Functor):
+            res.pt = self(functor.pt)
+            if isinstance(functor, (parsing.Neg, parsing.LookAhead,
+                                    parsing.Complement)):
+                res.pt = self.lookahead(res.pt)
+            elif isinstance(functor, (parsing.RepOptional, parsing.Rep0N,
+                                      parsing.Rep1N, parsing.Until)):
+                res.pt = self.choice(res.pt)
+        if isinstance(functor, parsing.Seq):
+            res.ptlist = [self(pt) for pt in functor.ptlist]
+        elif isinstance(functor, parsing.Alt):
+            res.ptlist = tuple(self.choice(self(pt))
+                               for pt in functor.ptlist)
+            # rebuilt for the copies by build_jump_tables
+            res.jump_tables = {}
+        elif hasattr(functor, 'ptlist'):
+            res.ptlist = tuple(self(pt) for pt in functor.ptlist)
+        return res
+
+    def capture(self, functor: parsing.Capture) -> parsing.Functor:
+        return self(functor.pt)
+
+    def hook(self, functor: parsing.Hook) -> parsing.Functor:
+        return ACCEPT
+
+    def choice(self, functor: parsing.Functor) -> parsing.Functor:
+        """Wrap a copy tried by an alternative or a repetition."""
+        return functor
+
+    def lookahead(self, functor: parsing.Functor) -> parsing.Functor:
+        """Wrap a copy tried without consuming by a predicate."""
+        return functor
+
+    def rule(self, name: str, rule) -> parsing.Functor:
+        """Return the rule of the table for a rule of the parser."""
+        if isinstance(rule, parsing.Functor):
+            return self(rule)
+        if rule in NODELESS:
+            return rule
+        return with_nodes(name)
+
+
+def strip_rules(rules: dict, strip: Strip=None) -> dict:
+    """Return the recognizer of each rule of a dispatch table."""
+    if strip is None:
+        strip = Strip()
+    return {name: strip.rule(name, rule) for name, rule in rules.items()}
+
+
+@meta.add_method(Accept)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return EMPTY
+
+
+@meta.add_method(Match)
+def first_set(self, analysis: Analysis) -> FirstSet:
+    return analysis.rule(self.name)
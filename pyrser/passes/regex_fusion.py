@@ -0,0 +1,473 @@
+# Fusion of terminal subtrees into Regex functors
+import collections
+import copy
+import re
+import sys
+
+from pyrser import meta
+from pyrser import parsing
+from pyrser.parsing import charclass
+
+#: atomic groups and possessive quantifiers are needed
+SUPPORTED = sys.version_info >= (3, 11)
+
+#: pattern of SkipIgnore by known ignore convention, always a capturing
+#: group so Regex could follow the last ignore
+SKIPS = {
+    parsing.Parser.ignore_null: '()',
+    parsing.Parser.ignore_blanks: '([ \\t\\v\\f\\r\\n]*+)',
+}
+
+#: characters skipped by the known ignore conventions
+SKIPPED = {
+    parsing.Parser.ignore_null: '',
+    parsing.Parser.ignore_blanks: ' \t\v\f\r\n',
+}
+
+INF = float('inf')
+ANY_CHAR = [('\x00', '\U0010ffff')]
+
+#: Lengths a functor could consume on success (minlen, maxlen), and how
+#: many characters past its start a failure (depth, -1 if it never
+#: fails), or past its end a success (over), could have read.
+Extent = collections.namedtuple('Extent', 'minlen maxlen depth over')
+
+#: functors built only from terminals and repetitions
+FUSABLE = {
+    parsing.Char, parsing.Text, parsing.Range, parsing.Class,
+    parsing.PeekChar, parsing.PeekText, parsing.SkipIgnore,
+    parsing.Seq, parsing.Alt,
+    parsing.RepOptional, parsing.Rep0N, parsing.Rep1N,
+    parsing.Neg, parsing.LookAhead, parsing.Complement,
+}
+
+
+def is_fusable(functor: parsing.Functor) -> bool:
+    if type(functor) not in FUSABLE:
+        return False
+    if type(functor) is parsing.Class:
+        # a test of the non ascii characters can't be translated
+        return functor.chars.exact
+    if hasattr(functor, 'pt'):
+        return is_fusable(functor.pt)
+    if hasattr(functor, 'ptlist'):
+        return all(is_fusable(pt) for pt in functor.ptlist)
+    return True
+
+
+def size(functor: parsing.Functor) -> int:
+    """Number of functors, SkipIgnore excepted."""
+    if isinstance(functor, parsing.SkipIgnore):
+        return 0
+    if hasattr(functor, 'pt'):
+        return 1 + size(functor.pt)
+    if hasattr(functor, 'ptlist'):
+        return 1 + sum(size(pt) for pt in functor.ptlist)
+    return 1
+
+
+def make_regex(functor: parsing.Functor) -> parsing.Regex:
+    """Build the Regex matching functor, for each known convention."""
+    patterns = {}
+    probes = {}
+    for convention, skip in SKIPS.items():
+        patterns[convention] = functor.to_regex(skip)
+        blanks = SKIPPED[convention]
+        extent = functor.extent(blanks)
+        starts = reads = None
+        if extent.depth > 0:
+            starts = charclass.CharClass(functor.reads(blanks, True))
+        if extent.over > 0:
+            reads = charclass.CharClass(functor.reads(blanks, False))
+        probes[convention] = (starts, reads)
+    return parsing.Regex(functor, patterns, probes)
+
+
+def raw_seq(ptlist: list) -> parsing.Seq:
+    """Seq of ptlist, without adding SkipIgnore between them."""
+    seq = parsing.Seq.__new__(parsing.Seq)
+    seq.ptlist = list(ptlist)
+    return seq
+
+
+def children(functor: parsing.Functor) -> list:
+    res = [getattr(functor, attr, None) for attr in ('begin', 'end', 'pt')]
+    return res + list(getattr(functor, 'ptlist', ()))
+
+
+def same(ptlist: list, other: list) -> bool:
+    return (len(ptlist) == len(other)
+            and all(a is b for a, b in zip(ptlist, other)))
+
+
+def fuse_seq(seq: parsing.Seq, fused: dict) -> parsing.Seq:
+    """Fuse the runs of fusable functors of a Seq."""
+    ptlist = []
+    run = []
+    for pt in seq.ptlist + [None]:
+        if pt is not None and is_fusable(pt):
+            run.append(pt)
+            continue
+        if sum(size(it) for it in run) > 1:
+            ptlist.append(make_regex(raw_seq(run)))
+        elif len(run) > 0:
+            ptlist.extend(fuse(it, fused) for it in run)
+        run = []
+        if pt is not None:
+            ptlist.append(fuse(pt, fused))
+    if same(ptlist, seq.ptlist):
+        return seq
+    res = copy.copy(seq)
+    res.ptlist = ptlist
+    return res
+
+
+def fuse(functor: parsing.Functor, fused: dict) -> parsing.Functor:
+    """Return functor or a copy of it with its subtrees fused.
+
+    The original trees are left untouched (trees are shared between
+    rules and grammars), fused memoize the functors already processed.
+    """
+    if id(functor) in fused:
+        return fused[id(functor)]
+    fused[id(functor)] = functor
+    res = functor
+    if is_fusable(functor) and size(functor) > 1:
+        res = make_regex(functor)
+    elif isinstance(functor, (parsing.Regex, parsing.Until)):
+        # already fused, or keep the ignore tracking of Until
+        pass
+    elif type(functor) is parsing.Seq:
+        res = fuse_seq(functor, fused)
+    else:
+        res = copy.copy(functor)
+        if isinstance(functor, parsing.Scope):
+            res.begin = fuse(functor.begin, fused)
+            res.end = fuse(functor.end, fused)
+        if isinstance(getattr(functor, 'pt', None), parsing.Functor):
+            res.pt = fuse(functor.pt, fused)
+        if hasattr(functor, 'ptlist'):
+            res.ptlist = tuple(fuse(pt, fused) for pt in functor.ptlist)
+        if same(children(res), children(functor)):
+            res = functor
+        elif isinstance(functor, parsing.Alt):
+            # rebuilt for the copy by build_jump_tables
+            res.jump_tables = {}
+    fused[id(functor)] = res
+    return res
+
+
+def fuse_rules(rules: dict) -> int:
+    """Fuse all the rules of a dispatch table.
+
+    Return the number of rules replaced by a Regex.
+    """
+    fused = {}
+    nb = 0
+    if not SUPPORTED:
+        return nb
+    for name, rule in rules.items():
+        if isinstance(rule, parsing.Functor):
+            rules[name] = fuse(rule, fused)
+            if rules[name] is not rule:
+                nb += 1
+    return nb
+
+
+@meta.add_method(parsing.Functor)
+def to_regex(self, skip: str) -> str:
+    raise TypeError("%s can't be fused" % type(self).__name__)
+
+
+@meta.add_method(parsing.SkipIgnore)
+def to_regex(self, skip: str) -> str:
+    return skip
+
+
+@meta.add_method(parsing.Char)
+def to_regex(self, skip: str) -> str:
+    return re.escape(self.char)
+
+
+@meta.add_method(parsing.Text)
+def to_regex(self, skip: str) -> str:
+    if len(self.text) == 0:
+        # as read_text, fail at end of stream
+        return '(?=(?s:.))'
+    return re.escape(self.text)
+
+
+@meta.add_method(parsing.Range)
+def to_regex(self, skip: str) -> str:
+    if self.begin > self.end:
+        return '(?!)'
+    return '[%s-%s]' % (re.escape(self.begin), re.escape(self.end))
+
+
+@meta.add_method(parsing.Class)
+def to_regex(self, skip: str) -> str:
+    res = self.chars.to_regex()
+    if self.many:
+        return res + ('*+' if self.optional else '++')
+    if self.optional:
+        return res + '?+'
+    return res
+
+
+@meta.add_method(parsing.PeekChar)
+def to_regex(self, skip: str) -> str:
+    return '(?=%s)' % re.escape(self.char)
+
+
+@meta.add_method(parsing.PeekText)
+def to_regex(self, skip: str) -> str:
+    return '(?=%s)' % re.escape(self.char)
+
+
+# PEG never backtrack: sequences of atomic groups and possessive
+# repetitions give the same result.
+@meta.add_method(parsing.Seq)
+def to_regex(self, skip: str) -> str:
+    return '(?:%s)' % ''.join(pt.to_regex(skip) for pt in self.ptlist)
+
+
+@meta.add_method(parsing.Alt)
+def to_regex(self, skip: str) -> str:
+    return '(?>%s)' % '|'.join(pt.to_regex(skip) for pt in self.ptlist)
+
+
+@meta.add_method(parsing.RepOptional)
+def to_regex(self, skip: str) -> str:
+    return '(?:%s)?+' % self.pt.to_regex(skip)
+
+
+@meta.add_method(parsing.Rep0N)
+def to_regex(self, skip: str) -> str:
+    return '(?:%s)*+' % self.pt.to_regex(skip)
+
+
+@meta.add_method(parsing.Rep1N)
+def to_regex(self, skip: str) -> str:
+    return '(?:%s)++' % self.pt.to_regex(skip)
+
+
+@meta.add_method(parsing.Neg)
+def to_regex(self, skip: str) -> str:
+    return '(?!%s)' % self.pt.to_regex(skip)
+
+
+@meta.add_method(parsing.LookAhead)
+def to_regex(self, skip: str) -> str:
+    return '(?=%s)' % self.pt.to_regex(skip)
+
+
+@meta.add_method(parsing.Complement)
+def to_regex(self, skip: str) -> str:
+    return '(?!%s)(?s:.)' % self.pt.to_regex(skip)
+
+
+# Extents and characters read, computed as the cursor of the functors
+# would move: the furthest index read is the furthest index reached, or
+# the first character that differs from a text.
+
+def text_extent(text: str) -> Extent:
+    n = len(text)
+    return Extent(n, n, max(n - 1, 0), 0)
+
+
+def text_reads(text: str, start: bool) -> list:
+    chars = text[:1] if start else text
+    return [(c, c) for c in chars]
+
+
+@meta.add_method(parsing.SkipIgnore)
+def extent(self, blanks: str) -> Extent:
+    return Extent(0, INF if blanks else 0, -1, 0)
+
+
+@meta.add_method(parsing.SkipIgnore)
+def reads(self, blanks: str, start: bool) -> list:
+    return [(c, c) for c in blanks]
+
+
+@meta.add_method(parsing.Char)
+def extent(self, blanks: str) -> Extent:
+    return text_extent(self.char)
+
+
+@meta.add_method(parsing.Char)
+def reads(self, blanks: str, start: bool) -> list:
+    return text_reads(self.char, start)
+
+
+@meta.add_method(parsing.Text)
+def extent(self, blanks: str) -> Extent:
+    return text_extent(self.text)
+
+
+@meta.add_method(parsing.Text)
+def reads(self, blanks: str, start: bool) -> list:
+    return text_reads(self.text, start)
+
+
+@meta.add_method(parsing.Range)
+def extent(self, blanks: str) -> Extent:
+    return Extent(1, 1, 0, 0)
+
+
+@meta.add_method(parsing.Range)
+def reads(self, blanks: str, start: bool) -> list:
+    return [(self.begin, self.end)]
+
+
+@meta.add_method(parsing.Class)
+def extent(self, blanks: str) -> Extent:
+    return Extent(0 if self.optional else 1, INF if self.many else 1,
+                  -1 if self.optional else 0, 0)
+
+
+@meta.add_method(parsing.Class)
+def reads(self, blanks: str, start: bool) -> list:
+    return list(self.chars.ranges)
+
+
+@meta.add_method(parsing.PeekChar)
+def extent(self, blanks: str) -> Extent:
+    n = len(self.char)
+    return Extent(0, 0, max(n - 1, 0), max(n - 1, 0))
+
+
+@meta.add_method(parsing.PeekChar)
+def reads(self, blanks: str, start: bool) -> list:
+    return text_reads(self.char, start)
+
+
+@meta.add_method(parsing.PeekText)
+def extent(self, blanks: str) -> Extent:
+    n = len(self.char)
+    return Extent(0, 0, max(n - 1, 0), max(n - 1, 0))
+
+
+@meta.add_method(parsing.PeekText)
+def reads(self, blanks: str, start: bool) -> list:
+    return text_reads(self.char, start)
+
+
+@meta.add_method(parsing.Seq)
+def extent(self, blanks: str) -> Extent:
+    extents = [pt.extent(blanks) for pt in self.ptlist]
+    minlen = sum(e.minlen for e in extents)
+    maxlen = sum(e.maxlen for e in extents)
+    depth = -1
+    # furthest index read by the successful clauses, from the start
+    reached = 0
+    start = 0
+    for e in extents:
+        if e.depth >= 0:
+            depth = max(depth, reached, start + e.depth)
+        reached = max(reached, start + e.maxlen + e.over)
+        start += e.maxlen
+    over = 0
+    after = 0
+    for e in reversed(extents):
+        over = max(over, e.over - after)
+        after += e.minlen
+    return Extent(minlen, maxlen, depth, over)
+
+
+@meta.add_method(parsing.Seq)
+def reads(self, blanks: str, start: bool) -> list:
+    res = []
+    for pt in self.ptlist:
+        res += pt.reads(blanks, start)
+        if start and pt.extent(blanks).minlen > 0:
+            break
+    return res
+
+
+@meta.add_method(parsing.Alt)
+def extent(self, blanks: str) -> Extent:
+    extents = [pt.extent(blanks) for pt in self.ptlist]
+    over = 0
+    # furthest index read by the failed alternatives
+    failed = 0
+    for e in extents:
+        over = max(over, e.over, failed - e.minlen)
+        failed = max(failed, e.depth)
+    if any(e.depth < 0 for e in extents):
+        failed = -1
+    return Extent(min(e.minlen for e in extents),
+                  max(e.maxlen for e in extents), failed, over)
+
+
+@meta.add_method(parsing.Alt)
+def reads(self, blanks: str, start: bool) -> list:
+    return [r for pt in self.ptlist for r in pt.reads(blanks, start)]
+
+
+@meta.add_method(parsing.RepOptional)
+def extent(self, blanks: str) -> Extent:
+    e = self.pt.extent(blanks)
+    return Extent(0, e.maxlen, -1, max(e.depth, e.over))
+
+
+@meta.add_method(parsing.Rep0N)
+def extent(self, blanks: str) -> Extent:
+    e = self.pt.extent(blanks)
+    return Extent(0, INF if e.maxlen > 0 else 0, -1, max(e.depth, e.over))
+
+
+@meta.add_method(parsing.Rep1N)
+def extent(self, blanks: str) -> Extent:
+    e = self.pt.extent(blanks)
+    return Extent(e.minlen, INF if e.maxlen > 0 else 0, e.depth,
+                  max(e.depth, e.over))
+
+
+@meta.add_method(parsing.Neg)
+def extent(self, blanks: str) -> Extent:
+    e = self.pt.extent(blanks)
+    return Extent(0, 0, e.maxlen + e.over, max(e.depth, 0))
+
+
+@meta.add_method(parsing.LookAhead)
+def extent(self, blanks: str) -> Extent:
+    e = self.pt.extent(blanks)
+    return Extent(0, 0, e.depth, e.maxlen + e.over)
+
+
+@meta.add_method(parsing.Complement)
+def extent(self, blanks: str) -> Extent:
+    e = self.pt.extent(blanks)
+    return Extent(1, 1, e.maxlen + e.over, max(e.depth - 1, 0))
+
+
+@meta.add_method(parsing.Complement)
+def reads(self, blanks: str, start: bool) -> list:
+    # one character whatever it is
+    return ANY_CHAR
+
+
+@meta.add_method(parsing.RepOptional)
+def reads(self, blanks: str, start: bool) -> list:
+    return self.pt.reads(blanks, start)
+
+
+@meta.add_method(parsing.Rep0N)
+def reads(self, blanks: str, start: bool) -> list:
+    return self.pt.reads(blanks, start)
+
+
+@meta.add_method(parsing.Rep1N)
+def reads(self, blanks: str, start: bool) -> list:
+    return self.pt.reads(blanks, start)
+
+
+@meta.add_method(parsing.Neg)
+def reads(self, blanks: str, start: bool) -> list:
+    return self.pt.reads(blanks, start)
+
+
+@meta.add_method(parsing.LookAhead)
+def reads(self, blanks: str, start: bool) -> list:
+    return self.pt.reads(blanks, start)
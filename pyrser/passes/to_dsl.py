@@ -64,12 +64,33 @@ def to_dsl(self, level=0):
     return res
 
 
+@meta.add_method(parsing.Regex)
+def to_dsl(self, level=0):
+    return self.pt.to_dsl(level)
+
+
 @meta.add_method(parsing.Text)
 def to_dsl(self, level=0):
     res = '\n{}"{}"'.format('\t' * (level + 1), self.text)
     return res
 
 
+@meta.add_method(parsing.Class)
+def to_dsl(self, level=0):
+    items = []
+    for first, last in self.chars.ranges:
+        if first == last:
+            items.append("'{}'".format(first))
+        else:
+            items.append("'{}'..'{}'".format(first, last))
+    rpt = ''
+    if self.many:
+        rpt = '*' if self.optional else '+'
+    elif self.optional:
+        rpt = '?'
+    return "\n{}{{ {} }}{}".format('\t' * (level + 1), ' '.join(items), rpt)
+
+
 @meta.add_method(parsing.Scope)
 def to_dsl(self, level=0):
     res = "\n{}[{}\n".format('\t' * (level + 1), self.begin.to_dsl(0))
@@ -88,6 +109,13 @@ def to_dsl(self, level=0):
     return res
 
 
+@meta.add_method(parsing.Streamed)
+def to_dsl(self, level=0):
+    res = '\n{}@stream("{}")'.format('\t' * (level + 1), self.tagname)
+    res += self.pt.to_dsl(level + 1)
+    return res
+
+
 @meta.add_method(parsing.Capture)
 def to_dsl(self, level=0):
     res = "\n{}[\n".format('\t' * level)
@@ -113,6 +141,11 @@ def to_dsl(self, level=0):
     return res
 
 
+@meta.add_method(parsing.Cut)
+def to_dsl(self, level=0):
+    return "{}^".format('\t' * level)
+
+
 @meta.add_method(parsing.Neg)
 def to_dsl(self, level=0):
     res = ("\n{}![\n".format('\t' * level))
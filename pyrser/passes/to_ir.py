@@ -109,6 +109,10 @@ def to_ir(self) -> parsing.ir.IR:
 def to_ir(self) -> parsing.ir.IR:
     pass
 
+@meta.add_method(parsing.Regex)
+def to_ir(self) -> parsing.ir.IR:
+    return self.pt.to_ir()
+
 @meta.add_method(parsing.LookAhead)
 def to_ir(self) -> parsing.ir.IR:
     pass
@@ -1,281 +1,744 @@
+# Translation of the rules of a grammar into a python module
 import ast
+import copy
+import re
+import sys
 
 from pyrser import meta
 from pyrser import parsing
+from pyrser.parsing import charclass
+from pyrser.parsing import functors
+
+#: runtime support of the generated modules, the functions of the rules
+#: work on the stream of the parser thru the locals set by PROLOGUE.
+HEADER = '''
+import re
+
+from pyrser import error
+from pyrser import meta
+from pyrser.parsing import Node, Parser
+from pyrser.parsing import charclass
+from pyrser.parsing.stream import Tag
+
+_blanks = re.compile('[ \\\\t\\\\v\\\\f\\\\r\\\\n]*').match
+
+
+def _skip(self, cursor, content):
+    ignores = self._ignores
+    if ignores:
+        convention = ignores[-1]
+        if convention is Parser.ignore_blanks and type(content) is str:
+            cursor._index = _blanks(content, cursor._index).end()
+        elif convention is not Parser.ignore_null:
+            convention(self)
+    index = cursor._index
+    self._lastIgnore = index != self._lastIgnoreIndex
+    self._lastIgnoreIndex = index
+    return True
+
+
+def _rule(self, name):
+    self.push_rule_nodes()
+    res = self.eval_rule(name)
+    self.pop_rule_nodes()
+    return res
+
+
+def _capture(self, name):
+    if name not in self.rule_nodes:
+        self.diagnostic.notify(
+            error.Severity.ERROR,
+            'Unknown capture variable : %s' % name,
+            error.LocationInfo.from_stream(self._stream, is_error=True))
+        raise self.diagnostic
+    return self.rule_nodes[name]
+
+
+def _error(self, msg):
+    self.diagnostic.notify(
+        error.Severity.ERROR, msg,
+        error.LocationInfo.from_stream(self._stream, is_error=True))
+    raise self.diagnostic
+'''
+
+#: locals of the functions of the rules, by name
+PROLOGUE = {
+    'stream': 'stream = self._streams[-1]',
+    'cursor': 'cursor = stream._cursor',
+    'content': 'content = stream._content',
+    'log': 'log = self._scope_log',
+    'marks': 'marks = self._scope_marks',
+}
+
+#: push_rule_nodes and pop_rule_nodes, nothing to undo in most scopes
+PUSH = 'marks.append(len(log))'
+POP = 'self.pop_rule_nodes() if len(log) > marks[-1] else marks.pop()'
+
+#: maximum number of nested blocks inlined in a function
+MAX_DEPTH = 8
+
+#: types allowed as literal parameters of hooks and directives
+LITERALS = (str, int, float, bool, type(None))
+
+
+def stmts(src: str, **kw) -> [ast.stmt]:
+    """Parse statements, %(name)s in src are replaced by the repr of kw.
+
+    %(push)s and %(pop)s are replaced by PUSH and POP.
+    """
+    kw = {k: repr(v) for k, v in kw.items()}
+    return ast.parse(src % dict(kw, push=PUSH, pop=POP)).body
+
+
+def expr(src: str, **kw) -> ast.expr:
+    """Parse an expression, as stmts."""
+    return ast.parse(src % {k: repr(v) for k, v in kw.items()},
+                     mode='eval').body
+
+
+class Raw(str):
+    def __repr__(self) -> str:
+        return str(self)
+
+
+def var(name: str) -> str:
+    """Keep name unquoted when given to stmts or expr."""
+    return Raw(name)
+
+
+def parser_attr(obj) -> str:
+    """Name of obj as an attribute of Parser, or None."""
+    name = getattr(obj, '__name__', None)
+    if name is not None and getattr(parsing.Parser, name, None) is obj:
+        return name
+    return None
+
+
+def literal(value) -> ast.expr:
+    if type(value) not in LITERALS:
+        raise TypeError("Can't translate the parameter %r" % (value,))
+    return ast.Constant(value)
 
 
 class RuleVisitor(ast.NodeVisitor):
+    """Translate functors into the statements of python functions.
+
+    visit() return an expression with the result of a functor, as the
+    do_call method of the functor.  The composite functors are translated
+    into module level functions whose body inline their subtree, up to
+    MAX_DEPTH nested blocks.  Failure leave the stream as do_call would.
+    """
+
     def __init__(self):
-        self.in_optional, self.in_loop, self.in_try = 0, 0, 0
+        self.functions = []
+        self.globals = []
+        self.names = {}
+        # names defined by HEADER
+        self.used = {'_blanks', '_skip', '_rule', '_capture', '_error',
+                     '_Grammar'}
+        self.prefix = 'rule'
+        self.nvars = 0
+        self.depth = 0
 
     def generic_visit(self, node):
         raise TypeError("Unhandled {} node".format(node.__class__.__name__))
 
-    def __exit_scope(self) -> ast.stmt:
-        """Create the appropriate scope exiting statement.
+    def new_var(self, prefix: str) -> str:
+        self.nvars += 1
+        return '%s%d' % (prefix, self.nvars)
+
+    def new_name(self, prefix: str) -> str:
+        name = base = '_' + re.sub(r'\W', '_', prefix)
+        n = 0
+        while name in self.used:
+            n += 1
+            name = '%s_%d' % (base, n)
+        self.used.add(name)
+        return name
+
+    def new_global(self, prefix: str, value: ast.expr) -> str:
+        name = self.new_name(prefix)
+        self.globals.append(ast.Assign([ast.Name(name, ast.Store())], value))
+        return name
+
+    def function(self, node: parsing.Functor, name: str=None) -> str:
+        """Translate node into a module level function, return its name."""
+        if id(node) in self.names:
+            return self.names[id(node)]
+        if name is None:
+            name = self.new_name(self.prefix)
+        self.names[id(node)] = name
+        saved = (self.nvars, self.depth)
+        self.nvars, self.depth = 0, 0
+        # the root is inlined whatever MAX_DEPTH is
+        method = getattr(self, 'inline_' + node.__class__.__name__, None)
+        if method is None:
+            body = self.test(self.visit(node), stmts('return False'), 'r')
+        else:
+            body = method(node, stmts('return False'), 'r')
+        body += stmts('return r')
+        used = {n.id for n in ast.walk(ast.Module(body, []))
+                if isinstance(n, ast.Name)}
+        if used & {'cursor', 'content'}:
+            used.add('stream')
+        body[0:0] = [stmt for name, src in PROLOGUE.items() if name in used
+                     for stmt in stmts(src)]
+        self.nvars, self.depth = saved
+        self.functions.append(ast.FunctionDef(
+            name,
+            ast.arguments([], [ast.arg('self')], None, [], [], None, []),
+            body, [], None))
+        return name
+
+    def call(self, node: parsing.Functor) -> ast.expr:
+        return expr('%(f)s(self)', f=var(self.function(node)))
+
+    def restore(self, p: str) -> [ast.stmt]:
+        """Go back to p, keeping track of the deepest index readed."""
+        return stmts(
+            'if cursor._index > cursor._maxindex:\n'
+            '    cursor._maxindex = cursor._index\n'
+            'cursor._index = %(p)s', p=var(p))
+
+    def block(self, build) -> [ast.stmt]:
+        """Call build inside a new nested block."""
+        self.depth += 1
+        try:
+            return build()
+        finally:
+            self.depth -= 1
 
-        The documentation only shows one level and always uses
-        'return False' in examples.
+    def inline(self, node, fail: [ast.stmt], result: str=None) -> [ast.stmt]:
+        """Statements calling node.
 
-        'raise AltFalse()' within a try.
-        'break' within a loop.
-        'return False' otherwise.
-        """
-        if self.in_optional:
-            return ast.Pass()
-        if self.in_try:
-            return ast.Raise(
-                ast.Call(ast.Name('AltFalse', ast.Load()), [], [], None, None),
-                None)
-        if self.in_loop:
-            return ast.Break()
-        return ast.Return(ast.Name('False', ast.Load()))
-
-    #TODO(bps): find a better name to describe what this does
-    def _clause(self, pt: parsing.ParserTree) -> [ast.stmt]:
-        """Normalize a test expression into a statements list.
-
-        Statements list are returned as-is.
-        Expression is packaged as:
-        if not expr:
-            return False
+        fail is executed on failure and must exit the block (return or
+        break), result is set to the result of node on success.
         """
-        if isinstance(pt, list):
-            return pt
-        return [ast.If(ast.UnaryOp(ast.Not(), pt),
-                       [self.__exit_scope()],
-                       [])]
+        method = getattr(self, 'inline_' + node.__class__.__name__, None)
+        if (method is None or not isinstance(node, parsing.Functor)
+                or self.depth >= MAX_DEPTH and not isinstance(
+                    node, functors.Leaf)):
+            return self.test(self.visit(node), fail, result)
+        return method(node, copy.deepcopy(fail), result)
+
+    def test(self, value: ast.expr, fail, result: str) -> [ast.stmt]:
+        fail = copy.deepcopy(fail)
+        if result is None:
+            return [ast.If(ast.UnaryOp(ast.Not(), value), fail, [])]
+        res = [ast.Assign([ast.Name(result, ast.Store())], value)]
+        res += stmts('if not %(r)s: pass', r=var(result))
+        res[-1].body = fail
+        return res
 
-    def visit_Call(self, node: parsing.Call) -> ast.expr:
-        """Generates python code calling the function.
+    def succeed(self, result: str, value='True') -> [ast.stmt]:
+        if result is None:
+            return []
+        return stmts('%(r)s = %(v)s', r=var(result), v=var(value))
+
+    def attempt(self, node, result: str) -> [ast.stmt]:
+        """Statements setting result to the result of node, never fail."""
+        if (not hasattr(self, 'inline_' + node.__class__.__name__)
+                or self.depth >= MAX_DEPTH):
+            return [ast.Assign([ast.Name(result, ast.Store())],
+                               self.visit(node))]
+
+        def build():
+            loop = stmts('while True:\n    pass')
+            loop[0].body = (self.inline(node, stmts('break'), result)
+                            + stmts('break'))
+            return loop
+        return self.succeed(result, 'False') + self.block(build)
+
+    def sequence(self, ptlist, fail) -> [ast.stmt]:
+        res = []
+        for pt in ptlist:
+            if type(pt) is parsing.Seq and not pt.cut:
+                res += self.sequence(pt.ptlist, fail)
+            elif type(pt) is parsing.Cut:
+                # committed, the next failures are errors (see Seq)
+                res += stmts('self.cut()')
+                fail = stmts('self.cut_error()')
+            elif type(pt) is parsing.Streamed:
+                # committed before it, as a cut
+                fail = stmts('self.cut_error()')
+                res += self.inline(pt, fail)
+            else:
+                res += self.inline(pt, fail)
+        return res
 
-        fn(*args)
-        """
-        return ast.Call(
-            ast.Attribute(
-                ast.Name('self', ast.Load),
-                node.callObject.__name__,
-                ast.Load()),
-            [ast.Str(param) for param in node.params],
-            [],
-            None,
-            None)
-
-    def visit_CallTrue(self, node: parsing.CallTrue) -> ast.expr:
-        """Generates python code calling the function and returning True.
-
-        lambda: fn(*args) or True
-        """
-        return ast.Lambda(
-            ast.arguments([], None, None, [], None, None, [], []),
-            ast.BoolOp(
-                ast.Or(),
-                [
-                    self.visit_Call(node),
-                    ast.Name('True', ast.Load())]))
+    def params(self, param, check: bool) -> ast.expr:
+        values = []
+        for v, t in param:
+            if t is parsing.Node:
+                if check:
+                    values.append(expr('_capture(self, %(v)s)', v=v))
+                else:
+                    values.append(expr('self.rule_nodes[%(v)s]', v=v))
+            elif type(v) is t:
+                values.append(literal(v))
+            else:
+                raise TypeError("Type mismatch expected {} got {}".format(
+                    t, type(v)))
+        return ast.List(values, ast.Load())
 
-    def visit_Hook(self, node: parsing.Hook) -> ast.expr:
-        """Generates python code calling a hook.
+    ### expressions
 
-        self.evalHook('hookname', self.ruleNodes[-1])
-        """
-        return ast.Call(
-            ast.Attribute(
-                ast.Name('self', ast.Load()), 'evalHook', ast.Load()),
-            [
-                ast.Str(node.name),
-                ast.Subscript(
-                    ast.Attribute(
-                        ast.Name('self', ast.Load()), 'ruleNodes', ast.Load()),
-                    ast.Index(ast.UnaryOp(ast.USub(), ast.Num(1))),
-                    ast.Load())],
-            [],
-            None,
-            None)
+    def visit_SkipIgnore(self, node: parsing.SkipIgnore) -> ast.expr:
+        return expr('self.skip_ignore()')
 
-    def visit_Rule(self, node: parsing.Rule) -> ast.expr:
-        """Generates python code calling a rule.
+    def visit_PeekChar(self, node: parsing.PeekChar) -> ast.expr:
+        return expr('self.peek_char(%(c)s)', c=node.char)
 
-        self.evalRule('rulename')
-        """
-        return ast.Call(
-            ast.Attribute(ast.Name('self', ast.Load()),
-                          'evalRule', ast.Load()),
-            [ast.Str(node.name)], [], None, None)
-
-    def visit_Capture(self, node: parsing.Capture) -> [ast.stmt] or ast.expr:
-        """Generates python code to capture text consumed by a clause.
-
-        #If all clauses can be inlined
-        self.beginTag('tagname') and clause and self.endTag('tagname')
-
-        if not self.beginTag('tagname'):
-            return False
-        <code for the clause>
-        if not self.endTag('tagname'):
-            return False
-        """
-        begintag = ast.Attribute(
-            ast.Name('self', ast.Load()), 'beginTag', ast.Load())
-        endtag = ast.Attribute(
-            ast.Name('self', ast.Load()), 'endTag', ast.Load())
-        begin = ast.Call(begintag, [ast.Str(node.tagname)], [], None, None)
-        end = ast.Call(endtag, [ast.Str(node.tagname)], [], None, None)
-        result = [begin, self.visit(node.pt), end]
-        for clause in result:
-            if not isinstance(clause, ast.expr):
-                break
+    def visit_PeekText(self, node: parsing.PeekText) -> ast.expr:
+        return expr('self.peek_text(%(c)s)', c=node.char)
+
+    def visit_Text(self, node: parsing.Text) -> ast.expr:
+        return expr('self.read_text(%(t)s)', t=node.text)
+
+    def visit_Char(self, node: parsing.Char) -> ast.expr:
+        return expr('self.read_char(%(c)s)', c=node.char)
+
+    def visit_Range(self, node: parsing.Range) -> ast.expr:
+        return expr('self.read_range(%(b)s, %(e)s)', b=node.begin, e=node.end)
+
+    def visit_Class(self, node: parsing.Class) -> ast.expr:
+        chars = node.chars
+        if chars.exact:
+            value = expr('charclass.CharClass(%(r)s)', r=chars.ranges)
         else:
-            return ast.BoolOp(ast.And(), result)
-        res = []
-        for stmt in map(self._clause, result):
-            res.extend(stmt)
+            # the classes of Base
+            name = next((k for k, v in vars(charclass).items()
+                         if v is chars), None)
+            if name is None:
+                raise TypeError("Can't translate the class %r" % chars)
+            value = expr('charclass.%(n)s', n=var(name))
+        g = self.new_global(self.prefix + '_cls', value)
+        src = 'self.read_class(%(g)s, %(m)s)'
+        if node.optional:
+            src += ' or True'
+        return expr(src, g=var(g), m=node.many)
+
+    def visit_UntilChar(self, node: parsing.UntilChar) -> ast.expr:
+        return expr('self.read_until(%(c)s)', c=node.char)
+
+    def visit_Rule(self, node: parsing.Rule) -> ast.expr:
+        return expr('_rule(self, %(n)s)', n=node.name)
+
+    def visit_Hook(self, node: parsing.Hook) -> ast.expr:
+        res = expr('self.eval_hook(%(n)s, [])', n=node.name)
+        res.args[1] = self.params(node.param, True)
         return res
 
-    def visit_Scope(self, node: parsing.Capture) -> [ast.stmt] or ast.expr:
-        """Generates python code for a scope.
+    def visit_Call(self, node: parsing.Call) -> ast.expr:
+        name = parser_attr(node.callObject)
+        if name is None:
+            raise TypeError("Can't translate a call to %r" % node.callObject)
+        res = expr('Parser.%(n)s(self)', n=var(name))
+        for p in node.params:
+            attr = parser_attr(p)
+            if attr is not None:
+                res.args.append(expr('Parser.%(n)s', n=var(attr)))
+            else:
+                res.args.append(literal(p))
+        return res
 
-        if not self.begin():
-            return False
-        res = self.pt()
-        if not self.end():
-            return False
+    def visit_Cut(self, node: parsing.Cut) -> ast.expr:
+        return expr('self.cut()')
+
+    def visit_Error(self, node: parsing.Error) -> ast.expr:
+        return expr('_error(self, %(m)s)', m=node.msg)
+
+    def visit_Seq(self, node: parsing.Seq) -> ast.expr:
+        return self.call(node)
+
+    visit_Alt = visit_Seq
+    visit_RepOptional = visit_Seq
+    visit_Rep0N = visit_Seq
+    visit_Rep1N = visit_Seq
+    visit_Streamed = visit_Seq
+    visit_Capture = visit_Seq
+    visit_Bind = visit_Seq
+    visit_DeclNode = visit_Seq
+    visit_Scope = visit_Seq
+    visit_Directive = visit_Seq
+    visit_Neg = visit_Seq
+    visit_LookAhead = visit_Seq
+    visit_Complement = visit_Seq
+    visit_Until = visit_Seq
+    visit_Regex = visit_Seq
+
+    ### statements
+
+    def inline_SkipIgnore(self, node, fail, result) -> [ast.stmt]:
+        return (stmts('_skip(self, cursor, content)')
+                + self.succeed(result))
+
+    def inline_Char(self, node, fail, result) -> [ast.stmt]:
+        if len(node.char) != 1:
+            return self.test(self.visit(node), fail, result)
+        return self.inline_Text(parsing.Text(node.char), fail, result)
+
+    def inline_Text(self, node, fail, result) -> [ast.stmt]:
+        # the length of a non ascii text depends on the stream (bytes)
+        if len(node.text) == 0 or not node.text.isascii():
+            return self.test(self.visit(node), fail, result)
+        res = stmts('if not content.startswith(%(t)s, cursor._index): pass\n'
+                    'cursor._index += %(n)s', t=node.text, n=len(node.text))
+        res[0].body = fail
+        return res + self.succeed(result)
+
+    def inline_PeekChar(self, node, fail, result) -> [ast.stmt]:
+        if len(node.char) != 1:
+            return self.test(self.visit(node), fail, result)
+        return self.inline_PeekText(node, fail, result)
+
+    def inline_PeekText(self, node, fail, result) -> [ast.stmt]:
+        res = stmts('if not content.startswith(%(t)s, cursor._index): pass',
+                    t=node.char)
+        res[0].body = fail
+        return res + self.succeed(result)
+
+    def inline_Range(self, node, fail, result) -> [ast.stmt]:
+        if not (node.begin + node.end).isascii():
+            return self.test(self.visit(node), fail, result)
+        # an empty slice at the end of stream is lower than begin
+        res = stmts('if not %(b)s <= content[cursor._index:cursor._index + 1]'
+                    ' <= %(e)s: pass\n'
+                    'cursor._index += 1', b=node.begin, e=node.end)
+        res[0].body = fail
+        return res + self.succeed(result)
+
+    def inline_Rule(self, node, fail, result) -> [ast.stmt]:
+        r = result or self.new_var('r')
+        res = stmts('%(push)s\n'
+                    '%(r)s = self.eval_rule(%(n)s)\n'
+                    '%(pop)s\n'
+                    'if not %(r)s: pass', r=var(r), n=node.name)
+        res[-1].body = fail
         return res
-        """
-        return ast.Name('scope_not_implemented', ast.Load())
-        raise NotImplementedError()
 
-    #TODO(bps): forbid nested alt
-    def visit_Alt(self, node: parsing.Alt) -> [ast.stmt]:
-        """Generates python code for alternatives.
+    def inline_DeclNode(self, node, fail, result) -> [ast.stmt]:
+        return (stmts('self.rule_nodes[%(t)s] = Node()', t=node.tagname)
+                + self.succeed(result))
+
+    def inline_Seq(self, node, fail, result) -> [ast.stmt]:
+        p = self.new_var('p')
+        res = stmts('%(p)s = cursor._index', p=var(p))
+        res += self.sequence(node.ptlist, self.restore(p) + fail)
+        return res + self.succeed(result)
+
+    def inline_Alt(self, node, fail, result) -> [ast.stmt]:
+        p = self.new_var('p')
+        r = result or self.new_var('r')
+        res = stmts('%(push)s\n'
+                    '%(p)s = cursor._index\n'
+                    '%(r)s = False', p=var(p), r=var(r))
+        alt_fail = (stmts(POP) + self.restore(p)
+                    + stmts('break'))
+
+        def build(pt):
+            loop = stmts('while True:\n    pass')
+            loop[0].body = (stmts(PUSH)
+                            + self.inline(pt, alt_fail, r)
+                            + stmts('%(pop)s\nbreak'))
+            return loop
+        for i, pt in enumerate(node.ptlist):
+            alt = self.block(lambda: self.block(lambda: build(pt)))
+            if i > 0:
+                guard = stmts('if not %(r)s: pass', r=var(r))
+                guard[0].body = alt
+                alt = guard
+            res += alt
+        res += stmts('%(pop)s\nif not %(r)s: pass', r=var(r))
+        res[-1].body = fail
+        return res
 
-        try:
-            try:
-                <code for clause>  #raise AltFalse when alternative is False
-                raise AltTrue()
-            except AltFalse:
-                pass
-            return False
-        except AltTrue:
-            pass
-        """
-        clauses = [self.visit(clause) for clause in node.ptlist]
-        for clause in clauses:
-            if not isinstance(clause, ast.expr):
-                break
+    def inline_RepOptional(self, node, fail, result) -> [ast.stmt]:
+        if result is None:
+            return self.attempt(node.pt, self.new_var('r'))
+        res = self.attempt(node.pt, result)
+        res += stmts('if not %(r)s:\n    %(r)s = True', r=var(result))
+        return res
+
+    def loop(self, node) -> [ast.stmt]:
+        """Statements of a loop on node, a scope by repetition."""
+        def build():
+            loop = stmts('while True:\n    %(push)s')
+            loop[0].body += self.inline(node, stmts('%(pop)s\nbreak'))
+            loop[0].body += stmts(POP)
+            return loop
+        return self.block(build)
+
+    def inline_Streamed(self, node, fail, result) -> [ast.stmt]:
+        n = self.new_var('n')
+        item = self.new_var('item')
+        res = stmts('self.cut()\n%(n)s = 0', n=var(n))
+
+        def build():
+            loop = stmts('while True:\n    %(push)s')
+            loop[0].body += self.inline(node.pt.pt, stmts('%(pop)s\nbreak'))
+            loop[0].body += stmts(
+                '%(i)s = self.rule_nodes.get(%(t)s)\n'
+                '%(pop)s\n'
+                'self.stream_item(%(i)s)\n'
+                'self.cut()\n'
+                '%(n)s += 1', t=node.tagname, n=var(n), i=var(item))
+            return loop
+        res += self.block(build)
+        if type(node.pt) is parsing.Rep1N:
+            res += stmts('if not %(n)s: pass', n=var(n))
+            res[-1].body = fail
+        return res + self.succeed(result)
+
+    def inline_Rep0N(self, node, fail, result) -> [ast.stmt]:
+        return self.loop(node.pt) + self.succeed(result)
+
+    def inline_Rep1N(self, node, fail, result) -> [ast.stmt]:
+        p = self.new_var('p')
+        res = stmts('%(p)s = cursor._index\n%(push)s', p=var(p))
+        res += self.block(lambda: self.inline(
+            node.pt, stmts(POP) + self.restore(p) + fail))
+        res += stmts(POP)
+        res += self.loop(node.pt)
+        return res + self.succeed(result)
+
+    def inline_Capture(self, node, fail, result) -> [ast.stmt]:
+        r = result or self.new_var('r')
+        res = stmts('self.tag_cache[%(t)s] = Tag(stream, cursor._index)\n'
+                    '%(push)s', t=node.tagname)
+        res += self.inline(node.pt, stmts(POP) + fail, r)
+        res += stmts('%(pop)s\n'
+                     'self.tag_cache[%(t)s].set_end(cursor._index)\n'
+                     'if type(%(r)s) is bool:\n'
+                     '    %(r)s = Node()\n'
+                     'self.id_cache[id(%(r)s)] = %(t)s\n'
+                     'self.rule_nodes[%(t)s] = %(r)s',
+                     t=node.tagname, r=var(r))
+        return res
+
+    def inline_Bind(self, node, fail, result) -> [ast.stmt]:
+        r = result or self.new_var('r')
+        res = self.inline(node.pt, fail, r)
+        return res + stmts('self.bind(%(t)s, %(r)s)', t=node.tagname,
+                           r=var(r))
+
+    def inline_Scope(self, node, fail, result) -> [ast.stmt]:
+        res = self.inline(node.begin, fail)
+        res += self.inline(node.pt, fail, result)
+        return res + self.inline(node.end, fail)
+
+    def inline_Directive(self, node, fail, result) -> [ast.stmt]:
+        directive = type(node.directive)
+        ns_name = getattr(directive, 'ns_name', None)
+        if meta._directives.get(ns_name) is not directive:
+            raise TypeError("Can't translate the directive %r" % directive)
+        d = self.new_global(ns_name, expr('meta._directives[%(n)s]()',
+                                          n=ns_name))
+        r = result or self.new_var('r')
+        v = self.new_var('v')
+        res = stmts('%(v)s = []', v=var(v))
+        res[0].value = self.params(node.param, False)
+        if any(t is parsing.Node for _, t in node.param):
+            res += stmts('if not %(d)s.checkParam(%(v)s): pass',
+                         d=var(d), v=var(v))
+            res[-1].body = copy.deepcopy(fail)
         else:
-            return ast.BoolOp(ast.Or(), clauses)
-        res = ast.Try([], [ast.ExceptHandler(
-            ast.Name('AltTrue', ast.Load()), None, [ast.Pass()])], [], [])
-        alt_true = [ast.Raise(ast.Call(
-            ast.Name('AltTrue', ast.Load()), [], [], None, None), None)]
-        alt_false = [ast.ExceptHandler(
-            ast.Name('AltFalse', ast.Load()), None, [ast.Pass()])]
-        self.in_try += 1
-        for clause in node.ptlist:
-            res.body.append(
-                ast.Try(self._clause(self.visit(clause)) + alt_true,
-                        alt_false, [], []))
-        self.in_try -= 1
-        res.body.append(self.__exit_scope())
-        return [res]
-
-    def combine_exprs_for_clauses(self, exprs: [ast.expr]) -> [ast.stmt]:
-        expr = exprs[0] if len(exprs) == 1 else ast.BoolOp(ast.And(), exprs)
-        return self._clause(expr)
-
-    def visit_Seq(self, node: parsing.Seq) -> [ast.stmt] or ast.expr:
-        """Generates python code for clauses.
-
-        #Continuous clauses which can can be inlined are combined with and
-        clause and clause
-
-        if not clause:
-            return False
-        if not clause:
-            return False
-        """
-        exprs, stmts = [], []
-        for clause in node.ptlist:
-            clause_ast = self.visit(clause)
-            if isinstance(clause_ast, ast.expr):
-                exprs.append(clause_ast)
-            else:
-                if exprs:
-                    stmts.extend(self.combine_exprs_for_clauses(exprs))
-                    exprs = []
-                stmts.extend(self._clause(clause_ast))
-        if not stmts:
-            return ast.BoolOp(ast.And(), exprs)
-        if exprs:
-            stmts.extend(self.combine_exprs_for_clauses(exprs))
-        return stmts
-
-    def visit_RepOptional(self, node: parsing.RepOptional) -> ([ast.stmt] or
-                                                               ast.expr):
-        """Generates python code for an optional clause.
-
-        <code for the clause>
-        """
-        cl_ast = self.visit(node.pt)
-        if isinstance(cl_ast, ast.expr):
-            return ast.BoolOp(ast.Or(), [cl_ast, ast.Name('True', ast.Load())])
-        self.in_optional += 1
-        cl_ast = self.visit(node.pt)
-        self.in_optional -= 1
-        return cl_ast
-
-    def visit_Rep0N(self, node: parsing.Rep0N) -> [ast.stmt]:
-        """Generates python code for a clause repeated 0 or more times.
-
-        #If all clauses can be inlined
-        while clause:
-            pass
-
-        while True:
-            <code for the clause>
-        """
-        cl_ast = self.visit(node.pt)
-        if isinstance(cl_ast, ast.expr):
-            return [ast.While(cl_ast, [ast.Pass()], [])]
-        self.in_loop += 1
-        clause = self._clause(self.visit(node.pt))
-        self.in_loop -= 1
-        return [ast.While(ast.Name('True', ast.Load()), clause, [])]
-
-    def visit_Rep1N(self, node: parsing.Rep0N) -> [ast.stmt]:
-        """Generates python code for a clause repeated 1 or more times.
-
-        <code for the clause>
-        while True:
-            <code for the clause>
-        """
-        clause = self.visit(node.pt)
-        if isinstance(clause, ast.expr):
-            return (self._clause(clause) + self.visit_Rep0N(node))
-        self.in_loop += 1
-        clause = self._clause(self.visit(node.pt))
-        self.in_loop -= 1
-        return self._clause(self.visit(node.pt)) + [
-            ast.While(ast.Name('True', ast.Load()), clause, [])]
+            # constant parameters are checked once
+            node.directive.checkParam([p for p, _ in node.param])
+        res += stmts('if not %(d)s.begin(self, *%(v)s): pass',
+                     d=var(d), v=var(v))
+        res[-1].body = copy.deepcopy(fail)
+        res += self.attempt(node.pt, r)
+        res += stmts('if not %(d)s.end(self, *%(v)s) or not %(r)s: pass',
+                     d=var(d), v=var(v), r=var(r))
+        res[-1].body = fail
+        return res
+
+    def inline_Neg(self, node, fail, result) -> [ast.stmt]:
+        p = self.new_var('p')
+        ok = self.new_var('ok')
+        res = stmts('%(p)s = cursor._index', p=var(p))
+        res += self.attempt(node.pt, ok)
+        res += stmts('if %(ok)s: pass', ok=var(ok))
+        res[-1].body = self.restore(p) + fail
+        return res + self.succeed(result)
+
+    def inline_LookAhead(self, node, fail, result) -> [ast.stmt]:
+        p = self.new_var('p')
+        r = result or self.new_var('r')
+        res = stmts('%(p)s = cursor._index', p=var(p))
+        res += self.attempt(node.pt, r)
+        res += self.restore(p)
+        res += stmts('if not %(r)s: pass', r=var(r))
+        res[-1].body = fail
+        return res
+
+    def inline_Complement(self, node, fail, result) -> [ast.stmt]:
+        if node.literal is not None:
+            res = stmts('if (cursor._index == stream._len\n'
+                        '        or content.startswith(%(t)s, cursor._index)):\n'
+                        '    pass\n'
+                        'stream.incpos()', t=node.literal)
+            res[0].body = copy.deepcopy(fail)
+            return res + self.succeed(result)
+        p = self.new_var('p')
+        ok = self.new_var('ok')
+        res = stmts('if cursor._index == stream._len: pass\n'
+                    '%(p)s = cursor._index', p=var(p))
+        res[0].body = copy.deepcopy(fail)
+        res += self.attempt(node.pt, ok)
+        res += stmts('if %(ok)s: pass\nstream.incpos()', ok=var(ok))
+        res[-2].body = self.restore(p) + fail
+        return res + self.succeed(result)
+
+    def inline_Until(self, node, fail, result) -> [ast.stmt]:
+        if node.literal is not None:
+            e = self.new_var('e')
+            res = stmts('%(e)s = content.find(%(t)s, cursor._index)\n'
+                        'if %(e)s == -1:\n'
+                        '    self.undo_last_ignore()\n'
+                        'stream.incpos(%(e)s - cursor._index'
+                        ' + stream.text_length(%(t)s))',
+                        e=var(e), t=node.literal)
+            res[1].body += copy.deepcopy(fail)
+            return res + self.succeed(result)
+        p = self.new_var('p')
+        ok = self.new_var('ok')
+        res = stmts('%(p)s = cursor._index\n'
+                    '%(ok)s = False\n'
+                    'while cursor._index != stream._len:\n'
+                    '    pass', p=var(p), ok=var(ok))
+        res[-1].body = self.block(lambda: self.attempt(node.pt, ok))
+        res[-1].body += stmts('if %(ok)s:\n    break\nstream.incpos()',
+                              ok=var(ok))
+        res += stmts('if not %(ok)s:\n    self.undo_last_ignore()',
+                     ok=var(ok))
+        res[-1].body[0:0] = self.restore(p)
+        res[-1].body += fail
+        return res + self.succeed(result)
+
+    def inline_Regex(self, node, fail, result) -> [ast.stmt]:
+        regexes = ast.Dict([], [])
+        for convention, regex in node.regexes.items():
+            name = parser_attr(convention)
+            if name is None:
+                continue
+            probes = []
+            for chars in node.probes.get(convention, (None, None)):
+                probes.append(ast.Constant(None) if chars is None else expr(
+                    'charclass.CharClass(%(r)s)', r=chars.ranges))
+            regexes.keys.append(expr('Parser.%(n)s', n=var(name)))
+            regexes.values.append(ast.Tuple(
+                [expr('re.compile(%(p)s)', p=regex.pattern)] + probes,
+                ast.Load()))
+        table = self.new_global(self.prefix + '_re', regexes)
+        r = result or self.new_var('r')
+        m = self.new_var('m')
+        t = self.new_var('t')
+        e = self.new_var('e')
+        res = stmts(
+            'if self._ignores:\n'
+            '    %(t)s = %(table)s.get(self._ignores[-1])\n'
+            'else:\n'
+            '    %(t)s = %(table)s.get(Parser.ignore_null)\n'
+            'if %(t)s is not None and type(content) is str:\n'
+            '    %(m)s = %(t)s[0].match(content, cursor._index)\n'
+            '    if %(m)s is None:\n'
+            '        %(e)s, %(t)s = cursor._index, %(t)s[1]\n'
+            '    else:\n'
+            '        %(e)s, %(t)s = %(m)s.end(), %(t)s[2]\n'
+            '    if %(t)s is None or not (%(e)s < stream._len\n'
+            '                             and content[%(e)s] in %(t)s):\n'
+            '        %(t)s = None\n'
+            '        %(r)s = %(m)s is not None\n'
+            '        if %(r)s:\n'
+            '            cursor._index = %(e)s\n'
+            'else:\n'
+            '    %(t)s = 0\n'
+            'if %(t)s is not None:\n'
+            '    # read as far as pt, see Regex\n'
+            '    pass\n',
+            table=var(table), t=var(t), m=var(m), e=var(e), r=var(r))
+        res[-1].body = self.block(lambda: self.attempt(node.pt, r))
+        if any(regex.groups for regex in node.regexes.values()):
+            # keep track of the last ignore, as skip_ignore
+            res[-2].body[-1].body[-1].body += stmts(
+                'last = max((end for _, end in %(m)s.regs[1:]), default=-1)\n'
+                'if last >= 0:\n'
+                '    self._lastIgnoreIndex = last', m=var(m))
+        res += stmts('if not %(r)s: pass', r=var(r))
+        res[-1].body = fail
+        return res
 
 
-def rule_topython(rule: parsing.ParserTree) -> [ast.stmt]:
-    return RuleVisitor().visit(rule)
+def base_import(cls: type) -> str:
+    """Return the name to import cls, or None."""
+    module = sys.modules.get(cls.__module__)
+    if module is None:
+        return None
+    for name, value in vars(module).items():
+        if value is cls:
+            return name
+    return None
 
 
-def parserrule_topython(parser: parsing.BasicParser,
-                        rulename: str) -> ast.FunctionDef:
-    """Generates code for a rule.
+def grammar_topython(cls: type, name: str=None,
+                     import_base: bool=True) -> ast.Module:
+    """Translate the rules of the grammar cls into a python module.
 
-    def rulename(self):
-        <code for the rule>
-        return True
+    The module define a subclass named name (cls name by default) of cls,
+    with a function by rule in place of the functors.  The hooks and the
+    rules written in python are shared with cls.
+    cls is imported as _Grammar when import_base is True, else it must be
+    defined in the namespace of the module.
     """
+    if name is None:
+        name = cls.__name__
+    module = ast.parse(HEADER)
+    module.body.insert(0, ast.Expr(ast.Constant(
+        "Rules of %s.%s translated by pyrser.passes.topython." % (
+            cls.__module__, cls.__name__))))
+    if import_base:
+        attr = base_import(cls)
+        if attr is None:
+            raise ValueError("%s can't be imported from %s" % (
+                cls.__name__, cls.__module__))
+        module.body += stmts('from %(m)s import %(a)s as _Grammar',
+                             m=var(cls.__module__), a=var(attr))
     visitor = RuleVisitor()
-    rule = parser._rules[rulename]
-    fn_args = ast.arguments([ast.arg('self', None)], None, None, [], None,
-                            None, [], [])
-    body = visitor._clause(rule_topython(rule))
-    body.append(ast.Return(ast.Name('True', ast.Load())))
-    return ast.FunctionDef(rulename, fn_args, body, [], None)
+    rules = ast.Dict([], [])
+    for rule_name, rule in cls.finalize()[0].items():
+        if not isinstance(rule, parsing.Functor):
+            continue
+        visitor.prefix = rule_name.rpartition('.')[2]
+        fun = visitor.function(rule)
+        rules.keys.append(ast.Constant(rule_name))
+        rules.values.append(ast.Name(fun, ast.Load()))
+    module.body += visitor.globals
+    module.body += visitor.functions
+    module.body += stmts(
+        'class %(n)s(_Grammar):\n'
+        '    """%(n)s, with rules translated to python."""\n'
+        '    # positions to restore are locals, not saved contexts\n'
+        '    discard_stream = False\n'
+        '\n'
+        '%(n)s._rules = _Grammar._rules.new_child({})\n'
+        '%(n)s._hooks = _Grammar._hooks.new_child()', n=var(name))
+    module.body[-2].value.args[0] = rules
+    return ast.fix_missing_locations(module)
+
+
+def to_source(cls: type, name: str=None) -> str:
+    """Return the source of the python module of the grammar cls."""
+    return ast.unparse(grammar_topython(cls, name)) + '\n'
+
+
+def compile_grammar(cls: type, name: str=None) -> type:
+    """Translate the grammar cls and return the generated subclass."""
+    if name is None:
+        name = cls.__name__
+    module = grammar_topython(cls, name, import_base=False)
+    code = compile(module, '<%s translated to python>' % name, 'exec')
+    namespace = {'__name__': cls.__module__, '_Grammar': cls}
+    exec(code, namespace)
+    return namespace[name]
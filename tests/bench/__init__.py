@@ -0,0 +1,85 @@
+"""Micro benchmarks of pyrser internals.
+
+Each module is runnable, i.e: python -m tests.bench.context
+"""
+import os
+import time
+
+from pyrser import grammar
+from pyrser import meta
+
+
+def best_of(fun, repeat: int=5) -> float:
+    """Return the best wall time of repeat calls to fun."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fun()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def json_grammar() -> grammar.Grammar:
+    """Build the grammar of tests/bnf/json.bnf with its hooks."""
+    fn = os.path.join(os.path.dirname(__file__), os.pardir, 'bnf', 'json.bnf')
+    JSON = grammar.from_file(fn, 'json')
+
+    @meta.hook(JSON)
+    def is_num(self, ast, n):
+        ast.node = float(self.value(n))
+        return True
+
+    @meta.hook(JSON)
+    def is_str(self, ast, s):
+        ast.node = self.value(s).strip('"')
+        return True
+
+    @meta.hook(JSON)
+    def is_bool(self, ast, b):
+        ast.node = self.value(b) == "true"
+        return True
+
+    @meta.hook(JSON)
+    def is_none(self, ast):
+        ast.node = None
+        return True
+
+    @meta.hook(JSON)
+    def is_pair(self, ast, s, v):
+        ast.node = (self.value(s).strip('"'), v.node)
+        return True
+
+    @meta.hook(JSON)
+    def is_array(self, ast):
+        ast.node = []
+        return True
+
+    @meta.hook(JSON)
+    def add_item(self, ast, item):
+        ast.node.append(item.node)
+        return True
+
+    @meta.hook(JSON)
+    def is_dict(self, ast):
+        ast.node = {}
+        return True
+
+    @meta.hook(JSON)
+    def add_kv(self, ast, item):
+        ast.node[item.node[0]] = item.node[1]
+        return True
+
+    return JSON
+
+
+def json_document(nitems: int) -> str:
+    """Build a JSON document with nitems records."""
+    items = []
+    for i in range(nitems):
+        items.append(
+            '{"id": %d, "name": "item %d", "price": %d.5e1,'
+            ' "tags": ["a", "b", "c"], "ok": true, "none": null}' % (i, i, i)
+        )
+    return '{"items": [\n' + ',\n'.join(items) + '\n]}'
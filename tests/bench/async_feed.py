@@ -0,0 +1,67 @@
+"""Benchmark of the parse of chunks given by an asyncio task.
+
+Parse a csv received by chunks, buffered then parsed in the event loop,
+then thru Grammar.async_feed, and report the wall time and the worst
+delay of a task ticking every millisecond meanwhile.
+
+    python -m tests.bench.async_feed
+"""
+import asyncio
+import time
+
+from tests.bench.iter_parse import StreamedCSV, lines
+
+
+async def ticker(delays: list):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        delays.append(time.perf_counter() - start - 0.001)
+
+
+async def buffered(chunks: list):
+    data = []
+    for chunk in chunks:
+        data.append(chunk)
+        await asyncio.sleep(0)
+    parser = StreamedCSV()
+    parser.parse(''.join(data))
+    return parser.streamed_items
+
+
+async def fed(chunks: list):
+    feeder = StreamedCSV().async_feed()
+
+    async def produce():
+        for chunk in chunks:
+            await feeder.feed(chunk)
+        await feeder.close()
+    producer = asyncio.ensure_future(produce())
+    items = [item async for item in feeder.items()]
+    await producer
+    return items
+
+
+async def run(parse, chunks: list):
+    delays = []
+    tick = asyncio.ensure_future(ticker(delays))
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await parse(chunks)
+    elapsed = time.perf_counter() - start
+    # let the ticker see the last delay
+    await asyncio.sleep(0.01)
+    tick.cancel()
+    return elapsed, max(delays)
+
+
+def main():
+    chunks = list(lines(5000))
+    for name, parse in (("buffered", buffered), ("async_feed", fed)):
+        elapsed, delay = asyncio.run(run(parse, chunks))
+        print("%d lines, %s: %.3f s, worst tick delay %.1f ms" % (
+            len(chunks), name, elapsed, delay * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Benchmark of the parse of bytes in place.
+
+Parse a log received as utf-8 bytes, decoded first then parsed in place,
+and report the wall time and the peak of memory allocated by python.
+
+    python -m tests.bench.bytes
+"""
+import time
+import tracemalloc
+
+from pyrser import grammar
+
+
+class Log(grammar.Grammar):
+    entry = 'log'
+    grammar = """
+        log = [ entry+ eof ]
+        entry = [ num ':' num id id num id ]
+    """
+
+
+def main():
+    data = ''.join("12:%02d INFO requête %d done\n" % (i % 60, i)
+                   for i in range(20000)).encode('utf-8')
+    cases = [
+        ("decoded", lambda: Log().parse(data.decode('utf-8'))),
+        ("in place", lambda: Log().parse(data)),
+    ]
+    for name, parse in cases:
+        start = time.perf_counter()
+        parse()
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        res = parse()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del res
+        print("%d bytes, %s: %.3f s, peak %.1f MB" % (
+            len(data), name, elapsed, peak / 1e6))
+
+
+if __name__ == '__main__':
+    main()
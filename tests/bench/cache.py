@@ -0,0 +1,51 @@
+"""Benchmark of the cache of the rules built by the DSL.
+
+Import a module building the grammars of tests/bnf/tl4t.bnf and
+tests/bnf/json.bnf in a fresh interpreter, with a cold cache and with a
+warm cache.
+
+    python -m tests.bench.cache
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from tests import bench
+
+BNF = os.path.join(os.path.dirname(__file__), os.pardir, 'bnf')
+MODULE = """
+from pyrser import grammar
+TL4T = grammar.from_file('tl4t.bnf', 'source')
+JSON = grammar.from_file('json.bnf', 'json')
+"""
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ('tl4t.bnf', 'json.bnf'):
+            shutil.copy(os.path.join(BNF, name), tmp)
+        with open(os.path.join(tmp, 'grammars.py'), 'w') as f:
+            f.write(MODULE)
+        env = dict(os.environ)
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+        env['PYTHONPATH'] = os.getcwd()
+        pycache = os.path.join(tmp, '__pycache__')
+
+        def start(cold: bool):
+            if cold:
+                shutil.rmtree(pycache, ignore_errors=True)
+            subprocess.run([sys.executable, '-c', 'import grammars'],
+                           cwd=tmp, env=env, check=True)
+
+        cold = bench.best_of(lambda: start(True))
+        warm = bench.best_of(lambda: start(False))
+        python = bench.best_of(lambda: subprocess.run(
+            [sys.executable, '-c', 'import pyrser.grammar'], env=env))
+        print("import of tl4t and json: cold %.3f s, warm %.3f s"
+              " (import of pyrser %.3f s)" % (cold, warm, python))
+
+
+if __name__ == '__main__':
+    main()
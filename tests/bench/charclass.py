@@ -0,0 +1,48 @@
+"""Benchmark of the classes of characters.
+
+Parse words and numbers written with ranges, with classes of characters
+and with the rules of Base, from a str and from bytes.
+
+    python -m tests.bench.charclass
+"""
+from pyrser import grammar
+from tests import bench
+
+
+class Ranges(grammar.Grammar):
+    entry = 'items'
+    grammar = """
+        items = [ [word | number] [',' [word | number]]* eof ]
+        word = [ ['a'..'z' | '_'] ['a'..'z' | '_' | '0'..'9']* ]
+        number = [ ['0'..'9']+ ]
+    """
+
+
+class Classes(grammar.Grammar):
+    entry = 'items'
+    grammar = """
+        items = [ [word | number] [',' [word | number]]* eof ]
+        word = [ { 'a'..'z' '_' } { 'a'..'z' '_' '0'..'9' }* ]
+        number = [ { '0'..'9' }+ ]
+    """
+
+
+class Base(grammar.Grammar):
+    entry = 'items'
+    grammar = """
+        items = [ [id | num] [',' [id | num]]* eof ]
+    """
+
+
+def main():
+    source = ','.join("request_%d,%d" % (i, i * 7919) for i in range(10000))
+    data = source.encode('utf-8')
+    for cls in (Ranges, Classes, Base):
+        text = bench.best_of(lambda: cls().parse(source), 3)
+        raw = bench.best_of(lambda: cls().parse(data), 3)
+        print("%d chars, %s: str %.3f s, bytes %.3f s" % (
+            len(source), cls.__name__, text, raw))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Benchmark of the parse of a stream pulled by chunks.
+
+Parse a generated log, joined in a string and pulled line by line thru a
+ChunkedStream, and report the wall time and the peak of memory allocated
+by python.
+
+    python -m tests.bench.chunked
+"""
+import time
+import tracemalloc
+
+from pyrser import grammar
+from pyrser import meta
+
+
+class Log(grammar.Grammar):
+    entry = 'log'
+    grammar = """
+        log = [ [entry:e #count(e)]* ]
+        entry = [ num ':' num id id num id ]
+    """
+
+
+@meta.hook(Log)
+def count(self, e):
+    self.entries = getattr(self, 'entries', 0) + 1
+    return True
+
+
+def lines(n: int):
+    for i in range(n):
+        yield "12:%02d INFO request %d done\n" % (i % 60, i)
+
+
+def main():
+    for n in (5000, 20000):
+        cases = [
+            ("string", lambda p: p.parse(''.join(lines(n)))),
+            ("chunks", lambda p: p.parse_stream(lines(n))),
+        ]
+        for name, parse in cases:
+            start = time.perf_counter()
+            parse(Log())
+            elapsed = time.perf_counter() - start
+            tracemalloc.start()
+            parse(Log())
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print("%d lines, %s: %.3f s, peak %.1f KB" % (
+                n, name, elapsed, peak / 1e3))
+
+
+if __name__ == '__main__':
+    main()
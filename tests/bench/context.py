@@ -0,0 +1,50 @@
+"""Benchmark of Stream.save_context/restore_context.
+
+Measure the cost of a save/restore pair, the memory blocks it allocates,
+and the parsing time of tests/bnf/json.bnf.
+
+    python -m tests.bench.context
+"""
+import timeit
+import tracemalloc
+
+from pyrser import parsing
+from tests import bench
+
+
+def save_restore_allocations(stream: parsing.Stream, n: int) -> int:
+    """Count the memory blocks still allocated during n save/restore."""
+    stream.incpos(500)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(n):
+        stream.save_context()
+        stream.save_context()
+        stream.restore_context()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    return sum(stat.count_diff for stat in stats if stat.count_diff > 0)
+
+
+def main():
+    stream = parsing.Stream("x" * 1000 + "\n" * 1000)
+    stream.incpos(1500)
+    n = 1000000
+    t = timeit.timeit(
+        "s.save_context(); s.restore_context()",
+        globals={'s': stream},
+        number=n
+    )
+    print("save/restore pair: %.1f ns" % (t * 1e9 / n))
+    stream = parsing.Stream("x" * 1000)
+    blocks = save_restore_allocations(stream, 1000)
+    print("blocks alive after 1000 nested saves: %d" % blocks)
+    JSON = bench.json_grammar()
+    doc = bench.json_document(300)
+    t = bench.best_of(lambda: JSON().parse(doc))
+    print("json.bnf parse of %d chars: %.3f s" % (len(doc), t))
+
+
+if __name__ == '__main__':
+    main()
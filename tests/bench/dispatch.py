@@ -0,0 +1,56 @@
+"""Benchmark of the Functor call dispatch.
+
+Compare the direct dispatch used when no decorator is active with the
+instrumented dispatch (looping over the active decorators, the only mode
+before), on a single functor call and on tests/grammar/tl4t.py.
+
+    python -m tests.bench.dispatch
+"""
+import contextlib
+import io
+import timeit
+
+from pyrser import parsing
+from tests import bench
+from tests.grammar.tl4t import TL4T
+
+SOURCE = """
+fun f(x : int, y : str) : int
+{
+    var z : toto = x + y * 2;
+    z = f(x, 12) - (y / 3);
+    print("hello", z);
+}
+"""
+
+
+def call_overhead(n: int) -> float:
+    """Return the ns spent in __call__ around do_call."""
+    parser = parsing.Parser("a")
+    functor = parsing.Neg(parsing.Char('b'))
+    g = {'f': functor, 'p': parser}
+    called = timeit.timeit("f(p)", globals=g, number=n)
+    direct = timeit.timeit("f.do_call(p)", globals=g, number=n)
+    return (called - direct) * 1e9 / n
+
+
+def parse_tl4t(source: str) -> float:
+    """Return the best time to parse source with TL4T."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return bench.best_of(lambda: TL4T().parse(source))
+
+
+def main():
+    source = SOURCE * 20
+    modes = [
+        ("instrumented", parsing.Functor.decorated_call),
+        ("direct", parsing.Functor.direct_call),
+    ]
+    for name, call in modes:
+        parsing.Functor.__call__ = call
+        print("%s dispatch: %.1f ns per call, tl4t %d chars: %.3f s" % (
+            name, call_overhead(500000), len(source), parse_tl4t(source)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+"""Benchmark of the creation of grammars.
+
+Create batches of small grammars with from_string (not cached on disk),
+the cost of a batch must not grow with the number of grammars created.
+
+    python -m tests.bench.dsl
+"""
+import time
+
+from pyrser import grammar
+
+BNF = """
+    a = [ "x" id [b | c]* ]
+    b = [ num ]
+    c = [ string ]
+"""
+
+
+def main():
+    for batch in range(5):
+        start = time.perf_counter()
+        for _ in range(200):
+            grammar.from_string(BNF, 'a')
+        print("grammars %4d to %4d: %.3f s" % (
+            batch * 200, (batch + 1) * 200, time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Benchmark of the parse of a text thru events instead of a tree.
+
+Parse json records, one by line, with parse, then with
+Grammar.parse_events and a handler counting the events, and report the
+wall time and the peak of memory allocated by python.  The events of a
+record are delivered once it is parsed, the events of a single document
+are buffered up to its end as any alternative could still fail.
+
+    python -m tests.bench.events
+"""
+import time
+import tracemalloc
+
+from pyrser import grammar
+from pyrser import meta
+from tests import bench
+
+
+class Count(grammar.EventHandler):
+    def __init__(self):
+        self.events = 0
+
+    def capture(self, name, start, end):
+        self.events += 1
+
+    def hook(self, name, args):
+        self.events += 1
+
+
+def records_grammar() -> grammar.Grammar:
+    JSON = bench.json_grammar()
+    Records = type('Records', (grammar.Grammar, JSON), {
+        'entry': 'records',
+        'grammar': "records = [ [object:o #add_record(_, o)]* eof ]"})
+
+    @meta.hook(Records)
+    def add_record(self, ast, o):
+        if not hasattr(ast, 'records'):
+            ast.records = []
+        ast.records.append(o.node)
+        return True
+    return Records
+
+
+def main():
+    Records = records_grammar()
+    for n in (50, 200):
+        source = bench.json_document(n)
+        records = source[source.index('{', 1):source.rindex('}', 0, -1) + 1]
+        records = records.replace(',\n', '\n')
+        cases = [
+            ("document, tree", lambda: Records().parse(source, 'json')),
+            ("document, events",
+             lambda: Records().parse_events(source, Count(), 'json')),
+            ("records, tree", lambda: Records().parse(records)),
+            ("records, events",
+             lambda: Records().parse_events(records, Count())),
+        ]
+        for name, parse in cases:
+            start = time.perf_counter()
+            parse()
+            elapsed = time.perf_counter() - start
+            tracemalloc.start()
+            res = parse()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            del res
+            print("json %d chars, %s: %.3f s, peak %.1f KB" % (
+                len(source), name, elapsed, peak / 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""Benchmark of the parse of a file thru a mmap.
+
+Parse a log file, loaded in memory and mapped, and report
+the wall time and the peak of memory allocated by python.
+
+    python -m tests.bench.filestream
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+
+from pyrser import grammar
+
+
+class Log(grammar.Grammar):
+    entry = 'log'
+    grammar = """
+        log = [ entry+ eof ]
+        entry = [ num ':' num id id num id ]
+    """
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        fn = os.path.join(tmp, 'some.log')
+        with open(fn, 'w', encoding='utf-8') as f:
+            for i in range(20000):
+                f.write("12:%02d INFO request %d done\n" % (i % 60, i))
+        size = os.path.getsize(fn)
+        for mapped in (False, True):
+            start = time.perf_counter()
+            Log().parse_file(fn, mapped=mapped)
+            elapsed = time.perf_counter() - start
+            tracemalloc.start()
+            Log().parse_file(fn, mapped=mapped)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print("%d bytes, mapped=%s: %.3f s, peak %.1f MB" % (
+                size, mapped, elapsed, peak / 1e6))
+
+
+if __name__ == '__main__':
+    main()
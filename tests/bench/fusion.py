@@ -0,0 +1,49 @@
+"""Benchmark of the fusion of terminal subtrees into Regex.
+
+Parse a stream of identifiers, numbers and strings written with
+terminals and repetitions, and tests/bnf/json.bnf, with and without
+regex fusion.
+
+    python -m tests.bench.fusion
+"""
+from pyrser import grammar
+from tests import bench
+
+
+class Tokens(grammar.Grammar):
+    entry = 'tokens'
+    grammar = """
+        tokens = [ [ident | number | quoted]+ eof ]
+        ident = [
+            ['a'..'z' | 'A'..'Z' | '_']
+            ['a'..'z' | 'A'..'Z' | '0'..'9' | '_']*
+        ]
+        number = [ ['0'..'9']+ ['.' ['0'..'9']+]? ]
+        quoted = [ '"' [ ~'"' ]* '"' ]
+    """
+
+
+def tokens_document(nitems: int) -> str:
+    items = []
+    for i in range(nitems):
+        items.append('"item %d" %d.%d "some text %d"' % (i, i, i * 7, i))
+    return '\n'.join(items)
+
+
+def main():
+    JSON = bench.json_grammar()
+    cases = [
+        ("tokens", Tokens, tokens_document(1000)),
+        ("json", JSON, bench.json_document(300)),
+    ]
+    for name, cls, source in cases:
+        fused = type(cls.__name__ + 'Fused', (grammar.Grammar, cls),
+                     {'entry': cls.entry, 'regex_fusion': True})
+        print("%s %d chars: functors %.3f s, regex %.3f s" % (
+            name, len(source),
+            bench.best_of(lambda: cls().parse(source)),
+            bench.best_of(lambda: fused().parse(source))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Benchmark of the parse of a csv stream yielding its lines.
+
+Parse a generated csv pulled by chunks, accumulating the lines under _
+with parse_stream, then yielding them with Grammar.iter_parse, and
+report the wall time and the peak of memory allocated by python.
+
+    python -m tests.bench.iter_parse
+"""
+import time
+import tracemalloc
+
+from pyrser import grammar
+from pyrser import meta
+
+
+class CSV(grammar.Grammar):
+    entry = 'csv'
+    grammar = """
+        csv = [ [@ignore("null") line:l #add_line(_, l)]+ eof ]
+        line = [ item:c #add_col(_, c) [';' item:c #add_col(_, c)]* eol ]
+        item = [ id | num ]
+    """
+
+
+class StreamedCSV(grammar.Grammar, CSV):
+    entry = 'csv'
+    grammar = """
+        csv = [ @stream("l") [@ignore("null") line:l]+ eof ]
+    """
+
+
+@meta.hook(CSV)
+def add_line(self, csv, line):
+    if not hasattr(csv, 'lines'):
+        csv.lines = []
+    csv.lines.append(line.cols)
+    return True
+
+
+@meta.hook(CSV)
+def add_col(self, line, c):
+    if not hasattr(line, 'cols'):
+        line.cols = []
+    line.cols.append(self.value(c))
+    return True
+
+
+def lines(n: int):
+    for i in range(n):
+        yield "id%d;%d;name%d;%d\n" % (i, i, i % 7, i * 3)
+
+
+def main():
+    for n in (5000, 20000):
+        cases = [
+            ("parse_stream", lambda: CSV().parse_stream(lines(n))),
+            ("iter_parse", lambda: sum(
+                1 for line in StreamedCSV().iter_parse(lines(n)))),
+        ]
+        for name, parse in cases:
+            start = time.perf_counter()
+            parse()
+            elapsed = time.perf_counter() - start
+            tracemalloc.start()
+            parse()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print("%d lines, %s: %.3f s, peak %.1f KB" % (
+                n, name, elapsed, peak / 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""Benchmark of the parse of many files in worker processes.
+
+Parse json documents one at a time with parse_file, then with
+Grammar.parse_many on all the cores.
+
+    python -m tests.bench.parse_many
+"""
+import os
+import tempfile
+import time
+
+from tests import bench
+
+
+def main():
+    JSON = bench.json_grammar()
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(100):
+            path = os.path.join(tmp, '%d.json' % i)
+            with open(path, 'w') as f:
+                f.write(bench.json_document(20))
+            paths.append(path)
+        start = time.perf_counter()
+        for path in paths:
+            JSON().parse_file(path)
+        loop = time.perf_counter() - start
+        start = time.perf_counter()
+        for path, res in JSON.parse_many(paths):
+            pass
+        many = time.perf_counter() - start
+        print("%d files: loop %.3f s, parse_many on %d cores %.3f s" % (
+            len(paths), loop, os.cpu_count(), many))
+
+
+if __name__ == '__main__':
+    main()
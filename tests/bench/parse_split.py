@@ -0,0 +1,59 @@
+"""Benchmark of the parse of a file by pieces in worker processes.
+
+Parse a csv file with parse_file, then with Grammar.parse_split on all
+the cores.
+
+    python -m tests.bench.parse_split
+"""
+import os
+import tempfile
+import time
+
+from pyrser import grammar
+from pyrser import meta
+
+
+class Rows(grammar.Grammar):
+    entry = 'rows'
+    split_after = '\n'
+    grammar = """
+        rows = [ [@ignore("null") row:r #add_row(_, r)]+ eof ]
+        row = [ cell:c #add_cell(_, c) [';' cell:c #add_cell(_, c)]* eol ]
+        cell = [ id | num ]
+    """
+
+
+@meta.hook(Rows)
+def add_row(self, rows, r):
+    if not hasattr(rows, 'tab'):
+        rows.tab = []
+    rows.tab.append(r.cells)
+    return True
+
+
+@meta.hook(Rows)
+def add_cell(self, row, c):
+    if not hasattr(row, 'cells'):
+        row.cells = []
+    row.cells.append(self.value(c))
+    return True
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        fn = os.path.join(tmp, 'some.csv')
+        with open(fn, 'w') as f:
+            for i in range(20000):
+                f.write("id%d;%d;name%d;%d\n" % (i, i, i % 7, i * 3))
+        start = time.perf_counter()
+        Rows().parse_file(fn)
+        whole = time.perf_counter() - start
+        start = time.perf_counter()
+        Rows().parse_split(fn, chunk_size=1 << 16)
+        split = time.perf_counter() - start
+        print("%d bytes: parse_file %.3f s, parse_split on %d cores %.3f s"
+              % (os.path.getsize(fn), whole, os.cpu_count(), split))
+
+
+if __name__ == '__main__':
+    main()
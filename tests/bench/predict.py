@@ -0,0 +1,39 @@
+"""Benchmark of the predictive dispatch of Alt.
+
+Parse tests/bnf/json.bnf and tests/grammar/tl4t.py documents trying all
+the alternatives in order, then only those whose FIRST set match.
+
+    python -m tests.bench.predict
+"""
+import contextlib
+import io
+
+from pyrser import grammar
+from tests import bench
+from tests.bench.dispatch import SOURCE
+from tests.grammar.tl4t import TL4T
+
+
+def parse(cls: type, source: str) -> float:
+    """Return the best time to parse source with cls."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return bench.best_of(lambda: cls().parse(source))
+
+
+def main():
+    JSON = bench.json_grammar()
+    cases = [
+        ("json", JSON, bench.json_document(300)),
+        ("tl4t", TL4T, SOURCE * 20),
+    ]
+    for name, cls, source in cases:
+        predictive = type(cls.__name__ + 'Predictive',
+                          (grammar.Grammar, cls),
+                          {'entry': cls.entry, 'predictive': True})
+        print("%s %d chars: ordered %.3f s, predictive %.3f s" % (
+            name, len(source), parse(cls, source),
+            parse(predictive, source)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+"""Benchmark of the validation of a text without building its tree.
+
+Check json documents with parse, then with Grammar.recognize, with and
+without the predictive and regex_fusion options.
+
+    python -m tests.bench.recognize
+"""
+from tests import bench
+
+
+def main():
+    JSON = bench.json_grammar()
+    source = bench.json_document(200)
+    for options in ((False, False), (True, True)):
+        JSON.predictive, JSON.regex_fusion = options
+        parse = bench.best_of(lambda: JSON().parse(source))
+        recognize = bench.best_of(lambda: JSON().recognize(source))
+        print("json %d chars, predictive/regex_fusion %s: parse %.4f s, "
+              "recognize %.4f s (x%.1f)" % (
+                  len(source), options[0], parse, recognize,
+                  parse / recognize))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""Benchmark of the incremental parse of an edited text.
+
+Type a character in the middle of a json document, parsed again from
+scratch and thru Grammar.reparse.
+
+    python -m tests.bench.reparse
+"""
+from tests import bench
+
+
+def main():
+    JSON = bench.json_grammar()
+
+    def packrat():
+        parser = JSON()
+        parser.packrat = True
+        return parser
+    for n in (100, 400):
+        source = bench.json_document(n)
+        middle = source.index('"', len(source) // 2) + 1
+        full = bench.best_of(lambda: packrat().parse(source))
+
+        def keystroke():
+            parser.reparse(middle, middle, 'x')
+            parser.reparse(middle, middle + 1, '')
+        parser = packrat()
+        parser.parse(source)
+        incremental = bench.best_of(keystroke) / 2
+        print("json %d chars: parse %.4f s, reparse %.4f s" % (
+            len(source), full, incremental))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+"""Benchmark of the grammars translated to python.
+
+Parse tests/bnf/json.bnf and tests/grammar/tl4t.py documents with the
+functors, then with the functions generated by pyrser.passes.topython.
+
+    python -m tests.bench.topython
+"""
+from pyrser.passes import topython
+from tests import bench
+from tests.bench.dispatch import SOURCE
+from tests.bench.predict import parse
+from tests.grammar.tl4t import TL4T
+
+
+def main():
+    JSON = bench.json_grammar()
+    cases = [
+        ("json", JSON, bench.json_document(300)),
+        ("tl4t", TL4T, SOURCE * 20),
+    ]
+    for name, cls, source in cases:
+        generated = topython.compile_grammar(cls)
+        print("%s %d chars: functors %.3f s, python %.3f s" % (
+            name, len(source), parse(cls, source),
+            parse(generated, source)))
+
+
+if __name__ == '__main__':
+    main()
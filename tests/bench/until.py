@@ -0,0 +1,33 @@
+"""Benchmark of the reads until a literal.
+
+Parse statements with long strings and comments, skipped by
+Base.string, ->"*)" and the C/C++ ignore convention, from a str and
+from bytes.
+
+    python -m tests.bench.until
+"""
+from pyrser import grammar
+from tests import bench
+
+
+class Stmts(grammar.Grammar):
+    entry = 'stmts'
+    grammar = """
+        stmts = [ @ignore("C/C++") [stmt]+ eof ]
+        stmt = [ id '=' [string | comment] ';' ]
+        comment = [ "(*" ->"*)" ]
+    """
+
+
+def main():
+    text = "lorem ipsum \\\" dolor " * 50
+    source = ''.join(
+        '/* %s */\nv%d = "%s";\nw%d = (* %s *);\n' % (text, i, text, i, text)
+        for i in range(500))
+    for name, src in (("str", source), ("bytes", source.encode('utf-8'))):
+        elapsed = bench.best_of(lambda: Stmts().parse(src), 3)
+        print("%d chars, %s: %.3f s" % (len(source), name, elapsed))
+
+
+if __name__ == '__main__':
+    main()
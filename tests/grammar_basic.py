@@ -5,6 +5,7 @@ from pyrser import meta
 from pyrser import parsing
 from pyrser import error
 from pyrser.passes.to_yml import *
+from pyrser.passes import first_set
 from pyrser.directives import ignore
 
 from tests.grammar.csv import *
@@ -388,3 +389,153 @@ class GrammarBasic_Test(unittest.TestCase):
         ex.test = self
         ex.parse_file('tests/files/test_read_until')
         self.assertTrue(a == 3, "Fail to parse entirely with read_until")
+
+    def test_31_packrat(self):
+        """
+        Test packrat cache on backtracking alternatives
+        """
+        class Packrat(grammar.Grammar):
+            entry = 'main'
+            grammar = """
+                main = [ [expr:e ';' #add(_, e) | expr:e '.' #add(_, e)]+
+                         eof ]
+                expr = [ Base.num:n #count(_, n) ]
+            """
+
+        @meta.hook(Packrat)
+        def count(self, ast, n):
+            self.count += 1
+            ast.value = self.value(n)
+            return True
+
+        @meta.hook(Packrat)
+        def add(self, ast, e):
+            if not hasattr(ast, 'lst'):
+                ast.lst = []
+            ast.lst.append(e.value)
+            return True
+
+        p = Packrat()
+        p.count = 0
+        res = p.parse("1. 2; 3.")
+        self.assertEqual(res.lst, ['1', '2', '3'])
+        self.assertEqual(p.count, 5, "failed to evaluate without cache")
+        p = Packrat()
+        p.packrat = True
+        p.count = 0
+        res = p.parse("1. 2; 3.")
+        self.assertEqual(res.lst, ['1', '2', '3'])
+        self.assertEqual(p.count, 3, "failed to reuse cached results")
+        p = Packrat()
+        p.packrat = True
+        p.packrat_exclude = {'expr'}
+        p.count = 0
+        res = p.parse("1. 2; 3.")
+        self.assertEqual(p.count, 5, "failed to exclude rule from cache")
+        p = Packrat()
+        p.packrat = True
+        p.packrat_size = 2
+        p.count = 0
+        res = p.parse("1. 2; 3.")
+        self.assertEqual(res.lst, ['1', '2', '3'])
+        self.assertLessEqual(len(p._memo), 2, "failed to bound the cache")
+
+    def test_32_predictive(self):
+        """
+        Test predictive dispatch of alternatives
+        """
+        class Ordered(grammar.Grammar):
+            entry = 'main'
+            grammar = """
+                main = [ [item:i #add(_, i)]+ eof ]
+                item = [
+                    [ "if" | "i" | Base.num | '(' item* ')' | '-'? '.' ]:i
+                    #text(_, i)
+                ]
+            """
+
+        @meta.hook(Ordered)
+        def text(self, ast, i):
+            ast.txt = self.value(i)
+            return True
+
+        @meta.hook(Ordered)
+        def add(self, ast, i):
+            if not hasattr(ast, 'lst'):
+                ast.lst = []
+            ast.lst.append(i.txt)
+            return True
+
+        class Predictive(grammar.Grammar, Ordered):
+            entry = 'main'
+            predictive = True
+
+        source = "if i 12\n(i ( if ) ) -. ."
+        expected = ['if', 'i', '12', '(i ( if ) ) ', '-. ', '.']
+        res = Ordered().parse(source)
+        self.assertEqual(res.lst, expected)
+        res = Predictive().parse(source)
+        self.assertEqual(res.lst, expected)
+        analysis = first_set.Analysis(Predictive.finalize()[0])
+        first = analysis.first(parsing.Rule('item'))
+        self.assertEqual(first.chars, frozenset("i(-." + "0123456789"))
+        self.assertTrue(first.wide, "failed Base.num accept any digit")
+        self.assertFalse(first.nullable)
+        with self.assertRaises(error.Diagnostic):
+            Predictive().parse("if x")
+
+    def test_33_regex_fusion(self):
+        """
+        Test fusion of terminals into regular expressions
+        """
+        class Terminals(grammar.Grammar):
+            entry = 'main'
+            grammar = """
+                main = [ [item:i #add(_, i)]+ eof ]
+                item = [ [ @ignore("null") number | word | quoted ] ]
+                number = [ '-'? ['0'..'9']+ ['.' ['0'..'9']+]? ]
+                word = [ ['a'..'z' | '_'] ['a'..'z' | '0'..'9' | '_']* ]
+                quoted = [ '"' [ ~'"' ]* '"' ]
+            """
+
+        @meta.hook(Terminals)
+        def add(self, ast, i):
+            if not hasattr(ast, 'lst'):
+                ast.lst = []
+            ast.lst.append(self.value(i))
+            return True
+
+        source = 'ab1 -12.5 "x y"\n_z 7'
+        expected = Terminals().parse(source).lst
+
+        class Fused(grammar.Grammar, Terminals):
+            entry = 'main'
+            regex_fusion = True
+
+        rules = Fused.finalize()[0]
+        self.assertIsInstance(rules['number'], parsing.Regex)
+        self.assertIsInstance(rules['quoted'], parsing.Regex)
+        self.assertEqual(Fused().parse(source).lst, expected)
+        with self.assertRaises(error.Diagnostic):
+            Fused().parse('ab "x')
+        # unknown ignore convention use the original functors
+        p = Fused('/* c */ 12')
+        p.push_ignore(parsing.Parser.ignore_cxx)
+        self.assertTrue(p.eval_rule('number'))
+        self.assertEqual(p._stream.index, 10)
+        # the trees of the base grammar are not fused
+        todo = list(Terminals.finalize()[0].values())
+        while todo:
+            pt = todo.pop()
+            self.assertNotIsInstance(pt, parsing.Regex)
+            todo += [getattr(pt, 'pt', None)] + list(getattr(pt, 'ptlist', []))
+            todo = [it for it in todo if isinstance(it, parsing.Functor)]
+        # errors are reported where the functors stop
+        for source in ('1.x', '12 -', 'ab 3. ?', 'x "ab', '7 1.5.'):
+            locations = []
+            for cls in (Terminals, Fused):
+                with self.assertRaises(error.Diagnostic) as pe:
+                    cls().parse(source)
+                location = pe.exception.logs[0].location
+                locations.append((location.line, location.col))
+            self.assertEqual(locations[0], locations[1], source)
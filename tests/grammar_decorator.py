@@ -75,3 +75,28 @@ class GrammarDecorator_Test(unittest.TestCase):
                          + "[eof] Entering\n"
                          + "[eof] Succeeded\n",
                          "Trace doesn't match expected result.")
+
+    def test_03_dispatch_switch(self):
+        """
+        Test functors are instrumented only while a decorator is active
+        """
+        from pyrser.parsing import functors
+        self.assertIs(parsing.Functor.__call__, parsing.Functor.direct_call)
+        seen = []
+
+        class Spy(parsing.DecoratorWrapper):
+            def __init__(self):
+                pass
+
+            def begin(self, parser, pt):
+                seen.append(parsing.Functor.__call__)
+                return True
+
+            def end(self, res, parser, pt):
+                return True
+
+        pt = parsing.Decorator(Spy, [], parsing.Char('a'))
+        self.assertTrue(pt(parsing.Parser("a")))
+        self.assertEqual(seen, [parsing.Functor.decorated_call])
+        self.assertEqual(functors._decorators, [])
+        self.assertIs(parsing.Functor.__call__, parsing.Functor.direct_call)
@@ -1,3 +1,5 @@
+import threading
+import time
 import unittest
 from pyrser import parsing
 from pyrser import dsl
@@ -615,3 +617,87 @@ class InternalDsl_Test(unittest.TestCase):
             p = parsing.Parser("")
             p.set_rules(res)
             p.eval_rule('main')
+
+    def test_29_rules_built_once(self):
+        """
+        Test the BNF of BNF is shared by all the EBNF parsers
+        """
+        dsl.EBNF("a = [ b ]")
+        rules = dsl.EBNF._rules
+        bnf_dsl = rules['bnf_dsl']
+        for _ in range(3):
+            res = dsl.EBNF("a = [ b ]").get_rules()
+            self.assertIn('a', res)
+        self.assertIs(dsl.EBNF._rules, rules)
+        self.assertIs(dsl.EBNF._rules['bnf_dsl'], bnf_dsl)
+
+    def test_30_cut(self):
+        """
+        Test the cut commits its sequence
+        """
+        bnf = dsl.EBNF("""
+            the_rule = [ a ^ b | c ]
+        """)
+        res = bnf.get_rules()
+        alt = res['the_rule']
+        self.assertIsInstance(alt, parsing.Alt)
+        self.assertIsInstance(alt[0], parsing.Seq)
+        self.assertIsInstance(alt[0][1], parsing.Cut)
+        self.assertTrue(alt[0].cut)
+        self.assertFalse(parsing.Seq(parsing.Rule('a')).cut)
+
+    def test_31_stream(self):
+        """
+        Test the stream directive builds a committed Streamed repetition
+        """
+        bnf = dsl.EBNF("""
+            the_rule = [ a @stream("i") [b:i]* c ]
+        """)
+        res = bnf.get_rules()
+        seq = res['the_rule']
+        self.assertIsInstance(seq, parsing.Seq)
+        self.assertIsInstance(seq[1], parsing.Seq)
+        self.assertTrue(seq[1].cut)
+        self.assertIsInstance(seq[1][0], parsing.Streamed)
+        self.assertEqual(seq[1][0].tagname, 'i')
+        self.assertIsInstance(seq[1][0].pt, parsing.Rep0N)
+
+
+    def test_32_char_class(self):
+        """
+        Test the class of characters and its repetitions
+        """
+        bnf = dsl.EBNF("""
+            the_rule = [ { 'a'..'z' '_' "+-" } { '0'..'9' }* { 'x' }? ]
+        """)
+        res = bnf.get_rules()
+        seq = res['the_rule']
+        self.assertIsInstance(seq, parsing.Seq)
+        self.assertIsInstance(seq[0], parsing.Class)
+        self.assertEqual(seq[0].chars.ranges,
+                         (('a', 'z'), ('_', '_'), ('+', '+'), ('-', '-')))
+        self.assertEqual((False, False), (seq[0].many, seq[0].optional))
+        self.assertEqual((True, True), (seq[1].many, seq[1].optional))
+        self.assertEqual((False, True), (seq[2].many, seq[2].optional))
+        with self.assertRaises(error.Diagnostic):
+            dsl.EBNF("the_rule = [ { 'ab'..'z' } ]").get_rules()
+
+    def test_33_rules_built_once_between_threads(self):
+        """
+        Test the BNF of BNF is complete once seen defined by a thread
+        """
+        building = threading.Event()
+
+        class SlowEBNF(dsl.EBNF):
+            @classmethod
+            def bnf_rules(cls):
+                building.set()
+                time.sleep(0.1)
+                return super().bnf_rules()
+
+        thread = threading.Thread(target=SlowEBNF.define_rules)
+        thread.start()
+        building.wait()
+        res = SlowEBNF("a = [ b ]").get_rules()
+        thread.join()
+        self.assertIn('a', res)
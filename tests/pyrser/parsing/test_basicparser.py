@@ -16,6 +16,71 @@ class TestBasicParser(unittest.TestCase):
         parser = parsing.BasicParser("")
         self.assertFalse(parser.read_text("no read"))
 
+    def test_it_flattens_rules_in_one_dispatch_table(self):
+        class Flat(parsing.BasicParser):
+            pass
+        Flat.set_rules({'a': parsing.Char('a'), 'b': parsing.Char('b')})
+        Flat.set_rules({'a': parsing.Char('c')})
+        rules, hooks = Flat.finalize()
+        self.assertIs(type(rules), dict)
+        self.assertIs(rules['a'], Flat._rules['a'])
+        self.assertIs(rules['b'], Flat._rules['b'])
+        self.assertIs(Flat.finalize()[0], rules)
+
+    def test_it_dispatches_rules_modified_after_creation(self):
+        class Late(parsing.BasicParser):
+            pass
+        Late.set_rules({'a': parsing.Char('a')})
+        parser = Late("b")
+        self.assertFalse(parser.eval_rule('a'))
+        Late.set_rules({'a': parsing.Char('b')})
+        self.assertTrue(parser.eval_rule('a'))
+
+    def test_it_restores_shadowed_nodes_when_leaving_a_scope(self):
+        parser = parsing.BasicParser()
+        parser.rule_nodes['a'] = 1
+        parser.push_rule_nodes()
+        parser.rule_nodes['a'] = 2
+        parser.rule_nodes['b'] = 3
+        parser.tag_cache['a'] = 4
+        parser.id_cache[5] = 'a'
+        self.assertEqual(parser.rule_nodes['a'], 2)
+        parser.pop_rule_nodes()
+        self.assertEqual(parser.rule_nodes, {'a': 1})
+        self.assertEqual(parser.tag_cache, {})
+        self.assertEqual(parser.id_cache, {})
+
+    def test_it_binds_nodes_in_the_scope_that_set_them(self):
+        parser = parsing.BasicParser()
+        parser.push_rule_nodes()
+        parser.rule_nodes['_'] = 1
+        parser.push_rule_nodes()
+        parser.push_rule_nodes()
+        parser.bind('_', 2)
+        parser.pop_rule_nodes()
+        parser.pop_rule_nodes()
+        self.assertEqual(parser.rule_nodes['_'], 2)
+        parser.pop_rule_nodes()
+        self.assertNotIn('_', parser.rule_nodes)
+
+    def test_it_reads_until_a_char_not_inhibited(self):
+        for content in ('"a\\"b\\\\" c', b'"\xc3\xa9\\"\\\\" c'):
+            parser = parsing.Parser(content)
+            self.assertTrue(parser.read_char('"'))
+            self.assertTrue(parser.read_until('"'))
+            self.assertEqual(len(content) - 2, parser._stream.index)
+            self.assertFalse(parser.read_until('"'))
+            self.assertEqual(len(content) - 2, parser._stream.index)
+
+    def test_it_reads_until_a_literal(self):
+        until = parsing.Until(parsing.Seq(parsing.Text("*)")))
+        for content in ("(* é *) *)", "(* é *) *)".encode('utf-8')):
+            parser = parsing.Parser(content)
+            self.assertTrue(until(parser))
+            self.assertEqual(len(content) - 3, parser._stream.index)
+            self.assertTrue(until(parser))
+            self.assertFalse(until(parser))
+
 # Streams
 # Define stream stacking behavior in accord to reading
 # readChar
@@ -0,0 +1,45 @@
+import unittest
+
+from pyrser import parsing
+from pyrser.parsing import charclass
+
+
+class TestCharClass(unittest.TestCase):
+    def test_it_contains_the_characters_of_its_ranges(self):
+        chars = parsing.CharClass([('a', 'c'), ('_', '_'), ('à', 'é')])
+        self.assertEqual("_abc", chars.ascii)
+        self.assertIn('b', chars)
+        self.assertIn('é', chars)
+        self.assertNotIn('d', chars)
+        self.assertNotIn('ê', chars)
+
+    def test_it_scans_the_run_of_the_class(self):
+        chars = parsing.CharClass([('a', 'z'), ('é', 'é')])
+        content = "été  abc"
+        for stream in (parsing.Stream(content),
+                       parsing.Stream(content.encode('utf-8')),
+                       parsing.ChunkedStream(iter(["ét", "é ", " abc"]))):
+            end = chars.scan(stream, 0)
+            self.assertEqual("été", stream[0:end])
+            self.assertEqual(end, chars.scan(stream, end))
+            self.assertEqual(end, chars.match(stream, end))
+        stream = parsing.Stream(content)
+        self.assertEqual(8, chars.scan(stream, 5))
+        self.assertEqual(6, chars.match(stream, 5))
+
+    def test_it_checks_the_non_ascii_characters_of_base(self):
+        stream = parsing.Stream("Ωμέγα2 ٣٤")
+        self.assertEqual(0, charclass.DIGITS.scan(stream, 0))
+        self.assertEqual(6, charclass.ID_CONTINUE.scan(stream, 0))
+        self.assertEqual(9, charclass.DIGITS.scan(stream, 7))
+
+    def test_it_is_read_as_a_functor(self):
+        chars = parsing.CharClass([('0', '9')])
+        parser = parsing.Parser("123a")
+        self.assertTrue(parsing.Class(chars)(parser))
+        self.assertEqual(1, parser._stream.index)
+        self.assertTrue(parsing.Class(chars, many=True)(parser))
+        self.assertEqual(3, parser._stream.index)
+        self.assertFalse(parsing.Class(chars, many=True)(parser))
+        self.assertTrue(parsing.Class(chars, True, True)(parser))
+        self.assertEqual(3, parser._stream.index)
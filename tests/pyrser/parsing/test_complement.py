@@ -16,3 +16,11 @@ class TestComplement(unittest.TestCase):
         comp = parsing.Complement(clause)
         parser = mock.Mock(**{'read_eof.return_value': False})
         self.assertFalse(comp(parser))
+
+    def test_it_compares_a_literal_without_calling_it(self):
+        comp = parsing.Complement(parsing.Seq(parsing.Text("*)")))
+        parser = parsing.Parser("ab*)")
+        self.assertTrue(comp(parser))
+        self.assertTrue(comp(parser))
+        self.assertFalse(comp(parser))
+        self.assertEqual(2, parser._stream.index)
@@ -18,11 +18,12 @@ class TestCursor(unittest.TestCase):
         cursor.step_next_char()
         self.assertEqual(dest, cursor.position)
 
-    def test_it_increments_line(self):
-        start, dest = Position(1, 3, 5), Position(1, 3 + 1, 0)
-        cursor = Cursor(start)
-        cursor.step_next_line()
-        self.assertEqual(dest, cursor.position)
+    def test_it_computes_line_from_newline_offsets(self):
+        cursor = Cursor(eol=[3, 7])
+        cursor.position = Position(5, 0, 0)
+        self.assertEqual(Position(5, 2, 2), cursor.position)
+        cursor.position = Position(8, 0, 0)
+        self.assertEqual(Position(8, 3, 1), cursor.position)
 
     def test_it_decrements_cursor_to_prev_char_position(self):
         start, dest = Position(1, 3, 5), Position(1 - 1, 3, 5 - 1)
@@ -31,8 +32,14 @@ class TestCursor(unittest.TestCase):
         self.assertEqual(dest, cursor.position)
 
     def test_it_decrements_line(self):
-        pos = Position(1, 3, 5)
-        cursor = Cursor(pos)
-        cursor.step_next_line()
-        cursor.step_prev_line()
-        self.assertEqual(pos, cursor.position)
+        cursor = Cursor(eol=[3])
+        cursor.position = Position(4, 0, 0)
+        cursor.step_prev_char()
+        self.assertEqual(Position(3, 1, 4), cursor.position)
+
+    def test_it_keeps_deepest_position(self):
+        cursor = Cursor(eol=[3])
+        for i in range(5):
+            cursor.step_next_char()
+        cursor.position = Position(1, 0, 0)
+        self.assertEqual(Position(5, 2, 2), cursor.max_readed_position)
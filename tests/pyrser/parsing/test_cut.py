@@ -0,0 +1,41 @@
+import unittest
+from unittest import mock
+
+from pyrser import parsing
+
+
+class TestCut(unittest.TestCase):
+    def test_it_calls_cut_of_the_parser(self):
+        parser = mock.Mock(spec=parsing.BasicParser)
+        parser.cut.return_value = True
+        self.assertTrue(parsing.Cut()(parser))
+        parser.cut.assert_called_once_with()
+
+    def test_it_validates_the_context_of_its_sequence(self):
+        parser = mock.Mock(spec=parsing.BasicParser)
+        clause = mock.Mock(return_value=True)
+        self.assertTrue(parsing.Seq(clause, parsing.Cut(), clause)(parser))
+        self.assertEqual(1, parser._stream.save_context.call_count)
+        self.assertEqual(1, parser._stream.validate_context.call_count)
+        self.assertFalse(parser._stream.restore_context.called)
+
+    def test_it_restores_the_context_on_failure_before_the_cut(self):
+        parser = mock.Mock(spec=parsing.BasicParser)
+        clause = mock.Mock(return_value=False)
+        parsing.Seq(clause, parsing.Cut(), clause)(parser)
+        self.assertTrue(parser._stream.restore_context.called)
+        self.assertFalse(parser.cut.called)
+        self.assertFalse(parser.cut_error.called)
+
+    def test_it_raises_on_failure_after_the_cut(self):
+        parser = mock.Mock(spec=parsing.BasicParser)
+        parser.cut_error.side_effect = RuntimeError
+        clauses = mock.Mock(**{'clause0.return_value': True,
+                               'clause1.return_value': False})
+        seq = parsing.Seq(clauses.clause0, parsing.Cut(), clauses.clause1)
+        alt = parsing.Alt(seq, clauses.clause2)
+        with self.assertRaises(RuntimeError):
+            alt(parser)
+        self.assertEqual([mock.call.clause0(parser), mock.call.clause1(parser)],
+                         clauses.mock_calls)
+        self.assertFalse(parser._stream.restore_context.called)
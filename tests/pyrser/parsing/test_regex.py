@@ -0,0 +1,30 @@
+import unittest
+from unittest import mock
+
+from pyrser import parsing
+
+
+class TestRegex(unittest.TestCase):
+    def test_it_consumes_the_match_of_the_current_convention(self):
+        clause = mock.Mock(return_value=True)
+        regex = parsing.Regex(clause, {
+            parsing.Parser.ignore_blanks: '([ ]*+)ab([ ]*+)'})
+        parser = parsing.Parser("  ab  c")
+        self.assertTrue(regex(parser))
+        self.assertEqual(parser._stream.index, 6)
+        self.assertEqual(parser._lastIgnoreIndex, 6)
+        self.assertFalse(clause.called)
+
+    def test_it_is_false_without_moving_when_no_match(self):
+        clause = mock.Mock(return_value=True)
+        regex = parsing.Regex(clause, {parsing.Parser.ignore_blanks: 'ab'})
+        parser = parsing.Parser("ac")
+        self.assertFalse(regex(parser))
+        self.assertEqual(parser._stream.index, 0)
+
+    def test_it_calls_clause_for_other_conventions(self):
+        clause = mock.Mock(return_value=True)
+        regex = parsing.Regex(clause, {parsing.Parser.ignore_null: 'ab'})
+        parser = parsing.Parser("ab")
+        self.assertTrue(regex(parser))
+        clause.assert_called_once_with(parser)
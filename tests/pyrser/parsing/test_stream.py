@@ -1,7 +1,10 @@
+import os
+import tempfile
 import unittest
+from unittest import mock
 
 from pyrser import parsing
-from pyrser.parsing.stream import Position
+from pyrser.parsing import stream as stream_module
 
 
 class TestParserStream(unittest.TestCase):
@@ -29,6 +32,23 @@ class TestParserStream(unittest.TestCase):
         self.assertEqual(1, stream.col_offset)
         self.assertLess(prev_line, stream.lineno)
 
+    def test_it_moves_position_in_one_step(self):
+        stream = parsing.Stream("ab\ncd\nef")
+        stream.incpos(7)
+        self.assertEqual((7, 3, 2), (stream.index, stream.lineno,
+                                     stream.col_offset))
+        stream.decpos(3)
+        self.assertEqual((4, 2, 2), (stream.index, stream.lineno,
+                                     stream.col_offset))
+
+    def test_it_computes_lines_of_non_ascii_text(self):
+        for content in ("ab\ncd\nef", "éb\nc€\n\U0001f600f"):
+            self.assertEqual([2, 5], list(stream_module.eol_offsets(content)))
+            stream = parsing.Stream(content)
+            stream.incpos(7)
+            self.assertEqual((7, 3, 2), (stream.index, stream.lineno,
+                                         stream.col_offset))
+
     def test_it_does_not_increment_position_passed_eof(self):
         stream = parsing.Stream("")
         pos = stream.index
@@ -43,8 +63,8 @@ class TestParserStream(unittest.TestCase):
 
     def test_it_decrements_position_on_newline(self):
         stream = parsing.Stream("\n")
-        stream._cursor.step_next_line()
-        stream._cursor.step_next_char()
+        stream.incpos()
+        self.assertEqual(2, stream.lineno)
         stream.decpos()
         self.assertEqual(1, stream.lineno)
 
@@ -62,13 +82,119 @@ class TestParserStream(unittest.TestCase):
 
     def test_it_restore_context(self):
         stream = parsing.Stream()
-        pos = Position(42, 0, 0)
-        stream._contexts.insert(0, pos)
+        stream._contexts.insert(0, 42)
         stream.restore_context()
-        self.assertEqual(pos.index, stream.index)
+        self.assertEqual(42, stream.index)
 
     def test_it_validates_context(self):
         stream = parsing.Stream()
-        stream._contexts.insert(0, Position(42, 0, 0))
+        stream._contexts.insert(0, 42)
         stream.validate_context()
         self.assertEqual(0, stream.index)
+
+    def test_it_saves_only_the_index(self):
+        stream = parsing.Stream("a\nb")
+        stream.incpos(2)
+        stream.save_context()
+        self.assertEqual([2], stream._contexts)
+        stream.incpos()
+        stream.restore_context()
+        self.assertEqual((2, 2, 1), (stream.index, stream.lineno,
+                                     stream.col_offset))
+
+
+class TestByteStream(unittest.TestCase):
+    def test_it_reads_characters_of_the_bytes(self):
+        content = "ab\ncd é€\n".encode('utf-8')
+        for buf in (content, bytearray(content), memoryview(content)):
+            stream = parsing.Stream(buf)
+            self.assertEqual(len(content), len(stream))
+            stream.incpos(6)
+            self.assertEqual("é", stream.peek_char)
+            stream.incpos()
+            self.assertEqual((8, 2, 5), (stream.index, stream.lineno,
+                                         stream.col_offset))
+            self.assertEqual("€", stream.peek_char)
+            self.assertEqual("cd é€", stream[3:11])
+            self.assertEqual(8, stream._content.find("€"))
+            self.assertEqual(3, stream.text_length("€"))
+
+    def test_its_captures_are_views_of_the_bytes(self):
+        content = bytearray("ab été".encode('latin-1'))
+        stream = parsing.Stream(content, encoding='latin-1')
+        tag = stream_module.Tag(stream, 3, 6)
+        self.assertEqual("été", str(tag))
+        content[4] = ord('a')
+        self.assertEqual(b"\xe9a\xe9", tag.view())
+
+    def test_it_needs_a_supported_encoding(self):
+        with self.assertRaises(ValueError):
+            parsing.Stream(b"ab", encoding='utf-16')
+
+
+class TestFileStream(unittest.TestCase):
+    def mapped(self, content: str, encoding: str) -> parsing.FileStream:
+        fd, fn = tempfile.mkstemp()
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content.encode(encoding))
+        self.addCleanup(os.remove, fn)
+        stream = parsing.FileStream(fn, encoding)
+        self.addCleanup(stream.close)
+        return stream
+
+    def test_its_content_can_be_accessed_like_a_string(self):
+        content = "ab\ncd é€\n" * 50
+        # small blocks to read across them
+        with mock.patch.object(stream_module.MappedText, 'BLOCK', 16):
+            for encoding in ('utf-8', 'latin-1', 'utf-16-le'):
+                if encoding == 'latin-1':
+                    content = content.replace('€', 'e')
+                stream = self.mapped(content, encoding)
+                self.assertEqual(len(content), len(stream))
+                self.assertEqual(content[57], stream[57])
+                self.assertEqual(content[5:300], stream[5:300])
+                self.assertEqual(content.find('d é', 40),
+                                 stream._content.find('d é', 40))
+
+    def test_it_computes_lines_of_the_file(self):
+        stream = self.mapped("ab\ncd\nef", 'ascii')
+        stream.incpos(7)
+        self.assertEqual((7, 3, 2), (stream.index, stream.lineno,
+                                     stream.col_offset))
+
+    def test_it_maps_empty_files(self):
+        stream = self.mapped("", 'utf-8')
+        self.assertEqual(0, len(stream))
+        self.assertEqual("", stream[0:])
+
+
+class TestChunkedStream(unittest.TestCase):
+    def test_it_pulls_the_chunks_on_demand(self):
+        chunks = iter(["ab\nc", "d\ne", "f"])
+        stream = parsing.ChunkedStream(chunks)
+        self.assertEqual("b\ncd", stream[1:5])
+        self.assertEqual(["f"], list(chunks))
+        stream = parsing.ChunkedStream(iter([b"\xc3", b"\xa9t\xc3\xa9"]))
+        self.assertEqual(3, len(stream))
+        self.assertEqual("été", stream[0:3])
+
+    def test_it_computes_lines_of_the_chunks(self):
+        stream = parsing.ChunkedStream(iter(["ab\nc", "d\ne", "f"]))
+        stream.incpos(7)
+        self.assertEqual((7, 3, 2), (stream.index, stream.lineno,
+                                     stream.col_offset))
+
+    def test_it_discards_the_text_before_the_oldest_context(self):
+        chunks = ("%d\n" % i for i in range(10000))
+        stream = parsing.ChunkedStream(chunks)
+        stream.MARGIN, stream.LOOKAHEAD = 10, 100
+        while stream.index < 5000:
+            stream.incpos(100)
+        stream.save_context()
+        while stream.index < stream.eos_index:
+            stream.incpos(100)
+        self.assertEqual(4990, stream._content.start)
+        self.assertEqual("9999\n", stream[stream.index - 5:])
+        self.assertEqual((10001, 1), (stream.lineno, stream.col_offset))
+        stream.restore_context()
+        self.assertEqual("1", stream[5000])
@@ -0,0 +1,92 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from pyrser import cache
+from pyrser import dsl
+from pyrser import error
+from pyrser import grammar
+from pyrser.directives import ignore
+from pyrser.parsing import charclass
+from pyrser.passes import first_set
+from pyrser.passes import regex_fusion
+
+BNF = """
+    words = [ word [',' word]* eof ]
+    word = [ id ]
+"""
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmp, 'words.bnf')
+        self.write(BNF)
+        self.cached = os.path.join(self.tmp, '__pycache__',
+                                   'words.bnf' + cache.SUFFIX)
+        patcher = mock.patch.object(sys, 'dont_write_bytecode', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, bnf: str):
+        with open(self.source, 'w') as f:
+            f.write(bnf)
+
+    def test_it_loads_the_rules_from_the_cache(self):
+        grammar.from_file(self.source, 'words')
+        self.assertTrue(os.path.exists(self.cached))
+        with mock.patch.object(dsl.EBNF, 'get_rules') as get_rules:
+            Words = grammar.from_file(self.source, 'words')
+        get_rules.assert_not_called()
+        self.assertTrue(Words().parse("ab, cd"))
+        with self.assertRaises(error.Diagnostic):
+            Words().parse("ab, 1")
+
+    def test_it_rebuilds_stale_entries(self):
+        grammar.from_file(self.source, 'words')
+        self.write(BNF.replace("id", "num"))
+        Digits = grammar.from_file(self.source, 'words')
+        self.assertTrue(Digits().parse("12, 34"))
+        with mock.patch.object(dsl.EBNF, 'get_rules') as get_rules:
+            grammar.from_file(self.source, 'words')
+        get_rules.assert_not_called()
+
+    def test_it_rebuilds_corrupted_entries(self):
+        os.makedirs(os.path.dirname(self.cached))
+        with open(self.cached, 'wb') as f:
+            f.write(b'garbage')
+        Words = grammar.from_file(self.source, 'words')
+        self.assertTrue(Words().parse("ab, cd"))
+        with mock.patch.object(dsl.EBNF, 'get_rules') as get_rules:
+            grammar.from_file(self.source, 'words')
+        get_rules.assert_not_called()
+
+    def test_it_could_be_disabled(self):
+        with mock.patch.object(grammar.Grammar, 'cache_rules', False):
+            grammar.from_file(self.source, 'words')
+        with mock.patch.object(sys, 'dont_write_bytecode', True):
+            grammar.from_file(self.source, 'words')
+        self.assertFalse(os.path.exists(self.cached))
+
+    def test_it_does_not_cache_unnamed_grammars(self):
+        Words = grammar.from_string(BNF, 'words')
+        self.assertIsNone(cache.location(Words, None, False))
+        self.assertEqual(
+            cache.location(TestCache, self.source),
+            self.cached
+        )
+
+    def test_it_depends_on_the_code_that_builds_the_rules(self):
+        expected = cache.key(dsl.EBNF, BNF)
+        for module in (charclass, regex_fusion, first_set, ignore, dsl):
+            fn = os.path.abspath(module.__file__)
+            with mock.patch.dict(cache._digests, {fn: 'changed'}):
+                self.assertNotEqual(cache.key(dsl.EBNF, BNF), expected,
+                                    module.__name__)
+        self.assertEqual(cache.key(dsl.EBNF, BNF), expected)
@@ -0,0 +1,65 @@
+import asyncio
+import unittest
+
+from pyrser import error
+from pyrser import feed
+from pyrser import grammar
+from pyrser import meta
+
+
+class Lines(grammar.Grammar):
+    entry = 'lines'
+    grammar = """
+        lines = [ @stream("l") [@ignore("null") line:l]+ eof ]
+        line = [ cell:c #add_cell(_, c) [';' cell:c #add_cell(_, c)]* eol ]
+        cell = [ id | num ]
+    """
+
+
+@meta.hook(Lines)
+def add_cell(self, line, c):
+    if not hasattr(line, 'cells'):
+        line.cells = []
+    line.cells.append(self.value(c))
+    return True
+
+
+class TestAsyncFeed(unittest.IsolatedAsyncioTestCase):
+    async def produce(self, feeder, chunks):
+        for chunk in chunks:
+            await feeder.feed(chunk)
+        await feeder.close()
+
+    async def test_it_yields_the_items_as_the_chunks_come(self):
+        data = ''.join('é%d;%d\n' % (i, i) for i in range(300)).encode()
+        # cut inside lines and utf-8 sequences
+        chunks = [data[i:i + 7] for i in range(0, len(data), 7)]
+        feeder = Lines().async_feed(buffered=4, step=10)
+        producer = asyncio.ensure_future(self.produce(feeder, chunks))
+        items = [item.cells async for item in feeder.items()]
+        await producer
+        self.assertEqual(items, [['é%d' % i, str(i)] for i in range(300)])
+        self.assertTrue(feeder.result)
+
+    async def test_it_raises_the_errors_after_the_items(self):
+        feeder = Lines().async_feed()
+        producer = asyncio.ensure_future(
+            self.produce(feeder, ["a;1\n", "b;;2\n"]))
+        items = []
+        with self.assertRaises(error.Diagnostic):
+            async for item in feeder.items():
+                items.append(item.cells)
+        await producer
+        self.assertEqual(items, [['a', '1']])
+
+    async def test_it_stops_when_the_items_are_not_read(self):
+        feeder = Lines().async_feed(buffered=1)
+        producer = asyncio.ensure_future(
+            self.produce(feeder, ["a;1\n" * 100] * 1000))
+        items = feeder.items()
+        await items.__anext__()
+        await items.aclose()
+        with self.assertRaises(feed.Closed):
+            await producer
+        feeder._worker.join(1)
+        self.assertFalse(feeder._worker.is_alive())
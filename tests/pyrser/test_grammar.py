@@ -1,7 +1,16 @@
+import os
+import pickle
+import tempfile
+import threading
 import unittest
 from unittest import mock
 
 import pyrser
+from pyrser import error
+from pyrser import grammar
+from pyrser import meta
+from pyrser.parsing.stream import ChunkedStream, MappedText, WindowText
+from pyrser.passes import topython
 
 
 class TestGrammar(unittest.TestCase):
@@ -62,3 +71,498 @@ class TestGrammar(unittest.TestCase):
 #        self.assertTrue(parser.parse("class keyword"))
 #        parser = OverrideClassKeywordGrammar()
 #        self.assertTrue(parser.parse("class keys;"))
+
+
+class TestLazyGrammar(unittest.TestCase):
+    def test_it_parses_the_grammar_on_first_use(self):
+        dsl = mock.Mock()
+        dsl.return_value.get_rules.return_value = {'rulename': mock.Mock()}
+
+        class Lazy(grammar.Grammar):
+            grammar = "rulename = [ 'a' ]"
+            dsl_parser = dsl
+            lazy = True
+
+        dsl.assert_not_called()
+        rules = Lazy().rules
+        dsl.assert_called_once_with("rulename = [ 'a' ]", None)
+        self.assertIn('rulename', rules)
+        Lazy()
+        dsl.assert_called_once_with("rulename = [ 'a' ]", None)
+
+    def test_it_keeps_the_rules_defined_after_the_class(self):
+        class Lazy(grammar.Grammar):
+            entry = 'main'
+            grammar = "main = [ word eof ] word = [ 'a' ]"
+            lazy = True
+
+        @meta.rule(Lazy, 'word')
+        def word(self):
+            return self.read_text('b')
+
+        self.assertTrue(Lazy().parse('b'))
+
+    def test_it_builds_aggregated_grammars(self):
+        class Word(grammar.Grammar):
+            grammar = "word = [ 'a' ]"
+            lazy = True
+
+        class Main(grammar.Grammar, Word):
+            entry = 'main'
+            grammar = "main = [ Word.word eof ]"
+
+        self.assertTrue(Main().parse('a'))
+
+    def test_it_reports_errors_of_the_dsl_on_first_use(self):
+        fn = os.path.join(os.path.dirname(__file__), os.pardir, 'bnf',
+                          'error_bracket.bnf')
+        with mock.patch.object(grammar.Grammar, 'lazy', True):
+            Lazy = grammar.from_file(fn, 'source')
+        with self.assertRaises(error.Diagnostic) as pe:
+            Lazy().parse('a')
+        self.assertEqual(pe.exception.logs[0].msg, "Expected ']'")
+        self.assertEqual(pe.exception.logs[0].location.line, 2)
+        self.assertEqual(pe.exception.logs[0].location.col, 7)
+
+    def test_it_builds_the_rules_once_between_threads(self):
+        dsl = mock.Mock()
+        dsl.return_value.get_rules.return_value = {'rulename': mock.Mock()}
+
+        class Lazy(grammar.Grammar):
+            grammar = "rulename = [ 'a' ]"
+            dsl_parser = dsl
+            lazy = True
+
+        threads = [threading.Thread(target=Lazy) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        dsl.assert_called_once_with("rulename = [ 'a' ]", None)
+
+
+class Words(grammar.Grammar):
+    entry = 'words'
+    grammar = """
+        words = [ [word:w #add_word(_, w)]+ eof ]
+        word = [ [ @ignore("null") ['a'..'z' | '0'..'9']+ ] | string ]
+    """
+
+
+@meta.hook(Words)
+def add_word(self, words, w):
+    if not hasattr(words, 'lst'):
+        words.lst = []
+    words.lst.append(self.value(w))
+    return True
+
+
+class TestParseFile(unittest.TestCase):
+    def test_it_parses_mapped_files(self):
+        fd, fn = tempfile.mkstemp()
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write('ab "\u00e9\u20ac" 12\n' * 300)
+        self.addCleanup(os.remove, fn)
+        expected = Words().parse_file(fn, encoding='utf-8').lst
+        self.assertEqual(len(expected), 900)
+        Fused = type('WordsFused', (grammar.Grammar, Words),
+                     {'entry': 'words', 'regex_fusion': True})
+        # small blocks to read across them
+        with mock.patch.object(MappedText, 'BLOCK', 64):
+            for cls in (Words, Fused, topython.compile_grammar(Words)):
+                res = cls().parse_file(fn, mapped=True)
+                self.assertEqual(res.lst, expected)
+
+
+class TestParseBytes(unittest.TestCase):
+    def test_it_parses_bytes_in_place(self):
+        text = 'ab "\u00e9\u20ac" 12\n' * 50
+        expected = Words().parse(text).lst
+        data = text.encode('utf-8')
+        for cls in (Words, topython.compile_grammar(Words)):
+            for buf in (data, bytearray(data), memoryview(data)):
+                self.assertEqual(cls().parse(buf).lst, expected)
+
+    def test_it_reports_errors_at_their_character(self):
+        with self.assertRaises(error.Diagnostic) as pe:
+            Words().parse('ab "\u00e9" ?'.encode('utf-8'))
+        # the 9th byte
+        self.assertEqual(pe.exception.logs[0].location.col, 8)
+
+
+class Items(grammar.Grammar, Words):
+    # a sequence keeps its start to backtrack, a repetition does not
+    entry = 'items'
+    grammar = """
+        items = [ [word:w #add_word(_, w)]* ]
+    """
+
+
+class TestParseStream(unittest.TestCase):
+    def test_it_parses_chunks_and_discards_the_parsed_text(self):
+        text = 'ab "\u00e9\u20ac" 12\n' * 300
+        expected = Words().parse(text).lst
+        chunks = [text[i:i + 7].encode('utf-8')
+                  for i in range(0, len(text), 7)]
+        starts = []
+        discard = WindowText.discard
+
+        def spy(window, index):
+            discard(window, index)
+            starts.append(window.start)
+
+        with mock.patch.multiple(ChunkedStream, LOOKAHEAD=32, MARGIN=16), \
+                mock.patch.object(WindowText, 'discard', spy):
+            res = Items().parse_stream(iter(chunks))
+        self.assertEqual(res.lst, expected)
+        self.assertGreater(max(starts), len(text) - 64)
+
+
+class Stmts(grammar.Grammar):
+    entry = 'stmts'
+    packrat = True
+    grammar = """
+        stmts = [ ^ [stmt ';']* eof ]
+        stmt = [ "if" ^ id ':' id | id ]
+    """
+
+
+class TestCut(unittest.TestCase):
+    def test_it_reports_failures_after_a_cut(self):
+        for cls in (Stmts, topython.compile_grammar(Stmts)):
+            self.assertTrue(cls().parse("if a: b; c; if d: e;"))
+            with self.assertRaises(error.Diagnostic) as ctx:
+                cls().parse("a; if b c;")
+            msg = ctx.exception.logs[0].msg
+            self.assertEqual(msg, "Parse error in 'id' after a cut")
+            self.assertEqual(ctx.exception.logs[0].location.col, 9)
+
+    def test_it_drops_the_packrat_results_before_it(self):
+        parser = Stmts()
+        text = "a; if b: c; d;"
+        self.assertTrue(parser.parse(text))
+        self.assertGreater(len(parser._memo), 0)
+        cut = text.index("if b") + 2
+        self.assertTrue(all(index >= cut for _, index, _ in parser._memo))
+
+    def test_it_lets_a_stream_discard_the_text_before_it(self):
+        Cut = type('ItemsCut', (grammar.Grammar, Words), {
+            'entry': 'items',
+            'grammar': "items = [ ^ [word:w #add_word(_, w)]* eof ]"})
+        text = 'ab "é€" 12\n' * 300
+        with mock.patch.multiple(ChunkedStream, LOOKAHEAD=32, MARGIN=16):
+            parser = Cut()
+            res = parser.parse_stream(iter([text]))
+        self.assertEqual(len(res.lst), 900)
+        self.assertGreater(parser._stream._content.start, len(text) - 64)
+
+
+class Assigns(grammar.Grammar):
+    entry = 'assigns'
+    packrat = True
+    grammar = """
+        assigns = [ [assign:a #add_assign(_, a)]* eof ]
+        assign = [ id:n '=' [num | id]:v ';' #evaluated(_, n, v) ]
+    """
+
+
+@meta.hook(Assigns)
+def add_assign(self, assigns, a):
+    if not hasattr(assigns, 'lst'):
+        assigns.lst = []
+    assigns.lst.append(a.pair)
+    return True
+
+
+@meta.hook(Assigns)
+def evaluated(self, assign, n, v):
+    self.evaluations = getattr(self, 'evaluations', 0) + 1
+    assign.pair = (self.value(n), self.value(v))
+    return True
+
+
+class TestReparse(unittest.TestCase):
+    def test_it_evaluates_the_rules_around_the_edit(self):
+        text = ''.join('a%d = %d;\n' % (i, i) for i in range(200))
+        parser = Assigns()
+        parser.parse(text)
+        self.assertEqual(parser.evaluations, 200)
+        edits = [
+            (text.index('a100 = 100'), 'b = 7;\n'),  # insert
+            (text.index('a50 = 50'), ''),  # no-op
+        ]
+        for start, new_text in edits:
+            parser.evaluations = 0
+            res = parser.reparse(start, start, new_text)
+            text = text[:start] + new_text + text[start:]
+            self.assertLess(parser.evaluations, 10)
+            self.assertEqual(res.lst, Assigns().parse(text).lst)
+        # replace the value of a120, remove a10
+        start = text.index('120;')
+        res = parser.reparse(start, start + 3, 'x')
+        text = text[:start] + 'x' + text[start + 3:]
+        start = text.index('a10 =')
+        end = text.index('a11 =')
+        res = parser.reparse(start, end, '')
+        text = text[:start] + text[end:]
+        self.assertEqual(res.lst, Assigns().parse(text).lst)
+        self.assertIn(('a120', 'x'), res.lst)
+        self.assertEqual(len(res.lst), 200)
+
+    def test_it_reports_errors_in_the_edit(self):
+        parser = Assigns()
+        parser.parse("a = 1; b = 2;")
+        with self.assertRaises(error.Diagnostic):
+            parser.reparse(7, 8, "=")
+        self.assertTrue(parser.reparse(7, 8, "c"))
+        with self.assertRaises(ValueError):
+            parser.reparse(5, 100, "")
+
+
+class TestRecognize(unittest.TestCase):
+    def test_it_matches_without_building_the_tree(self):
+        text = ''.join('a%d = %d;\n' % (i, i) for i in range(20))
+        Predicted = type('PredictedAssigns', (grammar.Grammar, Assigns), {
+            'entry': 'assigns', 'predictive': True, 'regex_fusion': True})
+        for cls in (Assigns, Predicted):
+            parser = cls()
+            res = parser.recognize(text)
+            self.assertTrue(res)
+            self.assertIsNone(res.location)
+            self.assertFalse(hasattr(parser, 'evaluations'))
+            self.assertEqual(len(parser._memo), 0)
+
+    def test_it_reports_the_farthest_failure(self):
+        text = "a = 1;\nb = 2;\nc = = 3;\n"
+        with self.assertRaises(error.Diagnostic) as ctx:
+            Assigns().parse(text)
+        expected = ctx.exception.logs[-1].location
+        res = Assigns().recognize(text)
+        self.assertFalse(res)
+        self.assertEqual((res.location.line, res.location.col),
+                         (expected.line, expected.col))
+        res = Stmts().recognize("a; if b c;")
+        self.assertFalse(res)
+        self.assertEqual(res.location.col, 9)
+
+
+class Events(grammar.EventHandler):
+    def __init__(self, parser):
+        self.parser = parser
+        self.events = []
+        self.late = 0
+
+    def enter_rule(self, name, pos):
+        self.events.append(('enter', name, pos))
+
+    def exit_rule(self, name, pos, ok):
+        self.events.append(('exit', name, pos, ok))
+        # delivered long after the rule
+        if self.parser._stream.index > pos + 20:
+            self.late += 1
+
+    def capture(self, name, start, end):
+        self.events.append(('capture', name, start, end))
+
+    def hook(self, name, args):
+        self.events.append(('hook', name, args))
+
+
+class TestParseEvents(unittest.TestCase):
+    def test_it_reports_the_events_of_the_successful_attempts(self):
+        parser = Assigns()
+        handler = Events(parser)
+        self.assertTrue(parser.parse_events("a = 1; b = c;", handler))
+        self.assertFalse(hasattr(parser, 'evaluations'))
+        events = handler.events
+        self.assertEqual(events[:3], [('enter', 'assigns', 0),
+                                      ('enter', 'assign', 0),
+                                      ('enter', 'id', 0)])
+        self.assertEqual(events[-1], ('exit', 'assigns', 13, True))
+        self.assertIn(('capture', 'v', 11, 12), events)
+        # num was tried and failed before id
+        self.assertNotIn(('enter', 'num', 11), events)
+        self.assertEqual(
+            [e for e in events if e[0] == 'hook'],
+            [('hook', 'evaluated', [None, 'a', '1']),
+             ('hook', 'add_assign', [None, 'a = 1; ']),
+             ('hook', 'evaluated', [None, 'b', 'c']),
+             ('hook', 'add_assign', [None, 'b = c;'])])
+
+    def test_it_delivers_the_events_as_they_commit(self):
+        text = ''.join('a%d = %d;\n' % (i, i) for i in range(200))
+        parser = Assigns()
+        handler = Events(parser)
+        self.assertTrue(parser.parse_events(text, handler))
+        self.assertEqual(len(handler.events), 200 * 11 + 4)
+        self.assertEqual(handler.late, 0)
+
+    def test_it_reports_a_failure(self):
+        parser = Assigns()
+        handler = Events(parser)
+        res = parser.parse_events("a = 1; b = ;", handler)
+        self.assertFalse(res)
+        self.assertEqual(res.location.col, 12)
+        self.assertEqual(handler.events[-2:], [('exit', 'eof', 7, False),
+                                               ('exit', 'assigns', 0, False)])
+        self.assertEqual(len(parser._events), 0)
+
+
+class Lines(grammar.Grammar):
+    entry = 'lines'
+    grammar = """
+        lines = [ @stream("l") [@ignore("null") line:l]+ eof ]
+        line = [ cell:c #add_cell(_, c) [';' cell:c #add_cell(_, c)]* eol ]
+        cell = [ id | num ]
+    """
+
+
+@meta.hook(Lines)
+def add_cell(self, line, c):
+    if not hasattr(line, 'cells'):
+        line.cells = []
+    line.cells.append(self.value(c))
+    return True
+
+
+class TestIterParse(unittest.TestCase):
+    def test_it_yields_the_streamed_items(self):
+        text = "a;1\nb;2\nc;3\n"
+        expected = [['a', '1'], ['b', '2'], ['c', '3']]
+        for cls in (Lines, topython.compile_grammar(Lines)):
+            items = cls().iter_parse(text)
+            self.assertEqual([item.cells for item in items], expected)
+            parser = cls()
+            self.assertTrue(parser.parse(text))
+            self.assertEqual([i.cells for i in parser.streamed_items],
+                             expected)
+
+    def test_it_forgets_the_items(self):
+        text = ''.join('a%d;%d\n' % (i, i) for i in range(500))
+        parser = Lines()
+        logs = []
+        with mock.patch.multiple(ChunkedStream, LOOKAHEAD=32, MARGIN=16):
+            for item in parser.iter_parse(iter([text])):
+                logs.append(len(parser._scope_log))
+        self.assertEqual(len(logs), 500)
+        self.assertLess(max(logs), 50)
+        self.assertGreater(parser._stream._content.start, len(text) - 64)
+
+    def test_it_stops_on_errors_and_close(self):
+        items = Lines().iter_parse("a;1\nb;;2\n")
+        self.assertEqual(next(items).cells, ['a', '1'])
+        with self.assertRaises(error.Diagnostic):
+            next(items)
+        parser = Lines()
+        text = "a;1\n" * 1000
+        items = parser.iter_parse(text, buffered=1)
+        next(items)
+        items.close()
+        # stopped at the next items
+        self.assertLess(parser._stream.index, len(text) // 2)
+        with self.assertRaises(TypeError):
+            grammar.from_string('r = [ @stream("l") id:l ]', 'r')
+
+
+Names = grammar.from_string("""
+    names = [ [id:n #add_name(_, n)]* eof ]
+""", 'names')
+
+
+@meta.hook(Names)
+def add_name(self, names, n):
+    if not hasattr(names, 'lst'):
+        names.lst = []
+    names.lst.append(self.value(n))
+    return True
+
+
+class TestParseMany(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.paths = []
+        for i, text in enumerate(["a b", "c", "d 1", "e f g"]):
+            path = os.path.join(self.tmp.name, '%d.txt' % i)
+            with open(path, 'w') as f:
+                f.write(text)
+            self.paths.append(path)
+        self.paths.append(os.path.join(self.tmp.name, 'missing.txt'))
+
+    def test_it_parses_files_in_workers(self):
+        for jobs in (1, 2):
+            res = list(Names.parse_many(self.paths, jobs=jobs))
+            self.assertEqual([path for path, _ in res], self.paths)
+            self.assertEqual(res[0][1].lst, ['a', 'b'])
+            self.assertEqual(res[3][1].lst, ['e', 'f', 'g'])
+            self.assertIsInstance(res[2][1], error.Diagnostic)
+            self.assertIsInstance(res[4][1], FileNotFoundError)
+        res = dict(Words.parse_many(self.paths[:2], ordered=False))
+        self.assertEqual(res[self.paths[1]].lst, ['c'])
+
+    def test_it_rebuilds_generated_grammars(self):
+        self.assertIs(pickle.loads(pickle.dumps(Names)), Names)
+        self.assertIs(pickle.loads(pickle.dumps(Words)), Words)
+        data = pickle.dumps(Names)
+        with mock.patch.dict(grammar._generated, clear=True):
+            Rebuilt = pickle.loads(data)
+        self.assertIsNot(Rebuilt, Names)
+        self.assertEqual(Rebuilt.__name__, Names.__name__)
+        self.assertEqual(Rebuilt().parse("x y").lst, ['x', 'y'])
+
+
+class Rows(grammar.Grammar):
+    entry = 'rows'
+    split_after = '\n'
+    grammar = """
+        rows = [ [@ignore("null") row:r #add_row(_, r)]+ eof ]
+        row = [ cell:c #add_cell(_, c) [';' cell:c #add_cell(_, c)]* eol ]
+        cell = [ id | num ]
+    """
+
+
+@meta.hook(Rows)
+def add_row(self, rows, r):
+    if not hasattr(rows, 'tab'):
+        rows.tab = []
+    rows.tab.append(r.cells)
+    return True
+
+
+@meta.hook(Rows)
+def add_cell(self, row, c):
+    if not hasattr(row, 'cells'):
+        row.cells = []
+    row.cells.append(self.value(c))
+    return True
+
+
+class TestParseSplit(unittest.TestCase):
+    def write(self, text: str) -> str:
+        fd, fn = tempfile.mkstemp()
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        self.addCleanup(os.remove, fn)
+        return fn
+
+    def test_it_parses_the_pieces_in_workers(self):
+        fn = self.write(''.join('a%d;%d;é\n' % (i, i) for i in range(300)))
+        pieces = grammar.split_file(fn, '\n', 100, 'utf-8')
+        self.assertGreater(len(pieces), 20)
+        expected = Rows().parse_file(fn).tab
+        for jobs in (1, 2):
+            res = Rows().parse_split(fn, jobs=jobs, chunk_size=100)
+            self.assertEqual(res.tab, expected)
+
+    def test_it_reports_errors_at_their_place_in_the_file(self):
+        lines = ['a%d;%d\n' % (i, i) for i in range(300)]
+        lines[250] = 'b;;c\n'
+        fn = self.write(''.join(lines))
+        with self.assertRaises(error.Diagnostic) as whole:
+            Rows().parse_file(fn)
+        with self.assertRaises(error.Diagnostic) as split:
+            Rows().parse_split(fn, jobs=2, chunk_size=100)
+        expected = whole.exception.logs[-1].location
+        loc = split.exception.logs[-1].location
+        self.assertEqual((loc.line, loc.col), (expected.line, expected.col))
+        self.assertEqual(loc.line, 251)